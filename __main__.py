@@ -1,12 +1,10 @@
 """Creates a Lambda and an EFS in a VPC"""
 
 import json
+import os
 import pulumi
 from pulumi import ResourceOptions
-from pulumi_aws import lambda_, iam, ec2, efs, codebuild, ssm
-from pulumi_aws.get_caller_identity import get_caller_identity
-from pulumi.output import Output
-from typing import Dict
+from pulumi_aws import lambda_, iam
 from filebase64sha256 import filebase64sha256
 from pulumi_infrastructure.development_environment import DevelopmentEnvironment
 
@@ -41,12 +39,36 @@ iam.RolePolicyAttachment("VpcAccessPolicyAttach",
 
 mount_location = "/mnt/efs"
 
+# The memory size is taken from the report of `build_tools.memory_profile`, which
+# measures the memory used by loading the Lambda's libraries, if there is one.
+
+memory_size = 128
+if os.path.exists("memory_profile.json"):
+    with open("memory_profile.json") as f:
+        memory_size = json.load(f)["recommended_memory_mb"]
+
+# The most used libraries are packed into a layer by `build_tools.layer`, which
+# Lambda extracts to /opt, so that they are read from local disk rather than
+# EFS.  The layer only exists once the dependencies have been installed.
+
+layers = []
+if os.path.exists("layer.zip"):
+    hot_libraries_layer = lambda_.LayerVersion("hotLibrariesLayer",
+        layer_name="hot-libraries",
+        code="layer.zip",
+        source_code_hash=filebase64sha256("layer.zip"),
+        compatible_runtimes=["python3.8"]
+    )
+    layers.append(hot_libraries_layer.arn)
+
 example_function = lambda_.Function("exampleFunction",
         code="lambda.zip",
         source_code_hash=filebase64sha256("lambda.zip"),
         handler="handler.my_handler",
         role=example_role.arn,
         runtime="python3.8",
+        memory_size=memory_size,
+        layers=layers,
         vpc_config={
           "security_group_ids": [environment.security_group_id],
           "subnet_ids": environment.public_subnet_ids
@@ -58,7 +80,14 @@ example_function = lambda_.Function("exampleFunction",
         environment={
           "variables": {
             "LAMBDA_PACKAGES_PATH": mount_location,
-            "LD_LIBRARY_PATH": f"/var/lang/lib:/lib64:/usr/lib64:/var/runtime:/var/runtime/lib:/var/task:/var/task/lib:/opt/lib:{mount_location}/lambda_packages/lib",
+            # The handler loads libraries by absolute path, and their dependencies are found
+            # through their $ORIGIN run paths.  The EFS lib folder comes last, for libraries
+            # whose run paths could not be patched, so it adds no failed probes for the others.
+            # The rest of the runtime's default path only adds failed probes, as /lib64 and
+            # /usr/lib64 are searched anyway and the hot libraries layer is loaded by absolute
+            # path.  See the minimal path printed by `build_tools.rpath analyze` at the end of
+            # brew_install.sh.
+            "LD_LIBRARY_PATH": f"/var/lang/lib:{mount_location}/lambda_packages/lib",
             "PATH": f"/var/lang/bin:/usr/local/bin:/usr/bin/:/bin:/opt/bin:{mount_location}/lambda_packages/bin"
           }
         },
@@ -0,0 +1,82 @@
+"""
+Runs a synthetic SQS batch through `batch_engine.BatchProcessor` with a fake
+Lambda context, to show throughput at several pool sizes and what happens when
+the invocation runs short of time.
+
+Each record sleeps for a random, long-tailed latency (standing in for I/O or
+a ctypes call which releases the GIL), and a fraction of them fail.
+
+Usage: python3 benchmarks/batch_engine.py [--records 500] [--timeout-ms 3000] [--failure-rate 0.02]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from batch_engine import BatchProcessor
+
+
+class FakeContext:
+    """
+    Stands in for the Lambda context, counting down from `timeout_ms`.
+    """
+
+    def __init__(self, timeout_ms: int):
+        self.deadline = time.monotonic() + timeout_ms / 1000
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(0, int((self.deadline - time.monotonic()) * 1000))
+
+
+def sqs_event(count: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    return {"Records": [
+        {
+            "messageId": f"message-{i:05}",
+            "body": json.dumps({"sleep_ms": min(500.0, rng.lognormvariate(2.5, 0.8))}),
+            "eventSource": "aws:sqs",
+        }
+        for i in range(count)
+    ]}
+
+
+def make_process_record(failure_rate: float):
+    rng = random.Random(1)
+
+    def process_record(record):
+        body = json.loads(record["body"])
+        time.sleep(body["sleep_ms"] / 1000)
+        if rng.random() < failure_rate:
+            raise RuntimeError("Simulated failure")
+        return body["sleep_ms"]
+
+    return process_record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the batch engine with a fake context")
+    parser.add_argument("--records", type=int, default=500, help="Records in the batch")
+    parser.add_argument("--timeout-ms", type=int, default=3000, help="Remaining time the fake context starts with")
+    parser.add_argument("--reserve-ms", type=int, default=500, help="Time kept back for returning the response")
+    parser.add_argument("--failure-rate", type=float, default=0.02, help="Fraction of records which raise")
+    parser.add_argument("--workers", default="1,8,32", help="Comma-separated pool sizes")
+    args = parser.parse_args()
+
+    event = sqs_event(args.records)
+    for workers in (int(w) for w in args.workers.split(",")):
+        processor = BatchProcessor(make_process_record(args.failure_rate), workers=workers, reserve_ms=args.reserve_ms)
+        batch = processor.process(event, FakeContext(args.timeout_ms))
+        processor.close()
+
+        stats = batch.stats()
+        print(f"{workers:>3} workers: {json.dumps(stats)}")
+        print(f"             {len(batch.response()['batchItemFailures'])} batchItemFailures")
+
+
+if __name__ == "__main__":
+    main()
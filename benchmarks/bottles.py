@@ -0,0 +1,134 @@
+"""
+Times `build_tools.bottles` installing synthetic Homebrew bottles, extracting
+them serially and over a thread pool, and checks that no placeholders are
+left behind.
+
+Each generated bottle depends on the previous one through its
+`INSTALL_RECEIPT.json`, and holds a shared library built with `cc` (if there
+is one) with a placeholder run path and a string holding Homebrew's build
+prefix, a versioned symlink to it, a pkg-config file and some data under
+`share`.  Nothing is downloaded.
+
+Usage: python3 benchmarks/bottles.py [--bottles 20] [--data-files 200] [--workers 8]
+"""
+
+import argparse
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from build_tools.bottles import install
+
+TARGET_PREFIX = "/mnt/efs/lambda_packages"
+PLACEHOLDERS = [b"@@HOMEBREW_PREFIX@@", b"@@HOMEBREW_CELLAR@@", b"/home/linuxbrew/.linuxbrew"]
+
+LIBRARY_SOURCE = """
+const char *data_directory = "/home/linuxbrew/.linuxbrew/share/%s";
+const char *data_directory_%s(void) { return data_directory; }
+"""
+
+
+def build_library(name: str, directory: str):
+    """
+    Compiles a small shared library, returning its path, or `None` if there
+    is no C compiler.
+    """
+    if shutil.which("cc") is None:
+        return None
+    source = os.path.join(directory, f"{name}.c")
+    with open(source, "w") as f:
+        f.write(LIBRARY_SOURCE % (name, name.replace("-", "_")))
+    path = os.path.join(directory, f"lib{name}.so.1")
+    subprocess.run(
+        ["cc", "-shared", "-fPIC", "-o", path, source, f"-Wl,-soname,lib{name}.so.1",
+         "-Wl,--enable-new-dtags,-rpath,@@HOMEBREW_PREFIX@@/lib"],
+        check=True,
+    )
+    return path
+
+
+def add_bytes(tar: tarfile.TarFile, name: str, data: bytes, mode: int = 0o644):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mode = mode
+    tar.addfile(info, io.BytesIO(data))
+
+
+def make_bottle(directory: str, name: str, version: str, dependencies, data_files: int, data_size: int):
+    keg = f"{name}/{version}"
+    path = os.path.join(directory, f"{name}--{version}.x86_64_linux.bottle.tar.gz")
+    with tarfile.open(path, "w:gz") as tar:
+        receipt = {"runtime_dependencies": [{"full_name": d, "version": "1.0"} for d in dependencies]}
+        add_bytes(tar, f"{keg}/INSTALL_RECEIPT.json", json.dumps(receipt).encode())
+        add_bytes(tar, f"{keg}/lib/pkgconfig/{name}.pc",
+                  f"prefix=@@HOMEBREW_CELLAR@@/{keg}\nlibdir=${{prefix}}/lib\nName: {name}\n".encode())
+
+        library = build_library(name, directory)
+        if library is not None:
+            tar.add(library, f"{keg}/lib/lib{name}.so.1")
+            link = tarfile.TarInfo(f"{keg}/lib/lib{name}.so")
+            link.type = tarfile.SYMTYPE
+            link.linkname = f"lib{name}.so.1"
+            tar.addfile(link)
+
+        for i in range(data_files):
+            add_bytes(tar, f"{keg}/share/{name}/data{i}.bin", os.urandom(data_size))
+    return path
+
+
+def leftover_placeholders(prefix: str):
+    found = []
+    for root, _, filenames in os.walk(os.path.join(prefix, "Cellar")):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            if os.path.islink(path):
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            if any(p in data for p in PLACEHOLDERS):
+                found.append(os.path.relpath(path, prefix))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks installing synthetic bottles")
+    parser.add_argument("--bottles", type=int, default=20, help="Number of bottles")
+    parser.add_argument("--data-files", type=int, default=200, help="Data files per bottle")
+    parser.add_argument("--data-size", type=int, default=16384, help="Size of each data file")
+    parser.add_argument("--workers", type=int, default=8, help="Workers for the parallel run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        bottles_dir = os.path.join(directory, "bottles")
+        os.makedirs(bottles_dir)
+        names = [f"formula{i}" for i in range(args.bottles)]
+        for i, name in enumerate(names):
+            make_bottle(bottles_dir, name, "1.0", names[i - 1:i], args.data_files, args.data_size)
+
+        for workers in (1, args.workers):
+            prefix = os.path.join(directory, f"prefix{workers}")
+            start = time.perf_counter()
+            report = install(bottles_dir, prefix, [names[-1]], TARGET_PREFIX, workers)
+            total = time.perf_counter() - start
+            print(f"workers={workers:<3} {total:.2f} s total: {report}")
+
+            leftovers = leftover_placeholders(prefix)
+            if leftovers or report.unrelocated:
+                sys.exit(f"Placeholders left in {leftovers or list(report.unrelocated)}")
+
+            library = os.path.join(prefix, "lib", f"lib{names[0]}.so")
+            if os.path.exists(library):
+                strings = subprocess.run(["strings", library], stdout=subprocess.PIPE, universal_newlines=True).stdout
+                print("  relocated strings:", [s for s in strings.splitlines() if TARGET_PREFIX in s or "ORIGIN" in s])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Compares loading a library tree file by file against unpacking it from a
+single bundle, for a range of file counts.
+
+EFS charges a metadata round-trip for every file opened, which a local disk
+does not, so an artificial per-open latency can be added to both layouts to
+approximate it.
+
+Usage: python3 benchmarks/bundle_layout.py [--counts 10 100 1000] [--open-latency-ms 2]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from build_tools.bundle import pack
+from build_tools.sync import list_files
+from bundle_loader import extract_bundle
+
+
+def make_tree(root: str, count: int, size: int):
+    """
+    Writes `count` files which, like shared objects, are partly compressible.
+    """
+    os.makedirs(os.path.join(root, "lib"))
+    for i in range(count):
+        with open(os.path.join(root, "lib", f"libsynthetic{i}.so"), "wb") as f:
+            f.write(os.urandom(size // 2) + bytes(size - size // 2))
+
+
+def read_directory(root: str, open_latency: float):
+    for relative_path in list_files(root):
+        time.sleep(open_latency)
+        with open(os.path.join(root, relative_path), "rb") as f:
+            while f.read(1024 * 1024):
+                pass
+
+
+def read_bundle(bundle_path: str, destination: str, open_latency: float):
+    time.sleep(open_latency)
+    extract_bundle(bundle_path, destination)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks directory versus bundle layouts")
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 1000], help="File counts to test")
+    parser.add_argument("--file-size", type=int, default=256 * 1024, help="Size of each synthetic file")
+    parser.add_argument("--open-latency-ms", type=float, default=2.0, help="Artificial latency per file opened")
+    args = parser.parse_args()
+
+    open_latency = args.open_latency_ms / 1000
+    print(f"{'files':>8} {'directory ms':>14} {'bundle ms':>12} {'speedup':>9}")
+
+    for count in args.counts:
+        work = tempfile.mkdtemp()
+        try:
+            tree = os.path.join(work, "generation")
+            make_tree(tree, count, args.file_size)
+            bundle_path = os.path.join(work, "bundle.lpb")
+            pack(tree, bundle_path)
+
+            start = time.perf_counter()
+            read_directory(tree, open_latency)
+            directory_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            read_bundle(bundle_path, os.path.join(work, "local"), open_latency)
+            bundle_ms = (time.perf_counter() - start) * 1000
+
+            print(f"{count:>8} {directory_ms:>14.1f} {bundle_ms:>12.1f} {directory_ms / bundle_ms:>8.1f}x")
+        finally:
+            shutil.rmtree(work)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""
+Measures the Lambda handler's cold and warm start locally, with EFS stood in
+for by a latency shim, for several `lambda_packages` layouts.
+
+A `lambda_packages` tree is built from synthetic libraries (a fake `libproj`
+and `libexif`, the former with a chain of dependencies padded to realistic
+sizes) using the same build tools as `brew_install.sh`, or an existing tree is
+given with `--packages`.  Each scenario then runs `handler.my_handler` in fresh
+interpreters: the time to import the handler is the init time, the first
+invocation is the cold invoke, and the following ones are warm invokes.
+
+In each measured process, `LatencyShim` wraps `open`, `os.stat`, `os.lstat`,
+`os.listdir` and `ctypes.CDLL` for paths in the tree.  Every open or metadata
+call costs `--open-latency-ms`, and every block of `--block-size` bytes read
+for the first time costs `--read-latency-ms`, as if fetched from EFS and then
+kept in the page cache.  Libraries loaded with `ctypes` are charged for their
+whole size, as the dynamic linker maps and faults them in.  Sleeps overlap
+across threads, as concurrent EFS reads do.
+
+The scenarios are:
+    efs       libraries read in place, nothing prefetched
+    prefetch  the prefetch profile read concurrently first (src/prefetch.py)
+    bundle    the generation unpacked from a bundle to /tmp (src/bundle_loader.py)
+    layer     the root libraries and their dependencies in a layer (build_tools/layer.py)
+
+The report gives p50/p95/p99 of each time per scenario as JSON.  With
+`--baseline`, a previous report, any p50 more than `--max-regression` (and
+`--min-regression-ms`) slower fails the run, so that it can gate CI.
+
+Usage: python3 benchmarks/cold_start.py [--runs 10] [--warm-invocations 5] [--output report.json] [--baseline old.json]
+"""
+
+import argparse
+import builtins
+import contextlib
+import ctypes
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+
+ROOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SRC_PATH = os.path.join(ROOT_PATH, "src")
+
+sys.path.insert(0, ROOT_PATH)
+sys.path.insert(0, SRC_PATH)
+
+SCENARIOS = ["efs", "prefetch", "bundle", "layer"]
+METRICS = ["init_ms", "cold_invoke_ms", "warm_invoke_ms"]
+ROOT_LIBRARIES = ["proj", "exif"]
+
+SYNTHETIC_LIBRARIES = {
+    # soname: (exported function, dependencies)
+    "libproj.so.22": ("proj_area_create", ["libsqlite3.so.0", "libtiff.so.5", "libcurl.so.4"]),
+    "libexif.so.12": ("exif_content_new", []),
+    "libsqlite3.so.0": (None, []),
+    "libtiff.so.5": (None, ["libjpeg.so.8", "libzstd.so.1"]),
+    "libcurl.so.4": (None, ["libssl.so.1.1"]),
+    "libssl.so.1.1": (None, ["libcrypto.so.1.1"]),
+    "libcrypto.so.1.1": (None, []),
+    "libjpeg.so.8": (None, []),
+    "libzstd.so.1": (None, []),
+}
+
+LIBRARY_SOURCE = """
+#include <stdlib.h>
+__attribute__((used)) static const char padding[%d] = {1};
+%s
+"""
+
+
+class LatencyShim:
+    """
+    Adds EFS-like latency to file access below `root` in this process.
+    """
+
+    def __init__(self, root: str, open_latency: float, read_latency: float, block_size: int):
+        self.root = os.path.realpath(root) + os.sep
+        self.open_latency = open_latency
+        self.read_latency = read_latency
+        self.block_size = block_size
+        self.warm = set()
+        self.lock = threading.Lock()
+
+    def covers(self, path) -> bool:
+        if isinstance(path, int):
+            return False
+        return os.path.abspath(os.fsdecode(path)).startswith(self.root)
+
+    def charge_open(self):
+        time.sleep(self.open_latency)
+
+    def charge_read(self, path: str, offset: int, length: int):
+        """
+        Sleeps for each block of the range not read before.
+        """
+        key = os.path.abspath(path)
+        first, last = offset // self.block_size, (offset + length - 1) // self.block_size
+        with self.lock:
+            cold = [b for b in range(first, last + 1) if (key, b) not in self.warm]
+            self.warm.update((key, b) for b in cold)
+        if cold:
+            time.sleep(self.read_latency * len(cold))
+
+    def install(self):
+        shim = self
+        original_open = builtins.open
+        original_stat, original_lstat, original_listdir = os.stat, os.lstat, os.listdir
+        original_cdll_init = ctypes.CDLL.__init__
+
+        class ShimFile:
+            def __init__(self, file, path):
+                self._file = file
+                self._path = path
+
+            def _charged(self, read):
+                offset = self._file.tell()
+                result = read()
+                length = result if isinstance(result, int) else len(result)
+                if length:
+                    shim.charge_read(self._path, offset, length)
+                return result
+
+            def read(self, size=-1):
+                return self._charged(lambda: self._file.read(size))
+
+            def readinto(self, buffer):
+                return self._charged(lambda: self._file.readinto(buffer))
+
+            def readline(self, size=-1):
+                return self._charged(lambda: self._file.readline(size))
+
+            def __iter__(self):
+                return iter(self.readline, self._file.read(0))
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                self._file.close()
+
+            def __getattr__(self, name):
+                return getattr(self._file, name)
+
+        def shim_open(file, mode="r", *args, **kwargs):
+            f = original_open(file, mode, *args, **kwargs)
+            if shim.covers(file):
+                shim.charge_open()
+                if "r" in mode and "+" not in mode:
+                    return ShimFile(f, os.fsdecode(file))
+            return f
+
+        def metadata(original):
+            def wrapper(path, *args, **kwargs):
+                if shim.covers(path):
+                    shim.charge_open()
+                return original(path, *args, **kwargs)
+            return wrapper
+
+        def shim_cdll_init(cdll, name, *args, **kwargs):
+            if name and shim.covers(name):
+                shim.charge_open()
+                shim.charge_read(name, 0, max(original_stat(name).st_size, 1))
+            original_cdll_init(cdll, name, *args, **kwargs)
+
+        builtins.open = io.open = shim_open
+        os.stat, os.lstat, os.listdir = metadata(original_stat), metadata(original_lstat), metadata(original_listdir)
+        ctypes.CDLL.__init__ = shim_cdll_init
+
+
+def child(args):
+    """
+    Runs in the measured process: imports and invokes the handler, printing
+    the timings as JSON.
+    """
+    shim = LatencyShim(args.packages, args.open_latency_ms / 1000, args.read_latency_ms / 1000, args.block_size)
+    shim.install()
+
+    event = {"libraries": ROOT_LIBRARIES}
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        import handler
+        initialized = time.perf_counter()
+        handler.my_handler(event, None)
+        invoked = time.perf_counter()
+        warm = []
+        for _ in range(args.warm_invocations):
+            warm_start = time.perf_counter()
+            handler.my_handler(event, None)
+            warm.append((time.perf_counter() - warm_start) * 1000)
+
+    print(json.dumps({
+        "init_ms": round((initialized - start) * 1000, 3),
+        "cold_invoke_ms": round((invoked - initialized) * 1000, 3),
+        "warm_invoke_ms": warm,
+    }))
+
+
+def compile_library(directory: str, soname: str, function: str, dependencies, size: int):
+    source_path = os.path.join(directory, soname + ".c")
+    body = f"void *{function}(void) {{ return malloc(16); }}" if function else ""
+    with open(source_path, "w") as f:
+        f.write(LIBRARY_SOURCE % (max(size, 1), body))
+    command = ["cc", "-shared", "-fPIC", "-o", os.path.join(directory, soname), source_path,
+               f"-Wl,-soname,{soname}", "-Wl,--enable-new-dtags,-rpath,$ORIGIN", "-Wl,--no-as-needed", f"-L{directory}"]
+    command += [f"-l:{dependency}" for dependency in dependencies]
+    subprocess.run(command, check=True)
+    os.remove(source_path)
+
+
+def build_synthetic_tree(packages_path: str, library_size: int):
+    """
+    Compiles the synthetic libraries into a new generation of
+    `packages_path`, with its manifest, prefetch profile and bundle.
+    """
+    from build_tools import bundle, generations, manifest
+    import prefetch
+
+    if shutil.which("cc") is None:
+        sys.exit("Building synthetic libraries needs a C compiler; pass --packages instead")
+
+    generation = generations.create_generation(packages_path)
+    generation_path = os.path.join(generations.generations_path(packages_path), generation)
+    lib_path = os.path.join(generation_path, "lib")
+    os.makedirs(lib_path, exist_ok=True)
+
+    built = set()
+
+    def build(soname):
+        if soname in built:
+            return
+        function, dependencies = SYNTHETIC_LIBRARIES[soname]
+        for dependency in dependencies:
+            build(dependency)
+        compile_library(lib_path, soname, function, dependencies, library_size)
+        built.add(soname)
+        os.symlink(soname, os.path.join(lib_path, soname.split(".so")[0] + ".so"))
+
+    for soname in SYNTHETIC_LIBRARIES:
+        build(soname)
+
+    manifest.write_manifest(generation_path, manifest.build_manifest(generation_path))
+    generations.activate(packages_path, generation)
+    lib_files = [os.path.join(lib_path, f) for f in os.listdir(lib_path)]
+    with open(os.path.join(generation_path, prefetch.PROFILE_NAME), "w") as f:
+        json.dump(prefetch.build_profile(packages_path, lib_files), f, indent=1)
+    bundle.pack(generation_path)
+
+
+def build_layer(packages_path: str, layer_path: str):
+    from build_tools import layer
+    from library_resolver import resolve_generation
+
+    generation_path = resolve_generation(packages_path)
+    generation_manifest = layer.read_manifest(generation_path)
+    placements = layer.place(generation_manifest, layer.load_frequencies(generation_manifest, [], ROOT_LIBRARIES),
+                             layer.DEFAULT_MAX_BYTES)
+    zip_path = layer_path + ".zip"
+    layer.write_layer(generation_path, generation_manifest, placements, zip_path)
+    with zipfile.ZipFile(zip_path) as archive:
+        archive.extractall(layer_path)
+
+
+def run(scenario: str, args, work: str) -> dict:
+    from library_resolver import resolve_generation
+
+    packages_path = os.path.join(args.packages, "lambda_packages")
+    shutil.rmtree(os.path.join(work, "local"), ignore_errors=True)
+    env = dict(
+        os.environ,
+        LAMBDA_PACKAGES_PATH=args.packages,
+        LAMBDA_PACKAGES_BUNDLE="1" if scenario == "bundle" else "0",
+        LAMBDA_PACKAGES_PREFETCH="1" if scenario == "prefetch" else "0",
+        LAMBDA_LAYER_PATH=os.path.join(work, "opt" if scenario == "layer" else "no_layer"),
+        LAMBDA_PACKAGES_PROJ_DATA="efs",
+        LD_LIBRARY_PATH=os.environ.get("LD_LIBRARY_PATH", ""),
+        PATH=os.environ.get("PATH", ""),
+    )
+    env.pop("LAMBDA_PACKAGES_CACHE_MB", None)
+    if scenario == "bundle":
+        # bundle_loader unpacks to a fixed location in /tmp, which a cold
+        # container starts without
+        shutil.rmtree(os.path.join("/tmp/lambda_packages", os.path.basename(resolve_generation(packages_path))),
+                      ignore_errors=True)
+
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", "--packages", args.packages,
+         "--open-latency-ms", str(args.open_latency_ms), "--read-latency-ms", str(args.read_latency_ms),
+         "--block-size", str(args.block_size), "--warm-invocations", str(args.warm_invocations)],
+        env=env, check=True, stdout=subprocess.PIPE, universal_newlines=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(runs) -> dict:
+    from batch_engine import percentile
+
+    summary = {}
+    for metric in METRICS:
+        values = [v for r in runs for v in (r[metric] if isinstance(r[metric], list) else [r[metric]])]
+        summary[metric] = {f"p{p}": round(percentile(values, p / 100), 3) for p in (50, 95, 99)}
+    return summary
+
+
+def regressions(report: dict, baseline: dict, max_regression: float, min_regression_ms: float):
+    for scenario, metrics in report["scenarios"].items():
+        for metric, percentiles in metrics.items():
+            previous = baseline.get("scenarios", {}).get(scenario, {}).get(metric, {}).get("p50")
+            if previous is not None and percentiles["p50"] > max(previous * (1 + max_regression),
+                                                                  previous + min_regression_ms):
+                yield f"{scenario} {metric} p50 {percentiles['p50']:.1f} ms, was {previous:.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the handler's cold and warm starts with simulated EFS")
+    parser.add_argument("--packages", help="Directory containing an existing lambda_packages tree, instead of a synthetic one")
+    parser.add_argument("--library-size", type=int, default=2 * 1024 * 1024, help="Padding in each synthetic library")
+    parser.add_argument("--scenarios", nargs="+", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--runs", type=int, default=10, help="Cold processes per scenario")
+    parser.add_argument("--warm-invocations", type=int, default=5, help="Warm invocations per process")
+    parser.add_argument("--open-latency-ms", type=float, default=3.0, help="Latency of each open or metadata call")
+    parser.add_argument("--read-latency-ms", type=float, default=1.0, help="Latency of each block read")
+    parser.add_argument("--block-size", type=int, default=256 * 1024, help="Bytes fetched per block read")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    parser.add_argument("--baseline", help="Previous report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed fractional p50 slowdown")
+    parser.add_argument("--min-regression-ms", type=float, default=2.0, help="Slowdowns smaller than this are noise")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    with tempfile.TemporaryDirectory() as work:
+        if args.packages is None:
+            args.packages = os.path.join(work, "efs")
+            build_synthetic_tree(os.path.join(args.packages, "lambda_packages"), args.library_size)
+        args.packages = os.path.abspath(args.packages)
+        if "layer" in args.scenarios:
+            build_layer(os.path.join(args.packages, "lambda_packages"), os.path.join(work, "opt"))
+
+        report = {
+            "settings": {k: getattr(args, k) for k in ("runs", "warm_invocations", "open_latency_ms",
+                                                       "read_latency_ms", "block_size")},
+            "scenarios": {},
+        }
+        for scenario in args.scenarios:
+            summary = summarize([run(scenario, args, work) for _ in range(args.runs)])
+            report["scenarios"][scenario] = summary
+            print(f"{scenario:>9}: " + ", ".join(
+                f"{metric} p50 {summary[metric]['p50']:.1f} / p95 {summary[metric]['p95']:.1f} / "
+                f"p99 {summary[metric]['p99']:.1f}" for metric in METRICS))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    print(json.dumps(report, indent=1))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = list(regressions(report, json.load(f), args.max_regression, args.min_regression_ms))
+        for failure in failures:
+            print(f"REGRESSION: {failure}", file=sys.stderr)
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Compares ways of extracting EXIF tags from many JPEG payloads: writing each to
+a temporary file for `exif_data_new_from_file`, and passing it in memory with
+`exif_extract.ExifExtractor`, serially, over a thread pool, and from mapped
+files.
+
+The sample images are generated locally: each is a JPEG stream with an EXIF
+APP1 segment holding the usual camera tags, followed by filler standing in
+for the compressed image.  libexif is located as the Lambda locates it, so
+either point LAMBDA_PACKAGES_PATH at an installed `lambda_packages` tree or
+add the directory containing libexif to LD_LIBRARY_PATH.
+
+Usage: python3 benchmarks/exif_extract.py [--images 500] [--size 200000] [--workers 4]
+"""
+
+import argparse
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import libraries
+
+from exif_extract import ExifExtractor
+
+ASCII = 2
+SHORT = 3
+LONG = 4
+
+
+def ifd(entries, offset: int, next_offset: int = 0) -> bytes:
+    """
+    Packs a little-endian TIFF IFD starting at `offset`, with the values which
+    do not fit in an entry following it.  `entries` are (tag, type, value).
+    """
+    data_offset = offset + 2 + 12 * len(entries) + 4
+    table, data = b"", b""
+    for tag, kind, value in entries:
+        if kind == ASCII:
+            raw = value.encode() + b"\0"
+            count = len(raw)
+        else:
+            raw = struct.pack("<H" if kind == SHORT else "<I", value).ljust(4, b"\0")
+            count = 1
+        if len(raw) <= 4:
+            table += struct.pack("<HHI", tag, kind, count) + raw.ljust(4, b"\0")
+        else:
+            table += struct.pack("<HHII", tag, kind, count, data_offset + len(data))
+            data += raw + b"\0" * (len(raw) % 2)
+    return struct.pack("<H", len(entries)) + table + struct.pack("<I", next_offset) + data
+
+
+def sample_jpeg(index: int, size: int, rng: random.Random) -> bytes:
+    camera = rng.choice([("Canon", "EOS 5D"), ("NIKON CORPORATION", "D850"), ("Apple", "iPhone 12")])
+    timestamp = f"2020:{1 + index % 12:02}:{1 + index % 28:02} 12:00:{index % 60:02}"
+
+    main_entries = [
+        (0x010F, ASCII, camera[0]), (0x0110, ASCII, camera[1]), (0x0112, SHORT, 1 + index % 8),
+        (0x0132, ASCII, timestamp),
+    ]
+    # The main IFD points at the Exif IFD which follows it; the pointer does
+    # not change the main IFD's length, so it can be packed twice
+    exif_offset = 8 + len(ifd(main_entries + [(0x8769, LONG, 0)], 8))
+    main_ifd = ifd(main_entries + [(0x8769, LONG, exif_offset)], 8)
+    exif_ifd = ifd([(0x9003, ASCII, timestamp), (0xA002, LONG, 4000), (0xA003, LONG, 3000)], exif_offset)
+
+    tiff = b"II*\0" + struct.pack("<I", 8) + main_ifd + exif_ifd
+    app1 = b"Exif\0\0" + tiff
+    filler = rng.getrandbits(8 * size).to_bytes(size, "little").replace(b"\xff", b"\x00")
+    return b"\xff\xd8" + b"\xff\xe1" + struct.pack(">H", len(app1) + 2) + app1 + filler + b"\xff\xd9"
+
+
+def generate_images(directory: str, count: int, size: int) -> list:
+    rng = random.Random(0)
+    paths = []
+    for index in range(count):
+        path = os.path.join(directory, f"sample_{index:05}.jpg")
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(sample_jpeg(index, size, rng))
+        paths.append(path)
+    return paths
+
+
+def via_temp_files(extractor: ExifExtractor, payloads: list) -> list:
+    exif = libraries.exif
+    results = []
+    for payload in payloads:
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as f:
+            f.write(payload)
+            f.flush()
+            exif_data = exif.exif_data_new_from_file(f.name.encode())
+            try:
+                results.append(extractor.read_tags(exif_data))
+            finally:
+                exif.exif_data_unref(exif_data)
+    return results
+
+
+def timed(label: str, count: int, function):
+    start = time.perf_counter()
+    results = function()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1000:>10.1f} ms  {count / elapsed:>10,.0f} images/s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks batch EXIF extraction")
+    parser.add_argument("--images", type=int, default=500, help="Number of sample images")
+    parser.add_argument("--size", type=int, default=200000, help="Bytes of filler per image")
+    parser.add_argument("--workers", type=int, default=4, help="Threads for the parallel runs")
+    parser.add_argument("--directory", help="Directory for the sample images (default: a temporary one)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_directory:
+        paths = generate_images(args.directory or temp_directory, args.images, args.size)
+        payloads = []
+        for path in paths:
+            with open(path, "rb") as f:
+                payloads.append(f.read())
+
+        with ExifExtractor(workers=1) as serial, ExifExtractor(workers=args.workers) as parallel:
+            baseline = timed("temporary files", len(payloads), lambda: via_temp_files(serial, payloads))
+            results = [
+                timed("in memory, 1 worker", len(payloads), lambda: serial.extract_batch(payloads)),
+                timed(f"in memory, {args.workers} workers", len(payloads), lambda: parallel.extract_batch(payloads)),
+                timed(f"mapped files, {args.workers} workers", len(paths), lambda: parallel.extract_files(paths)),
+            ]
+
+        if any(result != baseline for result in results):
+            raise SystemExit("Extraction methods disagree")
+        print("Sample tags:", baseline[0])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compares hashing large artifacts with the original streaming
+`filebase64sha256`, with mmap and several files in parallel, and with a warm
+stat-keyed cache, checking that every method gives the same digests.
+
+Usage: python3 benchmarks/filebase64sha256.py [--files 3] [--size-mb 300] [--workers 3]
+"""
+
+import argparse
+import base64
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import filebase64sha256
+
+
+def streaming_filebase64sha256(filename):
+    """
+    The implementation before the cache, reading 128 KiB at a time.
+    """
+    h = hashlib.sha256()
+    b = bytearray(128 * 1024)
+    mv = memoryview(b)
+    with open(filename, "rb", buffering=0) as f:
+        for n in iter(lambda: f.readinto(mv), 0):
+            h.update(mv[:n])
+    return base64.b64encode(h.digest()).decode()
+
+
+def write_artifact(path: str, size: int):
+    block = os.urandom(4 * 1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(size // len(block)):
+            f.write(block)
+        f.write(block[:size % len(block)])
+    # Old enough for the cache to trust its modification time
+    past = time.time() - 60
+    os.utime(path, (past, past))
+
+
+def timed(label: str, total_bytes: int, function):
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed * 1000:>10.1f} ms  {total_bytes / elapsed / 1e6:>10,.0f} MB/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks artifact hashing")
+    parser.add_argument("--files", type=int, default=3, help="Number of artifacts")
+    parser.add_argument("--size-mb", type=int, default=300, help="Size of each artifact")
+    parser.add_argument("--workers", type=int, default=3, help="Files hashed at once")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [os.path.join(directory, f"artifact_{i}.bin") for i in range(args.files)]
+        for path in paths:
+            write_artifact(path, args.size_mb * 1024 * 1024)
+        total = args.files * args.size_mb * 1024 * 1024
+
+        cache_path = os.path.join(directory, "cache.json")
+        filebase64sha256._default_cache = filebase64sha256.HashCache(cache_path)
+
+        expected = timed("streaming, sequential", total, lambda: [streaming_filebase64sha256(p) for p in paths])
+        results = [
+            timed("mmap, sequential", total, lambda: [filebase64sha256.filebase64sha256(p, cache=False) for p in paths]),
+            timed(f"mmap, {args.workers} workers, cold cache", total,
+                  lambda: list(filebase64sha256.filebase64sha256_many(paths, args.workers).values())),
+            timed("warm cache", total, lambda: list(filebase64sha256.filebase64sha256_many(paths, args.workers).values())),
+        ]
+        timed("tree hash, warm cache", total, lambda: filebase64sha256.dirbase64sha256(directory, args.workers))
+
+        if any(result != expected for result in results):
+            raise SystemExit("Digests differ")
+
+
+if __name__ == "__main__":
+    main()
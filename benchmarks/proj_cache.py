@@ -0,0 +1,64 @@
+"""
+Replays a skewed stream of CRS pairs, as a busy Lambda would see them, through
+`proj_cache.TransformationCache` at several sizes, against creating and
+destroying a transformation for every request.
+
+Pairs are drawn from a Zipf distribution over UTM zones, so a few pairs account
+for most requests.  libproj is located as in `benchmarks/proj_transform.py`.
+
+Usage: python3 benchmarks/proj_cache.py [--requests 5000] [--pairs 60] [--skew 1.2]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from proj_cache import TransformationCache
+
+
+def skewed_keys(count: int, pairs: int, skew: float, seed: int = 0):
+    """
+    Returns `count` (source, target) pairs, pair `k` having weight `1 / k^skew`.
+    """
+    keys = [("EPSG:4326", f"EPSG:{32601 + i}") for i in range(pairs)]
+    weights = [1 / (rank + 1) ** skew for rank in range(pairs)]
+    return random.Random(seed).choices(keys, weights=weights, k=count)
+
+
+def replay(cache: TransformationCache, keys) -> float:
+    start = time.perf_counter()
+    for source, target in keys:
+        cache.get(source, target)
+    elapsed = time.perf_counter() - start
+    cache.clear()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the PROJ transformation cache")
+    parser.add_argument("--requests", type=int, default=5000, help="Number of transformations requested")
+    parser.add_argument("--pairs", type=int, default=60, help="Number of distinct CRS pairs")
+    parser.add_argument("--skew", type=float, default=1.2, help="Zipf exponent of the pair distribution")
+    parser.add_argument("--sizes", default="0,4,16,64", help="Comma-separated cache sizes to compare")
+    args = parser.parse_args()
+
+    keys = skewed_keys(args.requests, args.pairs, args.skew)
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        cache = TransformationCache(maxsize=size)
+        elapsed = replay(cache, keys)
+        result = {"maxsize": size, "ms": round(elapsed * 1000, 3), **cache.stats.as_dict()}
+        results.append(result)
+        print(f"maxsize {size:>4}: {elapsed * 1000:>10.1f} ms, hit rate {cache.stats.hit_rate:>6.1%}, "
+              f"{cache.stats.misses} created ({cache.stats.as_dict()['mean_creation_ms']} ms each)")
+
+    print(json.dumps(results, indent=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Measures the latency of the first PROJ transformation in a fresh process, with
+PROJ's resource files read in place from `lambda_packages` (`efs`) and with
+`proj.db` copied to `/tmp` first (`local`, see `src/proj_data.py`).
+
+Each run starts a new interpreter with an empty `/tmp/proj_data`, so that it
+pays the full cost of a cold start.  Run it on a Lambda-like machine with EFS
+mounted, e.g. `LAMBDA_PACKAGES_PATH=/mnt/efs`; on local disk both placements
+read from the page cache after the first run, unless `--drop-caches` is given
+(which requires root).
+
+Usage: python3 benchmarks/proj_data.py [--runs 5] [--source EPSG:4326] [--target EPSG:32631]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+
+def child(source_crs: str, target_crs: str):
+    """
+    Runs in the measured process: initializes the data placement and makes one
+    transformation, printing the timings as JSON.
+    """
+    sys.path.insert(0, SRC_PATH)
+    import array
+
+    start = time.perf_counter()
+    import proj_data
+    from proj_transform import Transformer
+
+    data = proj_data.get_proj_data()
+    initialized = time.perf_counter()
+
+    x, y = array.array("d", [2.0]), array.array("d", [48.0])
+    with Transformer(source_crs, target_crs) as transformer:
+        transformer.transform(x, y)
+    transformed = time.perf_counter()
+
+    print(json.dumps({
+        "init_ms": round((initialized - start) * 1000, 3),
+        "first_transform_ms": round((transformed - initialized) * 1000, 3),
+        "total_ms": round((transformed - start) * 1000, 3),
+        "local_bytes": data.local_bytes,
+    }))
+
+
+def run(placement: str, args) -> dict:
+    shutil.rmtree("/tmp/proj_data", ignore_errors=True)
+    if args.drop_caches:
+        subprocess.run(["sync"], check=True)
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+
+    env = dict(os.environ, LAMBDA_PACKAGES_PROJ_DATA=placement, LAMBDA_PACKAGES_BUNDLE="0", LAMBDA_PACKAGES_PREFETCH="0")
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", "--source", args.source, "--target", args.target],
+        env=env, check=True, stdout=subprocess.PIPE, universal_newlines=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks first-transform latency for each PROJ data placement")
+    parser.add_argument("--runs", type=int, default=5, help="Cold processes per placement")
+    parser.add_argument("--source", default="EPSG:4326")
+    parser.add_argument("--target", default="EPSG:32631")
+    parser.add_argument("--drop-caches", action="store_true", help="Drop the page cache before each run")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.source, args.target)
+        return
+
+    report = {}
+    for placement in ("efs", "local"):
+        runs = [run(placement, args) for _ in range(args.runs)]
+        report[placement] = {
+            key: round(statistics.median(r[key] for r in runs), 3)
+            for key in ("init_ms", "first_transform_ms", "total_ms", "local_bytes")
+        }
+        summary = report[placement]
+        print(f"{placement:>6}: init {summary['init_ms']:>9.1f} ms, first transform "
+              f"{summary['first_transform_ms']:>9.1f} ms, total {summary['total_ms']:>9.1f} ms (median of {args.runs})")
+
+    print(json.dumps(report, indent=1))
+
+
+if __name__ == "__main__":
+    main()
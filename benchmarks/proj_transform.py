@@ -0,0 +1,81 @@
+"""
+Compares transforming coordinates one point at a time through `proj_trans`
+with the vectorized `proj_transform.Transformer`, single-threaded and split
+over a thread pool.
+
+libproj is located as the Lambda locates it, so either point
+LAMBDA_PACKAGES_PATH at an installed `lambda_packages` tree or add the
+directory containing libproj to LD_LIBRARY_PATH.
+
+Usage: python3 benchmarks/proj_transform.py [--points 1000000] [--workers 4]
+"""
+
+import argparse
+import array
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import libraries
+
+from libraries import PJ_COORD, PJ_FWD
+from proj_transform import Transformer
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def coordinates(count: int):
+    """
+    Returns longitudes and latitudes spread over Europe.
+    """
+    if numpy is not None:
+        return numpy.linspace(-10, 30, count), numpy.linspace(35, 70, count)
+    return (
+        array.array("d", (-10 + 40 * i / count for i in range(count))),
+        array.array("d", (35 + 35 * i / count for i in range(count))),
+    )
+
+
+def per_point(transformer: Transformer, x, y):
+    pj = transformer.thread_pj()
+    proj_trans = libraries.proj.proj_trans
+    coord = PJ_COORD()
+    for i in range(len(x)):
+        coord.v[0], coord.v[1] = x[i], y[i]
+        result = proj_trans(pj, PJ_FWD, coord)
+        x[i], y[i] = result.v[0], result.v[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks per-point against vectorized PROJ calls")
+    parser.add_argument("--points", type=int, default=1000000, help="Number of points to transform")
+    parser.add_argument("--per-point-limit", type=int, default=100000, help="Points to time for the per-point loop")
+    parser.add_argument("--workers", type=int, default=4, help="Threads for the parallel run")
+    parser.add_argument("--chunk-size", type=int, default=65536, help="Points per proj_trans_generic call")
+    parser.add_argument("--source", default="EPSG:4326")
+    parser.add_argument("--target", default="EPSG:3857")
+    args = parser.parse_args()
+
+    with Transformer(args.source, args.target) as transformer:
+        count = min(args.points, args.per_point_limit)
+        x, y = coordinates(count)
+        start = time.perf_counter()
+        per_point(transformer, x, y)
+        per_point_rate = count / (time.perf_counter() - start)
+        print(f"per-point proj_trans:       {per_point_rate:>14,.0f} points/s")
+
+        for workers in (1, args.workers):
+            x, y = coordinates(args.points)
+            start = time.perf_counter()
+            transformer.transform(x, y, chunk_size=args.chunk_size, workers=workers)
+            rate = args.points / (time.perf_counter() - start)
+            print(f"vectorized, {workers} worker(s):    {rate:>14,.0f} points/s ({rate / per_point_rate:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Measures how long the Pulumi program takes to import, which every `pulumi
+preview` and `pulumi up` pays before it creates a single resource.
+
+The imports at the top of `__main__.py` are run in fresh interpreters with
+`python -X importtime`, after one run to write the bytecode caches, and the
+`import time: self | cumulative | name` lines Python prints are parsed into
+a report: the median total time, the median time of the program's own
+modules (`filebase64sha256` and `pulumi_infrastructure`, including everything
+they import which `pulumi` and `pulumi_aws` have not already), the modules
+which took longest and the `pulumi_aws` submodules the program pulled in.
+
+The total is dominated by `pulumi_aws`, which imports all of its submodules,
+so the program's own time is the one to budget; `tests/test_pulumi_startup.py`
+holds it to a fixed limit, importing the program against minimal stand-ins
+for `pulumi` and `pulumi_aws` so that it runs without them installed.  The
+run fails if the median total exceeds `--max-ms` or the program's own time
+exceeds `--max-program-ms`.
+
+Usage: python3 benchmarks/pulumi_import.py [--runs 5] [--max-ms MS] [--max-program-ms MS] [--output report.json]
+"""
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from typing import Dict, List
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PROGRAM = os.path.join(ROOT, "__main__.py")
+TOP_MODULES = 15
+
+
+def program_imports(path: str = PROGRAM) -> str:
+    """
+    Returns the module-level import statements of the Pulumi program.
+    """
+    with open(path) as f:
+        source = f.read()
+    statements = [ast.get_source_segment(source, node) for node in ast.parse(source).body
+                  if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return "\n".join(statements)
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """
+    Parses the output of `-X importtime` into `{"module", "depth", "self_us",
+    "cumulative_us"}` entries, in the order Python printed them.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        entries.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_us": int(fields[0]),
+            "cumulative_us": int(fields[1]),
+        })
+    return entries
+
+
+def measure(code: str, python: str = sys.executable, env: Dict[str, str] = None) -> List[Dict]:
+    result = subprocess.run([python, "-X", "importtime", "-c", code], cwd=ROOT, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, universal_newlines=True, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(f"importing the program failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def is_program_module(module: str, root: str = ROOT) -> bool:
+    top = module.split(".")[0]
+    return os.path.isdir(os.path.join(root, top)) or os.path.isfile(os.path.join(root, f"{top}.py"))
+
+
+def summarize(runs: List[List[Dict]]) -> Dict:
+    totals = [sum(e["cumulative_us"] for e in entries if e["depth"] == 0) / 1000 for entries in runs]
+    program = [sum(e["cumulative_us"] for e in entries if e["depth"] == 0 and is_program_module(e["module"])) / 1000
+               for entries in runs]
+    cumulative: Dict[str, List[int]] = {}
+    for entries in runs:
+        for entry in entries:
+            cumulative.setdefault(entry["module"], []).append(entry["cumulative_us"])
+    modules = sorted(((m, statistics.median(us) / 1000) for m, us in cumulative.items()), key=lambda m: -m[1])
+    return {
+        "total_ms": round(statistics.median(totals), 3),
+        "runs_ms": [round(t, 3) for t in totals],
+        "program_ms": round(statistics.median(program), 3),
+        "module_count": len(cumulative),
+        "top_modules": [{"module": m, "cumulative_ms": round(ms, 3)} for m, ms in modules[:TOP_MODULES]],
+        "pulumi_aws_modules": sorted(m for m in cumulative if m.startswith("pulumi_aws.")
+                                     and m.count(".") == 1 and not m.startswith("pulumi_aws._")),
+        "modules": sorted(cumulative),
+    }
+
+
+def run(runs: int = 5, python: str = sys.executable, env: Dict[str, str] = None) -> Dict:
+    """
+    Measures the program's imports in `runs` fresh interpreters, after one
+    run to write the bytecode caches, and returns the summary.  `env` is the
+    interpreters' environment, e.g. with `PYTHONPATH` pointing at stand-ins
+    for `pulumi` and `pulumi_aws`.
+    """
+    code = program_imports()
+    measure(code, python, env)
+    return summarize([measure(code, python, env) for _ in range(runs)])
+
+
+def failures(report: Dict, max_ms: float = None, max_program_ms: float = None) -> List[str]:
+    found = []
+    if max_ms is not None and report["total_ms"] > max_ms:
+        found.append(f"import time {report['total_ms']:.1f} ms exceeds {max_ms:.1f} ms")
+    if max_program_ms is not None and report["program_ms"] > max_program_ms:
+        found.append(f"the program's own modules take {report['program_ms']:.1f} ms, over {max_program_ms:.1f} ms")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the import time of the Pulumi program")
+    parser.add_argument("--runs", type=int, default=5, help="Interpreters to measure")
+    parser.add_argument("--python", default=sys.executable, help="Python interpreter the program runs under")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    parser.add_argument("--max-ms", type=float, help="Largest allowed median import time")
+    parser.add_argument("--max-program-ms", type=float, help="Largest allowed median time of the program's own modules")
+    args = parser.parse_args()
+
+    report = run(args.runs, args.python)
+
+    print(f"Pulumi program imports: median {report['total_ms']:.1f} ms over {args.runs} runs, "
+          f"{report['program_ms']:.1f} ms in the program's own modules, {report['module_count']} modules")
+    for entry in report["top_modules"]:
+        print(f"  {entry['cumulative_ms']:>10.1f} ms  {entry['module']}")
+    print(f"pulumi_aws modules imported ({len(report['pulumi_aws_modules'])}): "
+          f"{', '.join(report['pulumi_aws_modules']) or 'none'}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+
+    found = failures(report, args.max_ms, args.max_program_ms)
+    for failure in found:
+        print(f"REGRESSION: {failure}", file=sys.stderr)
+    if found:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,25 @@
 #!/bin/sh
 
 # This script uses Homebrew to install the contents of Brewfile to a specified path,
-# so that the libraries can be used by AWS Lambda.  It also installs ld and objdump
-# to the same path, as these are necessary for Lambda functions using Python.
+# so that the libraries can be used by AWS Lambda.  It also writes a manifest of
+# the installed libraries, which the Lambda uses to load them by absolute path
+# (see src/library_resolver.py).
 #
-# It works by invoking a Docker instance.
+# It works by invoking a Docker instance, or, if BOTTLES_DIR is set to a directory
+# of Homebrew bottle tarballs, without Docker or Homebrew by extracting and
+# relocating the bottles itself (see build_tools/bottles.py).
 #
 # Usage: brew_install.sh [output_path]
 #
-# where `output_path` is an absolute path.
+# where `output_path` is an absolute path.  The number of parallel copy workers
+# used when syncing libraries to `output_path` can be set with SYNC_WORKERS.
+# Only the libraries named in ROOT_LIBRARIES (those loaded by the Lambda) and
+# their dependencies are installed.  Each install creates a new generation of
+# `output_path`; generations unused for GENERATION_RETENTION_HOURS are deleted.
+# Setting BUNDLE=1 also packs each generation into a single archive which the
+# Lambda unpacks to /tmp at startup (see src/bundle_loader.py).  Libraries are
+# stripped of debug and unneeded sections unless STRIP=0; the originals are kept
+# in the generation's debug/lib folder.
 
 if [ "$#" -ne 1 ]; then
     echo "Usage: $0 [output_path]"
@@ -16,48 +27,137 @@ if [ "$#" -ne 1 ]; then
 fi
 
 OUTPUT_PATH=$1
+SYNC_WORKERS=${SYNC_WORKERS:-16}
+ROOT_LIBRARIES=${ROOT_LIBRARIES:-"proj exif"}
+GENERATION_RETENTION_HOURS=${GENERATION_RETENTION_HOURS:-24}
+BUNDLE=${BUNDLE:-0}
+STRIP=${STRIP:-1}
+BOTTLES_DIR=${BOTTLES_DIR:-}
+ROOT_ARGS=""
+for ROOT in ${ROOT_LIBRARIES}; do
+    ROOT_ARGS="${ROOT_ARGS} --root ${ROOT}"
+done
+
+if [ -n "${BOTTLES_DIR}" ]; then
+    INPUT_DIR=$(pwd)
+    PACKAGES_PATH=${OUTPUT_PATH}
+    BREW_PREFIX=/tmp/brew_prefix
+    SUDO=""
+    [ -w "${OUTPUT_PATH}" ] || SUDO=sudo
+else
+    INPUT_DIR=/inputdir
+    PACKAGES_PATH=/lambda_packages
+    BREW_PREFIX=/home/linuxbrew/.linuxbrew
+    SUDO=sudo
+fi
 
 # Docker script which:
-#  1. Ensures that objdump and ld are present
+#  1. Ensures that python3 is present, for the build_tools scripts
 #  2. Installs dependencies with brew
-#  3. Copies them to the EFS lambda_packages/lib folder
 
-SCRIPT="
+BREW_SCRIPT="
 
 if [ ! -f /inputdir/Brewfile ]; then
   echo 'ERROR: Cannot find Brewfile in local directory';
 fi;
 
-sudo mkdir -p /lambda_packages/bin;
-sudo mkdir -p /lambda_packages/lib;
-
-if [ ! -f /lambda_packages/bin/ld ] || [ ! -f /lambda_packages/bin/objdump ]; then
-    echo 'Installing objdump and ld...';
-    sudo yum install -y yum-utils rpmdevtools;
-    sudo yumdownloader --resolve binutils;
-    rpmdev-extract *.rpm;
-    sudo cp -P -R ./binutils*/usr/lib64/* /lambda_packages/lib;
-    sudo cp -P ./binutils*/usr/bin/ld.bfd /lambda_packages/bin/ld;
-    sudo cp -P ./binutils*/usr/bin/objdump /lambda_packages/bin;
-    sudo rm -rf ./binutils;
-    sudo chmod +x /lambda_packages/bin/ld
+if ! command -v python3 > /dev/null; then
+    echo 'Installing python3...';
+    sudo yum install -y python3;
 fi
 
 echo 'Invoking brew...'
 cp /inputdir/Brewfile .;
 brew bundle;
+"
+
+# Script, run in Docker after BREW_SCRIPT or directly after installing bottles, which:
+#  3. Selects the libraries the Lambda loads, plus their dependencies, sets
+#     their run paths to $ORIGIN and strips them
+#  4. Stores them once each in the EFS lambda_packages/blobs folder, copying only
+#     new files, and builds a new generation's lib folder as links into it, along
+#     with its share/proj folder of PROJ data (see src/proj_data.py) and the
+#     unstripped libraries in debug/lib
+#  5. Writes the soname manifest for the generation, checks its size per formula
+#     against footprint_budgets.json (see build_tools/footprint.py), and
+#     optionally bundles it
+#  6. Atomically makes the new generation current and deletes unused old ones,
+#     or deletes the new generation if any step failed
+#  7. Reports how many failed probes the dynamic linker will make
+
+INSTALL_SCRIPT="
+
+# Stop at the first failed step, so that a partial generation is never activated
+set -e;
+
+${SUDO} mkdir -p ${PACKAGES_PATH}/bin;
+${SUDO} mkdir -p ${PACKAGES_PATH}/lib;
+
+echo 'Selecting required libraries...';
+cd ${INPUT_DIR};
+python3 -m build_tools.prune ${BREW_PREFIX}/lib /tmp/lib_staging ${ROOT_ARGS};
+
+echo 'Setting library run paths to \$ORIGIN...';
+python3 -m build_tools.rpath patch /tmp/lib_staging;
+
+rm -rf /tmp/lib_unstripped;
+if [ '${STRIP}' = '1' ]; then
+    echo 'Stripping debug and unneeded sections...';
+    python3 -m build_tools.strip /tmp/lib_staging --originals /tmp/lib_unstripped;
+fi
+
+GENERATION=\$(${SUDO} python3 -m build_tools.generations create ${PACKAGES_PATH});
+# Delete the new generation if any step before its activation fails, so that
+# it does not push a generation which can be rolled back to out of those kept
+trap '[ \$? -eq 0 ] || ${SUDO} python3 -m build_tools.generations discard ${PACKAGES_PATH} \${GENERATION}' EXIT;
+echo \"Installing libraries to lambda_packages generation \${GENERATION}...\";
+${SUDO} python3 -m build_tools.blob_store install /tmp/lib_staging ${PACKAGES_PATH} --lib generations/\${GENERATION}/lib --workers ${SYNC_WORKERS};
+if [ -d ${BREW_PREFIX}/share/proj ]; then
+    echo 'Installing PROJ data...';
+    ${SUDO} python3 -m build_tools.blob_store install ${BREW_PREFIX}/share/proj ${PACKAGES_PATH} --lib generations/\${GENERATION}/share/proj --workers ${SYNC_WORKERS};
+fi
+if [ -d /tmp/lib_unstripped ]; then
+    echo 'Installing unstripped libraries for debugging...';
+    ${SUDO} python3 -m build_tools.blob_store install /tmp/lib_unstripped ${PACKAGES_PATH} --lib generations/\${GENERATION}/debug/lib --workers ${SYNC_WORKERS};
+fi
 
+echo 'Writing library manifest...';
+${SUDO} python3 -m build_tools.manifest ${PACKAGES_PATH}/generations/\${GENERATION};
 
-echo 'Copying libraries to lambda_packages/lib...';
-sudo cp -LR /home/linuxbrew/.linuxbrew/lib/* /lambda_packages/lib;
+echo 'Checking footprint against budgets...';
+if ! ${SUDO} python3 -m build_tools.footprint ${PACKAGES_PATH}/generations/\${GENERATION} --cellar ${BREW_PREFIX}/Cellar ${ROOT_ARGS} --budgets footprint_budgets.json --previous ${PACKAGES_PATH}/current/footprint_report.json; then
+    echo 'ERROR: footprint budgets exceeded, discarding generation';
+    exit 1;
+fi
+
+if [ '${BUNDLE}' = '1' ]; then
+    echo 'Packing generation into a single bundle...';
+    ${SUDO} python3 -m build_tools.bundle ${PACKAGES_PATH}/generations/\${GENERATION};
+fi
+
+echo 'Activating generation...';
+${SUDO} python3 -m build_tools.generations activate ${PACKAGES_PATH} \${GENERATION};
+trap - EXIT;
+${SUDO} python3 -m build_tools.generations gc ${PACKAGES_PATH} --retention-hours ${GENERATION_RETENTION_HOURS};
+
+echo 'Analyzing library search paths...';
+python3 -m build_tools.rpath analyze ${PACKAGES_PATH}/lib ${ROOT_ARGS} --map /mnt/efs/lambda_packages=${PACKAGES_PATH};
 
 echo 'Done.';
 "
 
+if [ -n "${BOTTLES_DIR}" ]; then
+    echo "Installing bottles from ${BOTTLES_DIR}...";
+    rm -rf ${BREW_PREFIX}
+    python3 -m build_tools.bottles install ${BOTTLES_DIR} ${BREW_PREFIX} --brewfile Brewfile --workers ${SYNC_WORKERS} || exit 1
+    sh -c "${INSTALL_SCRIPT}"
+    exit $?
+fi
+
 echo "Launching Docker...";
 
 # Run docker to install contents of brewfile
 docker run \
     -v $(pwd):/inputdir \
     -v ${OUTPUT_PATH}:/lambda_packages \
-    nuagestudio/amazonlinuxbrew bash -c "${SCRIPT}"
+    nuagestudio/amazonlinuxbrew bash -c "${BREW_SCRIPT}${INSTALL_SCRIPT}"
@@ -8,6 +8,9 @@
 # on any machine with access to the EFS and with yum installed.
 #
 # Usage: brew_install_efs.sh [efs_filesystem_id]
+#
+# With MOUNT_ONLY=1, the script only mounts the filesystem, e.g. so that the build
+# pipeline can keep its stamp file on it (see build_tools/pipeline.py).
 
 if [ "$#" -ne 1 ]; then
     echo "Usage: $0 [efs_filesystem_id]"
@@ -18,6 +21,9 @@ EFS_ID=$1
 MOUNT_PATH=/mnt/efs
 REGION="eu-west-1"
 
+# CodeBuild has spare cores while copying, and EFS rewards parallel writers
+export SYNC_WORKERS=${SYNC_WORKERS:-32}
+
 # If EFS has not yet been mounted, mount it
 
 if ! mount | grep -q "$EFS_ID"; then
@@ -37,4 +43,8 @@ if ! mount | grep -q "$EFS_ID"; then
     echo "Mounted successfully.";
 fi
 
+if [ "${MOUNT_ONLY}" = "1" ]; then
+    exit 0
+fi
+
 ./brew_install.sh ${MOUNT_PATH}/lambda_packages;
@@ -0,0 +1,260 @@
+"""
+Installs libraries into `lambda_packages` through a content-addressed blob
+store, instead of writing a full copy of every file.
+
+Each distinct file is stored once, as `blobs/<sha256[:2]>/<sha256>`.  In the
+library directory, one name per blob (the most specific version, e.g.
+`libproj.so.22.1.1`) is linked to the blob, and the other names which Homebrew
+provides for the same file (`libproj.so`, `libproj.so.22`) are rebuilt as
+relative symlinks to it.  Blobs which no library directory refers to any more
+can be garbage collected.
+
+Usage:
+    python3 -m build_tools.blob_store install [source] [packages_path] [--lib DIR] [--link hard|symlink]
+    python3 -m build_tools.blob_store gc [packages_path]
+"""
+
+import argparse
+import glob
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Set, Tuple
+
+from .sync import copy_file, list_files, remove_empty_directories, sha256_file
+
+
+BLOBS_DIRECTORY = "blobs"
+GENERATIONS_DIRECTORY = "generations"
+INSTALLED_DIRECTORIES = ["lib", "share", "debug"]
+
+
+class DedupeReport:
+    """
+    Totals for an install.  Logical bytes are what `cp -L` would have written,
+    stored bytes are the size of the distinct blobs referenced by the install.
+    """
+
+    def __init__(self):
+        self.files = 0
+        self.blobs = 0
+        self.blobs_written = 0
+        self.blobs_reused = 0
+        self.blobs_collected = 0
+        self.logical_bytes = 0
+        self.stored_bytes = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.logical_bytes - self.stored_bytes
+
+    def as_dict(self) -> Dict:
+        result = dict(vars(self))
+        result["bytes_saved"] = self.bytes_saved
+        return result
+
+    def __str__(self):
+        return (
+            f"{self.files} files stored as {self.blobs} blobs "
+            f"({self.blobs_written} written, {self.blobs_reused} reused); "
+            f"{self.logical_bytes} logical bytes, {self.stored_bytes} stored, {self.bytes_saved} saved"
+        )
+
+
+def blob_path(store: str, digest: str) -> str:
+    return os.path.join(store, digest[:2], digest)
+
+
+def canonical_name(source: str, relative_paths: List[str]) -> str:
+    """
+    Chooses which of several identical files gets linked to the blob: the one
+    the Homebrew symlinks ultimately point at if present, otherwise the longest
+    (most specific) name.
+    """
+    for relative_path in relative_paths:
+        real_name = os.path.basename(os.path.realpath(os.path.join(source, relative_path)))
+        candidate = os.path.join(os.path.dirname(relative_path), real_name)
+        if candidate in relative_paths:
+            return candidate
+    return max(relative_paths, key=lambda p: (len(p), p))
+
+
+def replace_link(target_path: str, create):
+    """
+    Creates a link under a temporary name with `create(temp_path)` and renames
+    it over `target_path`, so readers always see either the old or new file.
+    """
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    temp_path = target_path + ".link-tmp"
+    if os.path.lexists(temp_path):
+        os.remove(temp_path)
+    create(temp_path)
+    os.replace(temp_path, target_path)
+
+
+def link_matches(path: str, blob: str, hardlink: bool) -> bool:
+    if hardlink:
+        return os.path.isfile(path) and not os.path.islink(path) and os.path.samefile(path, blob)
+    return os.path.islink(path) and os.path.realpath(path) == os.path.realpath(blob)
+
+
+def install(source: str, packages_path: str, lib_name: str = "lib", hardlink: bool = True,
+            workers: int = 16) -> DedupeReport:
+    """
+    Stores every file below `source` in the blob store and rebuilds
+    `packages_path/lib_name` as links into it.  Entries of the library
+    directory which are no longer in `source` are removed.
+    """
+    report = DedupeReport()
+    store = os.path.join(packages_path, BLOBS_DIRECTORY)
+    target = os.path.join(packages_path, lib_name)
+    source_files = list_files(source)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        digests = list(pool.map(lambda f: sha256_file(os.path.join(source, f)), source_files))
+
+        groups: Dict[Tuple[str, str], List[str]] = {}
+        for relative_path, digest in zip(source_files, digests):
+            groups.setdefault((os.path.dirname(relative_path), digest), []).append(relative_path)
+            report.logical_bytes += os.path.getsize(os.path.join(source, relative_path))
+        report.files = len(source_files)
+
+        first_paths = {}
+        for relative_path, digest in zip(source_files, digests):
+            first_paths.setdefault(digest, relative_path)
+
+        missing = [d for d in first_paths if not os.path.isfile(blob_path(store, d))]
+        list(pool.map(lambda d: copy_file(os.path.join(source, first_paths[d]), blob_path(store, d)), missing))
+
+    report.blobs = len(first_paths)
+    report.blobs_written = len(missing)
+    report.blobs_reused = report.blobs - report.blobs_written
+    report.stored_bytes = sum(os.path.getsize(blob_path(store, d)) for d in first_paths)
+
+    wanted: Set[str] = set()
+    for (directory, digest), relative_paths in groups.items():
+        canonical = canonical_name(source, relative_paths)
+        canonical_path = os.path.join(target, canonical)
+        blob = blob_path(store, digest)
+        wanted.update(relative_paths)
+
+        if not link_matches(canonical_path, blob, hardlink):
+            if hardlink:
+                replace_link(canonical_path, lambda temp: os.link(blob, temp))
+            else:
+                relative_blob = os.path.relpath(blob, os.path.dirname(canonical_path))
+                replace_link(canonical_path, lambda temp: os.symlink(relative_blob, temp))
+
+        for relative_path in relative_paths:
+            if relative_path == canonical:
+                continue
+            alias_path = os.path.join(target, relative_path)
+            link_target = os.path.basename(canonical)
+            if not (os.path.islink(alias_path) and os.readlink(alias_path) == link_target):
+                replace_link(alias_path, lambda temp: os.symlink(link_target, temp))
+
+    for directory, _, filenames in os.walk(target):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            if os.path.relpath(path, target) not in wanted:
+                os.remove(path)
+    remove_empty_directories(target)
+
+    return report
+
+
+def referenced_blobs(packages_path: str, lib_names: List[str]) -> Set[str]:
+    """
+    Returns the real paths of the blobs referenced, by symlink or hardlink,
+    from the given library directories.
+    """
+    store = os.path.realpath(os.path.join(packages_path, BLOBS_DIRECTORY))
+    referenced = set()
+    inodes = set()
+
+    for lib_name in lib_names:
+        for directory, _, filenames in os.walk(os.path.join(packages_path, lib_name)):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                if os.path.islink(path):
+                    referenced.add(os.path.realpath(path))
+                else:
+                    stat = os.stat(path)
+                    inodes.add((stat.st_dev, stat.st_ino))
+
+    for directory, _, filenames in os.walk(store):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            stat = os.stat(path)
+            if (stat.st_dev, stat.st_ino) in inodes:
+                referenced.add(path)
+
+    return referenced
+
+
+def library_directories(packages_path: str) -> List[str]:
+    """
+    Returns every installed directory which may refer to the blob store: plain
+    `lib`, `share` and `debug` directories, and those of each generation.
+    """
+    lib_names = []
+    for name in INSTALLED_DIRECTORIES:
+        path = os.path.join(packages_path, name)
+        if os.path.isdir(path) and not os.path.islink(path):
+            lib_names.append(name)
+    for name in INSTALLED_DIRECTORIES:
+        for path in sorted(glob.glob(os.path.join(packages_path, GENERATIONS_DIRECTORY, "*", name))):
+            lib_names.append(os.path.relpath(path, packages_path))
+    return lib_names
+
+
+def collect_garbage(packages_path: str, lib_names: List[str] = None) -> int:
+    """
+    Deletes blobs which none of the library directories refer to, returning
+    the number removed.  By default every library directory in
+    `packages_path` is considered.
+    """
+    store = os.path.realpath(os.path.join(packages_path, BLOBS_DIRECTORY))
+    if lib_names is None:
+        lib_names = library_directories(packages_path)
+    referenced = referenced_blobs(packages_path, lib_names)
+    removed = 0
+
+    for relative_path in list_files(store):
+        path = os.path.join(store, relative_path)
+        if path not in referenced:
+            os.remove(path)
+            removed += 1
+
+    remove_empty_directories(store)
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Content-addressed installs into lambda_packages")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    install_parser = subparsers.add_parser("install", help="Install a directory through the blob store")
+    install_parser.add_argument("source", help="Directory to install, e.g. the pruned staging directory")
+    install_parser.add_argument("packages_path", help="Path of the lambda_packages directory")
+    install_parser.add_argument("--lib", default="lib",
+        help="Directory to rebuild, relative to packages_path, e.g. lib or share/proj")
+    install_parser.add_argument("--link", choices=["hard", "symlink"], default="hard",
+        help="How the canonical file of each soname chain refers to its blob")
+    install_parser.add_argument("--workers", type=int, default=16, help="Number of parallel copy workers")
+
+    gc_parser = subparsers.add_parser("gc", help="Delete blobs which are no longer referenced")
+    gc_parser.add_argument("packages_path", help="Path of the lambda_packages directory")
+
+    args = parser.parse_args()
+
+    if args.command == "install":
+        report = install(args.source, args.packages_path, lib_name=args.lib, hardlink=args.link == "hard", workers=args.workers)
+        report.blobs_collected = collect_garbage(args.packages_path)
+        print(f"Installed {args.source}: {report}; {report.blobs_collected} unreferenced blobs collected")
+    else:
+        print(f"Collected {collect_garbage(args.packages_path)} unreferenced blobs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""
+Installs Homebrew bottles without Homebrew or Docker.
+
+The formulae in `Brewfile`, and their runtime dependencies as recorded in each
+bottle's `INSTALL_RECEIPT.json`, are resolved against a local directory of
+bottle tarballs (e.g. `proj--7.2.1.x86_64_linux.bottle.tar.gz`).  The bottles
+are extracted concurrently into `Cellar`, the `@@HOMEBREW_PREFIX@@` and
+`@@HOMEBREW_CELLAR@@` placeholders are rewritten to the prefix the files will
+be used from, and each keg is linked into the prefix's `lib`, `share` and
+`bin` directories, as `brew link` would, ready for `build_tools.prune`.
+
+Placeholders in text files are simply replaced.  In ELF files, a run path
+containing a placeholder is set to `$ORIGIN` and the interpreter to the
+system's; any other string containing a placeholder, or the prefix the bottle
+was built in (which Homebrew leaves in compiled-in strings), is rewritten in
+place if the result fits, and reported otherwise.
+
+Usage: python3 -m build_tools.bottles install [bottles_dir] [prefix] [--brewfile Brewfile] [--target-prefix /mnt/efs/lambda_packages]
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import stat
+import tarfile
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .elf import ELF_MAGIC, PT_INTERP, ElfError, ElfFile
+from .rpath import set_runpath
+
+
+CELLAR_DIRECTORY = "Cellar"
+LINKED_DIRECTORIES = ["bin", "etc", "lib", "share"]
+RECEIPT_NAME = "INSTALL_RECEIPT.json"
+DEFAULT_INTERPRETER = "/lib64/ld-linux-x86-64.so.2"
+BUILD_PREFIX = "/home/linuxbrew/.linuxbrew"
+BOTTLE_PATTERN = re.compile(r"^(?P<name>.+?)--(?P<version>.+)\.(?P<tag>[a-z0-9_]+)\.bottle(?:\.\d+)?\.tar\.gz$")
+
+
+class Bottle(NamedTuple):
+    name: str
+    version: str
+    path: str
+    dependencies: List[str]
+
+
+class RelocationReport:
+    def __init__(self):
+        self.bottles = 0
+        self.files = 0
+        self.text_files = 0
+        self.elf_files = 0
+        self.links = 0
+        self.conflicts: List[str] = []
+        self.unrelocated: Dict[str, List[str]] = {}
+        self.extract_seconds = 0.0
+        self.relocate_seconds = 0.0
+
+    def as_dict(self) -> Dict:
+        return dict(vars(self))
+
+    def __str__(self):
+        return (
+            f"{self.bottles} bottles, {self.files} files: {self.text_files} text and {self.elf_files} ELF files "
+            f"relocated, {sum(len(s) for s in self.unrelocated.values())} strings could not be; {self.links} links; "
+            f"extracted in {self.extract_seconds:.2f} s, relocated in {self.relocate_seconds:.2f} s"
+        )
+
+
+def brewfile_formulae(brewfile: str) -> List[str]:
+    """
+    Returns the formulae named by `brew "..."` lines.
+    """
+    formulae = []
+    with open(brewfile) as f:
+        for line in f:
+            match = re.match(r"""^\s*brew\s+["']([^"']+)["']""", line)
+            if match:
+                formulae.append(match.group(1).split("/")[-1])
+    return formulae
+
+
+def _version_key(version: str):
+    return [(0, int(part)) if part.isdigit() else (1, part) for part in re.split(r"[._-]", version)]
+
+
+def read_bottle(path: str) -> Bottle:
+    """
+    Reads the name, version and runtime dependencies of a bottle from its
+    receipt.
+    """
+    match = BOTTLE_PATTERN.match(os.path.basename(path))
+    if match is None:
+        raise ValueError(f"Not a bottle: {path}")
+    name, version = match.group("name"), match.group("version")
+
+    dependencies = []
+    with tarfile.open(path) as tar:
+        for member in tar:
+            parts = member.name.split("/")
+            if len(parts) == 3 and parts[0] == name and parts[2] == RECEIPT_NAME:
+                version = parts[1]
+                receipt = json.load(tar.extractfile(member))
+                dependencies = [d["full_name"].split("/")[-1] for d in receipt.get("runtime_dependencies") or []]
+                break
+    return Bottle(name, version, path, dependencies)
+
+
+def resolve(bottles_dir: str, formulae: List[str]) -> List[Bottle]:
+    """
+    Returns the bottles for `formulae` and their runtime dependencies,
+    dependencies first.  Where there are several bottles of a formula, the
+    highest version is used.
+    """
+    available: Dict[str, str] = {}
+    for path in glob.glob(os.path.join(bottles_dir, "*.bottle*.tar.gz")):
+        match = BOTTLE_PATTERN.match(os.path.basename(path))
+        if match is None:
+            continue
+        name = match.group("name")
+        if name not in available or _version_key(match.group("version")) > _version_key(
+                BOTTLE_PATTERN.match(os.path.basename(available[name])).group("version")):
+            available[name] = path
+
+    order: List[Bottle] = []
+    seen = set()
+
+    def visit(name: str):
+        if name in seen:
+            return
+        seen.add(name)
+        if name not in available:
+            raise FileNotFoundError(f"No bottle for {name} in {bottles_dir}")
+        bottle = read_bottle(available[name])
+        for dependency in bottle.dependencies:
+            visit(dependency)
+        order.append(bottle)
+
+    for formula in formulae:
+        visit(formula)
+    return order
+
+
+def extract(bottle: Bottle, cellar: str) -> List[str]:
+    """
+    Extracts a bottle into `cellar`, returning the paths of the regular files
+    written.  Members which would land outside the bottle's keg are refused.
+    """
+    keg_prefix = f"{bottle.name}/"
+    files = []
+    with tarfile.open(bottle.path) as tar:
+        members = []
+        for member in tar.getmembers():
+            name = os.path.normpath(member.name)
+            if os.path.isabs(name) or name.startswith("..") or not (name + "/").startswith(keg_prefix):
+                raise ValueError(f"Unsafe path {member.name} in {bottle.path}")
+            if member.issym() and os.path.isabs(member.linkname):
+                raise ValueError(f"Absolute symlink {member.name} in {bottle.path}")
+            if not (member.isfile() or member.isdir() or member.issym()):
+                continue
+            members.append(member)
+            if member.isfile():
+                files.append(os.path.join(cellar, name))
+        tar.extractall(cellar, members=members)
+    return files
+
+
+def replace_placeholders(data: bytes, replacements: Dict[bytes, bytes]) -> bytes:
+    for placeholder, value in replacements.items():
+        data = data.replace(placeholder, value)
+    return data
+
+
+def relocate_text(path: str, data: bytes, replacements: Dict[bytes, bytes]) -> bool:
+    relocated = replace_placeholders(data, replacements)
+    if relocated == data:
+        return False
+    mode = stat.S_IMODE(os.stat(path).st_mode)
+    temp_path = path + ".relocate-tmp"
+    with open(temp_path, "wb") as f:
+        f.write(relocated)
+    os.chmod(temp_path, mode | stat.S_IWUSR)
+    os.replace(temp_path, path)
+    return True
+
+
+def relocate_elf(path: str, replacements: Dict[bytes, bytes], interpreter: str = DEFAULT_INTERPRETER) -> List[str]:
+    """
+    Rewrites placeholders in an ELF file in place, as described above.
+    Returns the strings which could not be rewritten because the result
+    would not fit.
+    """
+    os.chmod(path, stat.S_IMODE(os.stat(path).st_mode) | stat.S_IWUSR)
+    try:
+        with open(path, "rb") as f:
+            info = ElfFile(f).dynamic_info()
+        search_path = info.runpath or info.rpath or ""
+        if any(p.decode() in search_path for p in replacements):
+            set_runpath(path, "$ORIGIN")
+    except ElfError:
+        pass
+
+    with open(path, "rb") as f:
+        data = bytearray(f.read())
+
+    try:
+        with open(path, "rb") as f:
+            interp = next((h for h in ElfFile(f).program_headers() if h.type == PT_INTERP), None)
+        if interp is not None:
+            current = bytes(data[interp.offset:interp.offset + interp.filesz]).split(b"\0", 1)[0]
+            new = interpreter.encode()
+            if any(p in current for p in replacements) and len(new) <= len(current):
+                data[interp.offset:interp.offset + len(current)] = new.ljust(len(current), b"\0")
+    except ElfError:
+        pass
+
+    unrelocated = []
+    for placeholder in replacements:
+        index = data.find(placeholder)
+        while index >= 0:
+            start = index
+            while start > 0 and 0x20 <= data[start - 1] < 0x7F:
+                start -= 1
+            end = data.find(b"\0", index)
+            end = len(data) if end < 0 else end
+            original = bytes(data[start:end])
+            relocated = replace_placeholders(original, replacements)
+            if len(relocated) <= len(original):
+                data[start:end] = relocated.ljust(len(original), b"\0")
+            else:
+                unrelocated.append(original.decode("utf-8", "replace"))
+            index = data.find(placeholder, end)
+
+    with open(path, "r+b") as f:
+        f.write(data)
+    return unrelocated
+
+
+def relocate_file(path: str, replacements: Dict[bytes, bytes]) -> Tuple[Optional[str], List[str]]:
+    """
+    Relocates one file, returning whether it was a `"text"` or `"elf"` file
+    containing placeholders (or `None`), and any strings left unrelocated.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not any(p in data for p in replacements):
+        return None, []
+    if data.startswith(ELF_MAGIC):
+        return "elf", relocate_elf(path, replacements)
+    if b"\0" not in data[:8192]:
+        return ("text" if relocate_text(path, data, replacements) else None), []
+    return None, []
+
+
+def link_keg(keg: str, prefix: str, report: RelocationReport):
+    """
+    Links each file of a keg into the prefix with a relative symlink, as
+    `brew link` does.  If two kegs provide the same file, the first wins.
+    """
+    for directory in LINKED_DIRECTORIES:
+        source_root = os.path.join(keg, directory)
+        for root, _, filenames in os.walk(source_root):
+            target_root = os.path.join(prefix, directory, os.path.relpath(root, source_root))
+            os.makedirs(target_root, exist_ok=True)
+            for filename in filenames:
+                target = os.path.join(target_root, filename)
+                if os.path.lexists(target):
+                    if os.path.realpath(target) != os.path.realpath(os.path.join(root, filename)):
+                        report.conflicts.append(os.path.relpath(target, prefix))
+                    continue
+                os.symlink(os.path.relpath(os.path.join(root, filename), target_root), target)
+                report.links += 1
+
+
+def install(bottles_dir: str, prefix: str, formulae: List[str], target_prefix: str,
+            workers: int = 8) -> RelocationReport:
+    """
+    Extracts, relocates and links the bottles for `formulae` into `prefix`,
+    for use from `target_prefix`.
+    """
+    report = RelocationReport()
+    cellar = os.path.join(prefix, CELLAR_DIRECTORY)
+    os.makedirs(cellar, exist_ok=True)
+    bottles = resolve(bottles_dir, formulae)
+    report.bottles = len(bottles)
+
+    replacements = {
+        b"@@HOMEBREW_CELLAR@@": os.path.join(target_prefix, CELLAR_DIRECTORY).encode(),
+        b"@@HOMEBREW_PREFIX@@": target_prefix.encode(),
+        b"@@HOMEBREW_REPOSITORY@@": target_prefix.encode(),
+        b"@@HOMEBREW_LIBRARY@@": os.path.join(target_prefix, "Library").encode(),
+        os.path.join(BUILD_PREFIX, CELLAR_DIRECTORY).encode(): os.path.join(target_prefix, CELLAR_DIRECTORY).encode(),
+        BUILD_PREFIX.encode(): target_prefix.encode(),
+    }
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        start = time.perf_counter()
+        files = [path for paths in pool.map(lambda b: extract(b, cellar), bottles) for path in paths]
+        report.extract_seconds = time.perf_counter() - start
+        report.files = len(files)
+
+        start = time.perf_counter()
+        for path, (kind, unrelocated) in zip(files, pool.map(lambda p: relocate_file(p, replacements), files)):
+            if kind == "text":
+                report.text_files += 1
+            elif kind == "elf":
+                report.elf_files += 1
+            if unrelocated:
+                report.unrelocated[os.path.relpath(path, prefix)] = unrelocated
+        report.relocate_seconds = time.perf_counter() - start
+
+    for bottle in bottles:
+        keg = os.path.join(cellar, bottle.name, bottle.version)
+        opt_link = os.path.join(prefix, "opt", bottle.name)
+        os.makedirs(os.path.dirname(opt_link), exist_ok=True)
+        if not os.path.lexists(opt_link):
+            os.symlink(os.path.relpath(keg, os.path.dirname(opt_link)), opt_link)
+        link_keg(keg, prefix, report)
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Installs Homebrew bottles without Homebrew")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    install_parser = subparsers.add_parser("install", help="Extract, relocate and link bottles into a prefix")
+    install_parser.add_argument("bottles_dir", help="Directory of bottle tarballs")
+    install_parser.add_argument("prefix", help="Directory to install into, e.g. /tmp/brew_prefix")
+    install_parser.add_argument("--brewfile", default="Brewfile", help="Brewfile naming the formulae to install")
+    install_parser.add_argument("--formula", action="append", default=[], help="Install this formula too")
+    install_parser.add_argument("--target-prefix", default="/mnt/efs/lambda_packages",
+        help="Prefix the files are used from, substituted for @@HOMEBREW_PREFIX@@")
+    install_parser.add_argument("--workers", type=int, default=8, help="Number of parallel workers")
+    install_parser.add_argument("--output", help="Write the report as JSON to this file")
+
+    args = parser.parse_args()
+
+    formulae = (brewfile_formulae(args.brewfile) if os.path.exists(args.brewfile) else []) + args.formula
+    report = install(args.bottles_dir, args.prefix, formulae, args.target_prefix, args.workers)
+    print(f"Installed {', '.join(formulae)}: {report}")
+    for path, strings in sorted(report.unrelocated.items()):
+        for string in strings:
+            print(f"  not relocated: {path}: {string}")
+    for conflict in report.conflicts:
+        print(f"  conflict: {conflict}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report.as_dict(), f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Packs a `lambda_packages` generation into a single indexed archive, so that a
+cold-starting Lambda can fetch its libraries from EFS with one large
+sequential read instead of a metadata round-trip per file.
+
+Files are split into chunks which are compressed independently with zlib, so
+that `src/bundle_loader.py` can decompress them in parallel.  The layout is:
+
+    magic (8 bytes) | index offset (8) | index length (8) | chunks... | index
+
+where the index is JSON listing every directory, symlink and file, and for
+each file the offset and length of its chunks.
+
+Usage: python3 -m build_tools.bundle [generation_path] [--chunk-size BYTES]
+"""
+
+import argparse
+import json
+import os
+import struct
+import zlib
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from .generations import LAST_USED_NAME
+from .strip import DEBUG_DIRECTORY
+
+
+BUNDLE_NAME = "library_bundle.lpb"
+BUNDLE_MAGIC = b"LPBUNDL1"
+HEADER_FORMAT = "<8sQQ"
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def link_target(path: str) -> str:
+    """
+    Returns where a symlink points after following it by one step only.
+    """
+    return os.path.normpath(os.path.join(os.path.realpath(os.path.dirname(path)), os.readlink(path)))
+
+
+def walk_tree(root: str, exclude: List[str]) -> Tuple[List[str], List[Tuple[str, str]], List[str]]:
+    """
+    Returns the directories, internal symlinks and files below `root`,
+    leaving out any path in `exclude`.  A symlink is kept as a symlink only if it points inside the tree; anything
+    else (such as a link into the blob store) is packed as the file itself.
+    """
+    directories, symlinks, files = [], [], []
+    real_root = os.path.realpath(root)
+
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if os.path.relpath(os.path.join(directory, d), root) not in exclude)
+        for dirname in dirnames:
+            directories.append(os.path.relpath(os.path.join(directory, dirname), root))
+        for filename in sorted(filenames):
+            path = os.path.join(directory, filename)
+            relative_path = os.path.relpath(path, root)
+            if relative_path in exclude:
+                continue
+            if os.path.islink(path) and link_target(path).startswith(real_root + os.sep):
+                symlinks.append((relative_path, os.readlink(path)))
+            else:
+                files.append(relative_path)
+
+    return directories, symlinks, files
+
+
+def compress_chunk(args: Tuple[str, int, int, int]) -> bytes:
+    path, offset, length, level = args
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return zlib.compress(f.read(length), level)
+
+
+def pack(root: str, bundle_path: str = None, chunk_size: int = DEFAULT_CHUNK_SIZE, level: int = 6,
+         workers: int = 8) -> Dict:
+    """
+    Writes the bundle for `root` (by default to `root/library_bundle.lpb`) and
+    returns its index.
+    """
+    bundle_path = bundle_path or os.path.join(root, BUNDLE_NAME)
+    directories, symlinks, files = walk_tree(root, exclude=[os.path.relpath(bundle_path, root), LAST_USED_NAME, DEBUG_DIRECTORY])
+
+    jobs = []
+    entries = []
+    for relative_path in files:
+        path = os.path.join(root, relative_path)
+        stat = os.stat(path)
+        entry = {"path": relative_path, "mode": stat.st_mode & 0o7777, "size": stat.st_size,
+                 "mtime": int(stat.st_mtime), "chunks": []}
+        entries.append(entry)
+        for offset in range(0, stat.st_size, chunk_size):
+            jobs.append((entry, (path, offset, min(chunk_size, stat.st_size - offset), level)))
+
+    temp_path = bundle_path + ".tmp"
+    with open(temp_path, "wb") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        out.write(struct.pack(HEADER_FORMAT, BUNDLE_MAGIC, 0, 0))
+        position = out.tell()
+
+        for (entry, (_, offset, length, _)), data in zip(jobs, pool.map(compress_chunk, [job for _, job in jobs])):
+            out.write(data)
+            entry["chunks"].append([offset, position, len(data), length])
+            position += len(data)
+
+        index = {"directories": directories, "symlinks": symlinks, "files": entries}
+        index_data = json.dumps(index, separators=(",", ":")).encode()
+        out.write(index_data)
+        out.seek(0)
+        out.write(struct.pack(HEADER_FORMAT, BUNDLE_MAGIC, position, len(index_data)))
+
+    os.replace(temp_path, bundle_path)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Packs a lambda_packages generation into a single bundle")
+    parser.add_argument("root", help="Generation directory to pack")
+    parser.add_argument("--output", help="Bundle path (default: root/library_bundle.lpb)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Bytes per compressed chunk")
+    parser.add_argument("--level", type=int, default=6, help="zlib compression level")
+    args = parser.parse_args()
+
+    index = pack(args.root, args.output, chunk_size=args.chunk_size, level=args.level)
+    bundle_path = args.output or os.path.join(args.root, BUNDLE_NAME)
+    raw_size = sum(entry["size"] for entry in index["files"])
+    print(
+        f"Packed {len(index['files'])} files and {len(index['symlinks'])} symlinks "
+        f"({raw_size} bytes) into {bundle_path} ({os.path.getsize(bundle_path)} bytes)"
+    )
+
+
+if __name__ == "__main__":
+    main()
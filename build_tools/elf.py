@@ -0,0 +1,230 @@
+"""
+A small, dependency-free reader for the parts of an ELF shared object which
+matter to the dynamic linker: the soname, the `DT_NEEDED` entries and the
+library search paths.  It only ever reads the headers and the dynamic
+section, so it is cheap to run over a whole `lib` directory.
+"""
+
+import struct
+
+from typing import BinaryIO, List, NamedTuple, Optional
+
+
+ELF_MAGIC = b"\x7fELF"
+
+ELFCLASS32 = 1
+ELFCLASS64 = 2
+
+ET_EXEC = 2
+ET_DYN = 3
+
+PT_LOAD = 1
+PT_DYNAMIC = 2
+PT_INTERP = 3
+
+SHT_NOBITS = 8
+
+DT_NULL = 0
+DT_NEEDED = 1
+DT_STRTAB = 5
+DT_STRSZ = 10
+DT_SONAME = 14
+DT_RPATH = 15
+DT_RUNPATH = 29
+
+
+class ElfError(Exception):
+    """
+    Raised when a file is not an ELF object or is too malformed to read.
+    """
+
+
+class ProgramHeader(NamedTuple):
+    type: int
+    offset: int
+    vaddr: int
+    filesz: int
+    memsz: int
+
+
+class SectionHeader(NamedTuple):
+    name: int
+    type: int
+    flags: int
+    addr: int
+    offset: int
+    size: int
+    link: int
+    info: int
+    addralign: int
+    entsize: int
+
+
+class DynamicEntry(NamedTuple):
+    tag: int
+    value: int
+    offset: int
+
+
+class DynamicInfo(NamedTuple):
+    soname: Optional[str]
+    needed: List[str]
+    rpath: Optional[str]
+    runpath: Optional[str]
+
+
+class ElfFile:
+    """
+    A lazily-parsed view of an ELF object backed by an open binary file.
+    Nothing beyond the ELF header is read until it is asked for.
+    """
+
+    def __init__(self, file: BinaryIO):
+        self.file = file
+
+        ident = self._read(0, 16)
+        if len(ident) < 16 or ident[:4] != ELF_MAGIC:
+            raise ElfError("Not an ELF file")
+
+        self.elf_class = ident[4]
+        if self.elf_class not in (ELFCLASS32, ELFCLASS64):
+            raise ElfError(f"Unknown ELF class {self.elf_class}")
+
+        self.endian = "<" if ident[5] == 1 else ">"
+        is_64 = self.elf_class == ELFCLASS64
+
+        header_format = "HHIQQQIHHHHHH" if is_64 else "HHIIIIIHHHHHH"
+        header_size = struct.calcsize(self.endian + header_format)
+        (
+            self.type, self.machine, _, _, self.phoff, self.shoff, _, _,
+            self.phentsize, self.phnum, self.shentsize, self.shnum, self.shstrndx
+        ) = struct.unpack(self.endian + header_format, self._read(16, header_size, exact=True))
+
+        self._dynamic_format = self.endian + ("qQ" if is_64 else "iI")
+        self._dynamic_size = struct.calcsize(self._dynamic_format)
+        self._program_headers = None
+        self._section_headers = None
+        self._dynamic_entries = None
+
+    def _read(self, offset: int, size: int, exact: bool = False) -> bytes:
+        self.file.seek(offset)
+        data = self.file.read(size)
+        if exact and len(data) != size:
+            raise ElfError("Unexpected end of file")
+        return data
+
+    @property
+    def is_shared_object(self) -> bool:
+        return self.type == ET_DYN
+
+    def program_headers(self) -> List[ProgramHeader]:
+        if self._program_headers is None:
+            headers = []
+            for i in range(self.phnum):
+                raw = self._read(self.phoff + i * self.phentsize, self.phentsize, exact=True)
+                if self.elf_class == ELFCLASS64:
+                    p_type, _, p_offset, p_vaddr, _, p_filesz, p_memsz, _ = struct.unpack(self.endian + "IIQQQQQQ", raw[:56])
+                else:
+                    p_type, p_offset, p_vaddr, _, p_filesz, p_memsz, _, _ = struct.unpack(self.endian + "IIIIIIII", raw[:32])
+                headers.append(ProgramHeader(p_type, p_offset, p_vaddr, p_filesz, p_memsz))
+            self._program_headers = headers
+        return self._program_headers
+
+    def section_headers(self) -> List[SectionHeader]:
+        if self._section_headers is None:
+            headers = []
+            section_format = self.endian + ("IIQQQQIIQQ" if self.elf_class == ELFCLASS64 else "IIIIIIIIII")
+            section_size = struct.calcsize(section_format)
+            for i in range(self.shnum if self.shoff else 0):
+                raw = self._read(self.shoff + i * self.shentsize, self.shentsize, exact=True)
+                headers.append(SectionHeader(*struct.unpack(section_format, raw[:section_size])))
+            self._section_headers = headers
+        return self._section_headers
+
+    def section_name(self, section: SectionHeader) -> str:
+        sections = self.section_headers()
+        if self.shstrndx >= len(sections):
+            return ""
+        return self.read_string(sections[self.shstrndx].offset + section.name)
+
+    def vaddr_to_offset(self, vaddr: int) -> int:
+        """
+        Translates a virtual address, as used by the dynamic section, into an
+        offset in the file using the `PT_LOAD` segments.
+        """
+        for header in self.program_headers():
+            if header.type == PT_LOAD and header.vaddr <= vaddr < header.vaddr + header.filesz:
+                return vaddr - header.vaddr + header.offset
+        raise ElfError(f"Address {vaddr:#x} is not in any loaded segment")
+
+    def read_string(self, offset: int, limit: int = 4096) -> str:
+        data = self._read(offset, limit)
+        end = data.find(b"\0")
+        return data[:end if end >= 0 else len(data)].decode("utf-8", "replace")
+
+    def dynamic_entries(self) -> List[DynamicEntry]:
+        """
+        Returns the entries of the dynamic section (up to and including the
+        terminating `DT_NULL`), along with the file offset of each one.
+        """
+        if self._dynamic_entries is None:
+            entries = []
+            for header in self.program_headers():
+                if header.type != PT_DYNAMIC:
+                    continue
+                data = self._read(header.offset, header.filesz)
+                for position in range(0, len(data) - self._dynamic_size + 1, self._dynamic_size):
+                    tag, value = struct.unpack_from(self._dynamic_format, data, position)
+                    entries.append(DynamicEntry(tag, value, header.offset + position))
+                    if tag == DT_NULL:
+                        break
+                break
+            self._dynamic_entries = entries
+        return self._dynamic_entries
+
+    def dynamic_string_table(self) -> Optional[int]:
+        """
+        Returns the file offset of the dynamic string table, or `None` if the
+        object has no dynamic section.
+        """
+        for entry in self.dynamic_entries():
+            if entry.tag == DT_STRTAB:
+                return self.vaddr_to_offset(entry.value)
+        return None
+
+    def dynamic_info(self) -> DynamicInfo:
+        strtab = self.dynamic_string_table()
+        soname, rpath, runpath = None, None, None
+        needed = []
+
+        if strtab is not None:
+            for entry in self.dynamic_entries():
+                if entry.tag == DT_NEEDED:
+                    needed.append(self.read_string(strtab + entry.value))
+                elif entry.tag == DT_SONAME:
+                    soname = self.read_string(strtab + entry.value)
+                elif entry.tag == DT_RPATH:
+                    rpath = self.read_string(strtab + entry.value)
+                elif entry.tag == DT_RUNPATH:
+                    runpath = self.read_string(strtab + entry.value)
+
+        return DynamicInfo(soname, needed, rpath, runpath)
+
+
+def is_elf(path: str) -> bool:
+    """
+    Checks the magic number of a file without parsing it any further.
+    """
+    try:
+        with open(path, "rb") as f:
+            return f.read(4) == ELF_MAGIC
+    except OSError:
+        return False
+
+
+def read_dynamic_info(path: str) -> DynamicInfo:
+    """
+    Returns the soname, `DT_NEEDED` entries and search paths of an ELF object.
+    """
+    with open(path, "rb") as f:
+        return ElfFile(f).dynamic_info()
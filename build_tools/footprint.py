@@ -0,0 +1,228 @@
+"""
+Attributes the files of a `lambda_packages` generation to the Homebrew
+formulae which provided them, checks the result against size budgets and
+compares it with the previous generation's report.
+
+Files are matched by their path within each keg in the Cellar (e.g.
+`lib/libproj.so.22.1.1` in `Cellar/proj/7.2.1`), and each formula is traced
+back to the `Brewfile` entries which pulled it in through the runtime
+dependencies in its `INSTALL_RECEIPT.json`.  For each formula the report gives
+the bytes and files installed and the bytes expected to be read at a cold
+start: those of its libraries in the closure of the `--root` libraries, or as
+weighted by `--trace` files (see `build_tools.layer`).
+
+Budgets are read from a JSON file such as `footprint_budgets.json`:
+
+    {"total": {"bytes": ..., "files": ..., "cold_start_bytes": ...},
+     "formulae": {"*": {"bytes": ...}, "proj": {"bytes": ...}}}
+
+where `*` applies to every formula without its own entry.  The command exits
+with status 1 if any budget is exceeded.
+
+Usage: python3 -m build_tools.footprint [generation_path] --cellar CELLAR [--budgets footprint_budgets.json] [--previous old_report.json]
+"""
+
+import argparse
+import json
+import os
+
+from typing import Dict, List, Optional
+
+from .bottles import RECEIPT_NAME, brewfile_formulae
+from .layer import load_frequencies
+from .manifest import MANIFEST_NAME
+
+
+REPORT_NAME = "footprint_report.json"
+UNATTRIBUTED = "(unattributed)"
+METRICS = ["bytes", "files", "cold_start_bytes"]
+# Folders of a generation which mirror a keg below a prefix of their own
+PREFIXED_DIRECTORIES = ["debug"]
+
+
+def keg_index(cellar: str) -> Dict[str, Dict]:
+    """
+    Returns each formula's keg paths, and the formulae it depends on at run
+    time, keyed by formula name.
+    """
+    formulae = {}
+    for name in sorted(os.listdir(cellar)) if os.path.isdir(cellar) else []:
+        for version in sorted(os.listdir(os.path.join(cellar, name))):
+            keg = os.path.join(cellar, name, version)
+            paths = set()
+            for directory, _, filenames in os.walk(keg):
+                for filename in filenames:
+                    paths.add(os.path.relpath(os.path.join(directory, filename), keg))
+            dependencies = []
+            try:
+                with open(os.path.join(keg, RECEIPT_NAME)) as f:
+                    receipt = json.load(f)
+                dependencies = [d["full_name"].split("/")[-1] for d in receipt.get("runtime_dependencies") or []]
+            except (OSError, ValueError):
+                pass
+            formulae[name] = {"paths": paths, "dependencies": dependencies}
+    return formulae
+
+
+def required_by(formulae: Dict[str, Dict], requested: List[str]) -> Dict[str, List[str]]:
+    """
+    Returns, for each formula, the requested formulae which need it.
+    """
+    result: Dict[str, List[str]] = {}
+    for root in requested:
+        stack, seen = [root], set()
+        while stack:
+            name = stack.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            result.setdefault(name, []).append(root)
+            stack.extend(formulae.get(name, {}).get("dependencies", []))
+    return result
+
+
+def generation_files(generation_path: str) -> Dict[str, int]:
+    """
+    Returns the size of every installed file, keyed by path relative to the
+    generation.  Symlinks between files of the generation are not counted
+    again; links into the blob store count as the file they point to.
+    """
+    real_root = os.path.realpath(generation_path) + os.sep
+    files = {}
+    for directory, _, filenames in os.walk(generation_path):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            if filename == REPORT_NAME and directory == generation_path:
+                continue
+            if os.path.islink(path) and os.path.realpath(path).startswith(real_root):
+                continue
+            try:
+                files[os.path.relpath(path, generation_path)] = os.path.getsize(path)
+            except OSError:
+                continue
+    return files
+
+
+def attribute(relative_path: str, by_path: Dict[str, str]) -> str:
+    parts = relative_path.split(os.sep)
+    if parts[0] in PREFIXED_DIRECTORIES:
+        parts = parts[1:]
+    return by_path.get(os.path.join(*parts), UNATTRIBUTED)
+
+
+def analyze(generation_path: str, cellar: str, roots: List[str] = (), traces: List[str] = (),
+            brewfile: Optional[str] = None) -> Dict:
+    formulae = keg_index(cellar)
+    by_path = {}
+    for name, entry in formulae.items():
+        for path in entry["paths"]:
+            by_path.setdefault(path, name)
+
+    try:
+        with open(os.path.join(generation_path, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {"libraries": {}, "aliases": {}}
+    frequencies = load_frequencies(manifest, list(traces), list(roots))
+    path_frequencies = {entry["path"]: frequencies.get(soname, 0.0) for soname, entry in manifest["libraries"].items()}
+
+    requested = brewfile_formulae(brewfile) if brewfile and os.path.exists(brewfile) else []
+    reasons = required_by(formulae, requested)
+
+    report = {}
+    for relative_path, size in generation_files(generation_path).items():
+        name = attribute(relative_path, by_path)
+        entry = report.setdefault(name, {"bytes": 0, "files": 0, "cold_start_bytes": 0,
+                                         "required_by": reasons.get(name, [])})
+        entry["bytes"] += size
+        entry["files"] += 1
+        entry["cold_start_bytes"] += round(size * path_frequencies.get(relative_path, 0.0))
+
+    return {
+        "version": 1,
+        "total": {metric: sum(e[metric] for e in report.values()) for metric in METRICS},
+        "formulae": dict(sorted(report.items())),
+    }
+
+
+def check_budgets(report: Dict, budgets: Dict) -> List[str]:
+    failures = []
+    for metric, limit in budgets.get("total", {}).items():
+        if report["total"].get(metric, 0) > limit:
+            failures.append(f"total {metric} {report['total'][metric]} exceeds budget {limit}")
+    formula_budgets = budgets.get("formulae", {})
+    for name, entry in report["formulae"].items():
+        for metric, limit in formula_budgets.get(name, formula_budgets.get("*", {})).items():
+            if entry.get(metric, 0) > limit:
+                failures.append(f"{name} {metric} {entry[metric]} exceeds budget {limit}"
+                                + (f" (required by {', '.join(entry['required_by'])})" if entry["required_by"] else ""))
+    return failures
+
+
+def diff(report: Dict, previous: Dict) -> List[Dict]:
+    """
+    Returns the change in each metric for every formula which changed,
+    largest growth in bytes first.
+    """
+    changes = []
+    names = set(report["formulae"]) | set(previous.get("formulae", {}))
+    for name in names:
+        new = report["formulae"].get(name)
+        old = previous.get("formulae", {}).get(name)
+        change = {"formula": name, "status": "added" if old is None else "removed" if new is None else "changed"}
+        for metric in METRICS:
+            change[metric] = (new or {}).get(metric, 0) - (old or {}).get(metric, 0)
+        if change["status"] != "changed" or any(change[metric] for metric in METRICS):
+            change["required_by"] = (new or old).get("required_by", [])
+            changes.append(change)
+    return sorted(changes, key=lambda c: (-c["bytes"], c["formula"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attributes installed files to formulae and checks size budgets")
+    parser.add_argument("generation_path", help="Generation (or lambda_packages) directory to analyze")
+    parser.add_argument("--cellar", required=True, help="Homebrew Cellar the files were installed from")
+    parser.add_argument("--brewfile", default="Brewfile", help="Brewfile, to report which entry needs each formula")
+    parser.add_argument("--root", action="append", default=[], help="Library loaded by the Lambda")
+    parser.add_argument("--trace", action="append", default=[], help="Prefetch profile or load count trace")
+    parser.add_argument("--budgets", help="JSON file of size budgets")
+    parser.add_argument("--previous", help="Previous report to compare against")
+    parser.add_argument("--output", help=f"Report to write (default: generation_path/{REPORT_NAME})")
+    args = parser.parse_args()
+
+    report = analyze(args.generation_path, args.cellar, args.root, args.trace, args.brewfile)
+
+    print(f"{'formula':<24} {'bytes':>12} {'files':>7} {'cold start':>12}  required by")
+    for name, entry in report["formulae"].items():
+        print(f"{name:<24} {entry['bytes']:>12} {entry['files']:>7} {entry['cold_start_bytes']:>12}  "
+              f"{', '.join(entry['required_by'])}")
+    total = report["total"]
+    print(f"{'total':<24} {total['bytes']:>12} {total['files']:>7} {total['cold_start_bytes']:>12}")
+
+    if args.previous and os.path.exists(args.previous):
+        with open(args.previous) as f:
+            changes = diff(report, json.load(f))
+        report["diff"] = changes
+        print("Changes since the previous install:" if changes else "No changes since the previous install")
+        for change in changes:
+            print(f"  {change['status']:>7} {change['formula']:<24} {change['bytes']:>+12} bytes {change['files']:>+6} files "
+                  f"{change['cold_start_bytes']:>+12} cold start bytes"
+                  + (f"  (required by {', '.join(change['required_by'])})" if change["required_by"] else ""))
+
+    failures = []
+    if args.budgets:
+        with open(args.budgets) as f:
+            failures = check_budgets(report, json.load(f))
+        report["budget_failures"] = failures
+
+    with open(args.output or os.path.join(args.generation_path, REPORT_NAME), "w") as f:
+        json.dump(report, f, indent=1)
+
+    for failure in failures:
+        print(f"BUDGET EXCEEDED: {failure}")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
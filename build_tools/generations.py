@@ -0,0 +1,204 @@
+"""
+Manages versioned generations of `lambda_packages`, so that a rebuild never
+modifies files which running Lambdas may be reading.
+
+Each install goes into a new directory under `generations/`.  Once it is
+complete it is activated by atomically replacing the `current` symlink, which
+Lambdas resolve once when they start.  `lib` is kept as a symlink to
+`current/lib` so that `LD_LIBRARY_PATH` does not need to change.  Lambdas touch
+a `.last_used` file in the generation they resolved, and generations other
+than the current one are deleted once they have not been used for the
+retention period.
+
+Usage:
+    python3 -m build_tools.generations create [packages_path]
+    python3 -m build_tools.generations activate [packages_path] [generation_id]
+    python3 -m build_tools.generations gc [packages_path] [--retention-hours N] [--keep N]
+    python3 -m build_tools.generations discard [packages_path] [generation_id]
+"""
+
+import argparse
+import binascii
+import os
+import shutil
+import time
+
+from typing import List, Optional
+
+from .blob_store import GENERATIONS_DIRECTORY, collect_garbage
+
+
+CURRENT_LINK = "current"
+LAST_USED_NAME = ".last_used"
+# Lambdas touch the marker at most this often (see src/library_resolver.py),
+# so a generation in use may look unused for up to this long
+LAST_USED_INTERVAL = 3600
+# The user Lambdas access EFS as, set by their access point (see
+# pulumi_infrastructure/efs.py)
+LAMBDA_USER = (1000, 1000)
+
+
+def generations_path(packages_path: str) -> str:
+    return os.path.join(packages_path, GENERATIONS_DIRECTORY)
+
+
+def list_generations(packages_path: str) -> List[str]:
+    """
+    Returns the generation ids, oldest first.  Ids sort chronologically.
+    """
+    try:
+        return sorted(
+            name for name in os.listdir(generations_path(packages_path))
+            if os.path.isdir(os.path.join(generations_path(packages_path), name))
+        )
+    except FileNotFoundError:
+        return []
+
+
+def current_generation(packages_path: str) -> Optional[str]:
+    try:
+        return os.path.basename(os.readlink(os.path.join(packages_path, CURRENT_LINK)))
+    except OSError:
+        return None
+
+
+def create_generation(packages_path: str) -> str:
+    """
+    Creates an empty generation directory and returns its id.
+    """
+    generation_id = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()) + "-" + binascii.hexlify(os.urandom(3)).decode()
+    path = os.path.join(generations_path(packages_path), generation_id)
+    os.makedirs(os.path.join(path, "lib"))
+
+    # Lambdas touch the usage marker and replace the prefetch profile, which
+    # needs write access to the generation directory itself.  When installing
+    # as root, both are handed to the Lambdas' user instead of being made
+    # writable by everyone; the libraries below stay owned by the installer.
+    last_used_path = os.path.join(path, LAST_USED_NAME)
+    open(last_used_path, "w").close()
+    if os.geteuid() == 0:
+        for owned_path in (path, last_used_path):
+            os.chown(owned_path, *LAMBDA_USER)
+    return generation_id
+
+
+def replace_symlink(link_path: str, target: str):
+    temp_path = link_path + ".tmp"
+    if os.path.lexists(temp_path):
+        os.remove(temp_path)
+    os.symlink(target, temp_path)
+    os.replace(temp_path, link_path)
+
+
+def activate(packages_path: str, generation_id: str):
+    """
+    Points `current` at the generation with a single atomic rename.  The first
+    time this is run over an in-place install, its `lib` directory and
+    manifest are replaced by links into `current`.
+    """
+    if not os.path.isdir(os.path.join(generations_path(packages_path), generation_id)):
+        raise ValueError(f"No such generation: {generation_id}")
+
+    replace_symlink(os.path.join(packages_path, CURRENT_LINK), os.path.join(GENERATIONS_DIRECTORY, generation_id))
+
+    lib_path = os.path.join(packages_path, "lib")
+    if os.path.isdir(lib_path) and not os.path.islink(lib_path):
+        legacy_path = lib_path + ".legacy"
+        os.rename(lib_path, legacy_path)
+        replace_symlink(lib_path, os.path.join(CURRENT_LINK, "lib"))
+        shutil.rmtree(legacy_path)
+    elif not os.path.islink(lib_path):
+        replace_symlink(lib_path, os.path.join(CURRENT_LINK, "lib"))
+
+    legacy_manifest = os.path.join(packages_path, "library_manifest.json")
+    if os.path.isfile(legacy_manifest) and not os.path.islink(legacy_manifest):
+        os.remove(legacy_manifest)
+
+
+def last_used(packages_path: str, generation_id: str) -> float:
+    """
+    Returns when the generation was last resolved by a Lambda, or when it was
+    created if it never has been.
+    """
+    path = os.path.join(generations_path(packages_path), generation_id)
+    try:
+        return os.stat(os.path.join(path, LAST_USED_NAME)).st_mtime
+    except OSError:
+        return os.stat(path).st_mtime
+
+
+def collect_generations(packages_path: str, retention_seconds: float, keep: int = 2, now: float = None) -> List[str]:
+    """
+    Deletes generations, other than the current one and the `keep` newest,
+    which have not been used within `retention_seconds`, then deletes any
+    blobs they alone referred to.  Returns the ids of deleted generations.
+    Retention is never less than `LAST_USED_INTERVAL`.
+    """
+    now = time.time() if now is None else now
+    retention_seconds = max(retention_seconds, LAST_USED_INTERVAL)
+    current = current_generation(packages_path)
+    generations = list_generations(packages_path)
+    protected = set(generations[-keep:] if keep > 0 else []) | {current}
+
+    deleted = []
+    for generation_id in generations:
+        if generation_id in protected:
+            continue
+        if now - last_used(packages_path, generation_id) >= retention_seconds:
+            shutil.rmtree(os.path.join(generations_path(packages_path), generation_id))
+            deleted.append(generation_id)
+
+    collect_garbage(packages_path)
+    return deleted
+
+
+def discard_generation(packages_path: str, generation_id: str):
+    """
+    Deletes a generation whose install failed, so that it does not count
+    towards the `keep` newest, then deletes any blobs it alone referred to.
+    """
+    if generation_id == current_generation(packages_path):
+        raise ValueError(f"Generation {generation_id} is current")
+    if generation_id in list_generations(packages_path):
+        shutil.rmtree(os.path.join(generations_path(packages_path), generation_id))
+    collect_garbage(packages_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manages lambda_packages generations")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    create_parser = subparsers.add_parser("create", help="Create a new generation and print its id")
+    create_parser.add_argument("packages_path", help="Path of the lambda_packages directory")
+
+    activate_parser = subparsers.add_parser("activate", help="Make a generation current")
+    activate_parser.add_argument("packages_path", help="Path of the lambda_packages directory")
+    activate_parser.add_argument("generation_id", help="Id printed by `create`")
+
+    gc_parser = subparsers.add_parser("gc", help="Delete generations which are no longer used")
+    gc_parser.add_argument("packages_path", help="Path of the lambda_packages directory")
+    gc_parser.add_argument("--retention-hours", type=float, default=24,
+        help="How long a generation must have been unused before it is deleted (at least an hour)")
+    gc_parser.add_argument("--keep", type=int, default=2, help="Number of newest generations never to delete")
+
+    discard_parser = subparsers.add_parser("discard", help="Delete a generation which failed to install")
+    discard_parser.add_argument("packages_path", help="Path of the lambda_packages directory")
+    discard_parser.add_argument("generation_id", help="Id printed by `create`")
+
+    args = parser.parse_args()
+
+    if args.command == "create":
+        print(create_generation(args.packages_path))
+    elif args.command == "activate":
+        activate(args.packages_path, args.generation_id)
+        print(f"Activated generation {args.generation_id}")
+    elif args.command == "discard":
+        discard_generation(args.packages_path, args.generation_id)
+        print(f"Discarded generation {args.generation_id}")
+    else:
+        deleted = collect_generations(args.packages_path, args.retention_hours * 3600, keep=args.keep)
+        print(f"Deleted {len(deleted)} unused generations: {', '.join(deleted)}")
+
+
+if __name__ == "__main__":
+    main()
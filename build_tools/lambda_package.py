@@ -0,0 +1,214 @@
+"""
+Builds the Lambda deployment package as a reproducible zip, with precompiled
+bytecode.
+
+Entries are written in sorted order with a fixed timestamp and permissions, so
+the same sources always give the same bytes, and the same `source_code_hash`:
+Pulumi only updates the Lambda when `src/` actually changes.  Each module is
+also compiled by the target interpreter into `__pycache__` as an unchecked
+hash-based `.pyc`, which Python loads without compiling or even reading the
+source, as `/var/task` is read-only and nothing compiled at a cold start would
+be kept anyway.
+
+A fingerprint of the sources and build options is stored as the zip comment,
+and the zip is left untouched if it is unchanged.
+
+Usage: python3 -m build_tools.lambda_package [source] -o lambda.zip [--python python3.8] [--report-import-time]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+from typing import Dict, List, Optional
+
+from .sync import list_files
+
+
+BUILDER_VERSION = 1
+TARGET_VERSION = "3.8"
+ZIP_TIMESTAMP = (1980, 1, 1, 0, 0, 0)
+FINGERPRINT_PREFIX = b"fingerprint:"
+EXCLUDED_DIRECTORIES = {"__pycache__", ".pytest_cache", ".mypy_cache"}
+EXCLUDED_SUFFIXES = (".pyc", ".pyo")
+LAMBDA_TASK_ROOT = "/var/task"
+
+# Run by the target interpreter: compiles each (source, pyc, display name)
+COMPILE_SCRIPT = """
+import json, py_compile, sys
+for source, cfile, dfile in json.load(sys.stdin):
+    py_compile.compile(source, cfile, dfile=dfile, doraise=True,
+                       invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+"""
+
+
+def source_files(source: str) -> List[str]:
+    """
+    Returns the relative paths of the files to package, sorted.
+    """
+    files = []
+    for relative_path in list_files(source):
+        parts = relative_path.split(os.sep)
+        if any(part in EXCLUDED_DIRECTORIES for part in parts) or relative_path.endswith(EXCLUDED_SUFFIXES):
+            continue
+        files.append(relative_path)
+    return sorted(files)
+
+
+def fingerprint(source: str, files: List[str], python_version: Optional[str]) -> str:
+    h = hashlib.sha256(json.dumps([BUILDER_VERSION, python_version]).encode())
+    for relative_path in files:
+        path = os.path.join(source, relative_path)
+        h.update(relative_path.encode() + b"\0")
+        h.update(b"x" if os.access(path, os.X_OK) else b"-")
+        with open(path, "rb") as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+
+def zip_fingerprint(zip_path: str) -> Optional[str]:
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            comment = archive.comment
+    except (OSError, zipfile.BadZipFile):
+        return None
+    if comment.startswith(FINGERPRINT_PREFIX):
+        return comment[len(FINGERPRINT_PREFIX):].decode()
+    return None
+
+
+def interpreter_version(python: str) -> str:
+    output = subprocess.run(
+        [python, "-c", "import sys; print('%d.%d' % sys.version_info[:2])"],
+        check=True, stdout=subprocess.PIPE, universal_newlines=True,
+    ).stdout
+    return output.strip()
+
+
+def compile_bytecode(source: str, files: List[str], python: str, output_directory: str) -> Dict[str, str]:
+    """
+    Compiles the Python modules among `files` with `python`, returning the
+    path of each `.pyc` in `output_directory` keyed by its archive name.
+    """
+    tag = "cpython-" + interpreter_version(python).replace(".", "")
+    jobs = []
+    compiled = {}
+    for relative_path in files:
+        if not relative_path.endswith(".py"):
+            continue
+        directory, filename = os.path.split(relative_path)
+        archive_name = os.path.join(directory, "__pycache__", f"{filename[:-3]}.{tag}.pyc")
+        cfile = os.path.join(output_directory, archive_name)
+        dfile = os.path.join(LAMBDA_TASK_ROOT, relative_path)
+        jobs.append([os.path.join(source, relative_path), cfile, dfile])
+        compiled[archive_name] = cfile
+
+    if jobs:
+        subprocess.run([python, "-c", COMPILE_SCRIPT], input=json.dumps(jobs), check=True, universal_newlines=True)
+    return compiled
+
+
+def write_entry(archive: zipfile.ZipFile, archive_name: str, path: str):
+    info = zipfile.ZipInfo(archive_name.replace(os.sep, "/"), date_time=ZIP_TIMESTAMP)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.create_system = 3
+    mode = 0o755 if os.access(path, os.X_OK) else 0o644
+    info.external_attr = (0o100000 | mode) << 16
+    with open(path, "rb") as f:
+        archive.writestr(info, f.read(), compresslevel=9)
+
+
+def build(source: str, zip_path: str, python: Optional[str] = "python3.8", force: bool = False) -> bool:
+    """
+    Builds `zip_path` from `source`, compiling bytecode with `python` unless it
+    is `None`.  Returns `False` if the zip was already up to date.
+    """
+    files = source_files(source)
+    python_version = interpreter_version(python) if python else None
+    digest = fingerprint(source, files, python_version)
+    if not force and os.path.isfile(zip_path) and zip_fingerprint(zip_path) == digest:
+        return False
+
+    with tempfile.TemporaryDirectory() as directory:
+        entries = {relative_path: os.path.join(source, relative_path) for relative_path in files}
+        if python:
+            entries.update(compile_bytecode(source, files, python, directory))
+
+        temp_path = os.path.join(directory, "package.zip")
+        with zipfile.ZipFile(temp_path, "w") as archive:
+            for archive_name in sorted(entries):
+                write_entry(archive, archive_name, entries[archive_name])
+            archive.comment = FINGERPRINT_PREFIX + digest.encode()
+        shutil.move(temp_path, zip_path)
+
+    return True
+
+
+def import_time_ms(python: str, zip_path: str, module: str, bytecode: bool, runs: int = 5) -> float:
+    """
+    Extracts the package and times a fresh `import module` in the target
+    interpreter, with or without the packaged `.pyc` files.  Bytecode is never
+    written back, as on Lambda's read-only `/var/task`.
+    """
+    script = (
+        "import sys, time; sys.path.insert(0, sys.argv[1]); start = time.perf_counter(); "
+        f"import {module}; print((time.perf_counter() - start) * 1000)"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        with zipfile.ZipFile(zip_path) as archive:
+            archive.extractall(directory)
+        if not bytecode:
+            for root, directories, _ in os.walk(directory):
+                for name in [d for d in directories if d == "__pycache__"]:
+                    shutil.rmtree(os.path.join(root, name))
+
+        env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+        timings = []
+        for _ in range(runs):
+            output = subprocess.run(
+                [python, "-c", script, directory], env=env, check=True, stdout=subprocess.PIPE,
+                universal_newlines=True,
+            ).stdout
+            timings.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Builds a reproducible Lambda zip with precompiled bytecode")
+    parser.add_argument("source", help="Directory of Lambda sources, e.g. src")
+    parser.add_argument("-o", "--output", default="lambda.zip", help="Zip file to write")
+    parser.add_argument("--python", default=f"python{TARGET_VERSION}",
+        help="Interpreter matching the Lambda runtime, used to compile bytecode")
+    parser.add_argument("--no-bytecode", action="store_true", help="Do not include .pyc files")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the fingerprint is unchanged")
+    parser.add_argument("--report-import-time", action="store_true",
+        help="Report the cold import time of --module with and without bytecode")
+    parser.add_argument("--module", default="handler", help="Module to import for --report-import-time")
+    args = parser.parse_args()
+
+    python = None if args.no_bytecode else args.python
+    if python and interpreter_version(python) != TARGET_VERSION:
+        print(f"Warning: {python} is not Python {TARGET_VERSION}, so the Lambda runtime will ignore its bytecode",
+              file=sys.stderr)
+    if build(args.source, args.output, python, args.force):
+        print(f"Built {args.output} ({os.path.getsize(args.output)} bytes, fingerprint {zip_fingerprint(args.output)})")
+    else:
+        print(f"{args.output} is up to date")
+
+    if args.report_import_time:
+        if python is None:
+            sys.exit("--report-import-time needs bytecode")
+        with_pyc = import_time_ms(python, args.output, args.module, bytecode=True)
+        without_pyc = import_time_ms(python, args.output, args.module, bytecode=False)
+        print(f"Cold import of {args.module}: {with_pyc:.1f} ms with .pyc, {without_pyc:.1f} ms without")
+
+
+if __name__ == "__main__":
+    main()
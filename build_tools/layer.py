@@ -0,0 +1,204 @@
+"""
+Splits a generation's libraries into a hot tier, packed into a Lambda layer,
+and a cold tier which stays on EFS.
+
+Layers are extracted to `/opt` before the function starts, so libraries in the
+layer's `lib` folder are read from local disk rather than over EFS.  Which
+libraries are hot is decided by how often they are loaded: either from
+recorded traces (prefetch profiles written with
+`LAMBDA_PACKAGES_RECORD_PREFETCH=1`, or `{"invocations": n, "counts":
+{soname: loads}}` files), or failing that from the manifest alone, counting
+the `--root` libraries and their dependencies as loaded on every cold start.
+Libraries are taken hottest first, each with the dependencies not yet packed,
+for as long as they fit in the layer size limit.
+
+The layer also holds an index of the sonames it provides and their hashes.
+The Lambda's resolver only loads a library from the layer if its hash matches
+the manifest of the generation in use, and otherwise still loads it from EFS.
+
+Usage: python3 -m build_tools.layer [generation_path] -o layer.zip [--trace profile.json] [--root proj]
+"""
+
+import argparse
+import json
+import os
+import zipfile
+
+from typing import Dict, List, NamedTuple
+
+from .lambda_package import ZIP_TIMESTAMP, write_entry
+from .manifest import MANIFEST_NAME
+
+
+LAYER_INDEX_NAME = "lambda_layer.json"
+LAYER_LIB_DIRECTORY = "lib"
+# Lambda's limit on the unzipped size of a function and all its layers, less
+# room for the function itself
+DEFAULT_MAX_BYTES = 250 * 1024 * 1024 - 16 * 1024 * 1024
+
+
+class Placement(NamedTuple):
+    soname: str
+    path: str
+    size: int
+    frequency: float
+    tier: str
+
+
+def read_manifest(generation_path: str) -> Dict:
+    with open(os.path.join(generation_path, MANIFEST_NAME)) as f:
+        return json.load(f)
+
+
+def soname_for(manifest: Dict, name: str) -> str:
+    libraries = manifest.get("libraries", {})
+    aliases = manifest.get("aliases", {})
+    for candidate in (name, f"lib{name}.so", os.path.basename(name)):
+        if candidate in libraries:
+            return candidate
+        if candidate in aliases:
+            return aliases[candidate]
+    return name
+
+
+def dependencies(manifest: Dict, soname: str) -> List[str]:
+    """
+    Returns `soname` and its transitive dependencies within the manifest,
+    deepest first.
+    """
+    libraries = manifest["libraries"]
+    order, seen = [], set()
+
+    def visit(current):
+        if current in seen or current not in libraries:
+            return
+        seen.add(current)
+        for dependency in libraries[current]["needed"]:
+            visit(dependency)
+        order.append(current)
+
+    visit(soname)
+    return order
+
+
+def load_frequencies(manifest: Dict, traces: List[str], roots: List[str]) -> Dict[str, float]:
+    """
+    Returns the fraction of cold starts which load each soname.  A prefetch
+    profile counts as one cold start.
+    """
+    counts: Dict[str, float] = {}
+    invocations = 0
+
+    for trace_path in traces:
+        with open(trace_path) as f:
+            trace = json.load(f)
+        if "counts" in trace:
+            invocations += trace.get("invocations", 1)
+            loads = trace["counts"].items()
+        else:
+            invocations += 1
+            loads = [(entry["path"], 1) for entry in trace.get("files", [])]
+        for name, count in loads:
+            soname = soname_for(manifest, name)
+            if soname in manifest["libraries"]:
+                counts[soname] = counts.get(soname, 0) + count
+
+    if not traces:
+        invocations = 1
+        for root in roots:
+            for soname in dependencies(manifest, soname_for(manifest, root)):
+                counts[soname] = 1
+
+    return {soname: min(1.0, count / invocations) for soname, count in counts.items()}
+
+
+def place(manifest: Dict, frequencies: Dict[str, float], max_bytes: int) -> List[Placement]:
+    """
+    Chooses the hot tier: the most frequently loaded libraries, each with its
+    dependencies, up to `max_bytes`.  Ties are broken in favour of smaller
+    libraries, which give more loads per byte of layer.
+    """
+    libraries = manifest["libraries"]
+    hot, total = set(), 0
+    ranked = sorted(
+        (s for s in libraries if frequencies.get(s, 0) > 0),
+        key=lambda s: (-frequencies[s], libraries[s]["size"], s),
+    )
+    for soname in ranked:
+        unit = [d for d in dependencies(manifest, soname) if d not in hot]
+        unit_bytes = sum(libraries[d]["size"] for d in unit)
+        if total + unit_bytes <= max_bytes:
+            hot.update(unit)
+            total += unit_bytes
+
+    return [
+        Placement(soname, entry["path"], entry["size"], frequencies.get(soname, 0.0), "layer" if soname in hot else "efs")
+        for soname, entry in sorted(libraries.items())
+    ]
+
+
+def write_layer(generation_path: str, manifest: Dict, placements: List[Placement], zip_path: str):
+    """
+    Writes the hot libraries to `lib/` in a reproducible layer zip, along with
+    the index the resolver checks them against.
+    """
+    files = manifest.get("files", {})
+    hot = [p for p in placements if p.tier == "layer"]
+    index = {
+        "version": 1,
+        "libraries": {p.soname: {"size": p.size, "sha256": files.get(p.path, {}).get("sha256")} for p in hot},
+    }
+
+    temp_path = zip_path + ".tmp"
+    with zipfile.ZipFile(temp_path, "w") as archive:
+        for placement in sorted(hot, key=lambda p: p.soname):
+            write_entry(archive, os.path.join(LAYER_LIB_DIRECTORY, placement.soname),
+                        os.path.join(generation_path, placement.path))
+        info = zipfile.ZipInfo(LAYER_INDEX_NAME, date_time=ZIP_TIMESTAMP)
+        info.create_system = 3
+        info.external_attr = 0o100644 << 16
+        archive.writestr(info, json.dumps(index, indent=1, sort_keys=True))
+    os.replace(temp_path, zip_path)
+
+
+def placement_report(placements: List[Placement]) -> Dict:
+    hot = [p for p in placements if p.tier == "layer"]
+    return {
+        "layer_bytes": sum(p.size for p in hot),
+        "efs_bytes": sum(p.size for p in placements if p.tier == "efs"),
+        "expected_efs_bytes_per_cold_start_before": round(sum(p.size * p.frequency for p in placements)),
+        "expected_bytes_moved_off_efs_per_cold_start": round(sum(p.size * p.frequency for p in hot)),
+        "libraries": [p._asdict() for p in placements],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Packs the most used libraries of a generation into a Lambda layer")
+    parser.add_argument("generation_path", help="Generation (or lambda_packages) directory holding the manifest")
+    parser.add_argument("-o", "--output", default="layer.zip", help="Layer zip to write")
+    parser.add_argument("--trace", action="append", default=[], help="Prefetch profile or load count trace")
+    parser.add_argument("--root", action="append", default=[], help="Library loaded on every cold start, if no traces")
+    parser.add_argument("--max-bytes", type=int, default=DEFAULT_MAX_BYTES, help="Unzipped size limit of the layer")
+    parser.add_argument("--report", help="Write the placement report as JSON to this file")
+    args = parser.parse_args()
+
+    generation_path = os.path.realpath(args.generation_path)
+    manifest = read_manifest(generation_path)
+    frequencies = load_frequencies(manifest, args.trace, args.root)
+    placements = place(manifest, frequencies, args.max_bytes)
+    write_layer(generation_path, manifest, placements, args.output)
+    report = placement_report(placements)
+
+    for p in placements:
+        print(f"{p.tier:<6} {p.size:>12} {p.frequency:>6.2f}  {p.soname}")
+    print(f"Layer: {report['layer_bytes']} bytes in {args.output}; left on EFS: {report['efs_bytes']} bytes")
+    print(f"Expected EFS reads per cold start: {report['expected_efs_bytes_per_cold_start_before']} bytes before, "
+          f"{report['expected_bytes_moved_off_efs_per_cold_start']} bytes moved to the layer")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
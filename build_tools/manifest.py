@@ -0,0 +1,125 @@
+"""
+Writes the library manifest for a `lambda_packages` directory.  The manifest
+maps each soname to the file which provides it (relative to `lambda_packages`)
+and to its `DT_NEEDED` dependencies, so that the Lambda can load libraries by
+absolute path without running `ldconfig`, `gcc` or `objdump`.  It also records
+the size and SHA256 of every installed file, which the Lambda's local cache
+uses to check its copies.
+
+Usage: python3 -m build_tools.manifest [lambda_packages_path]
+"""
+
+import argparse
+import json
+import os
+
+from typing import Dict, Iterator
+
+from .elf import ElfError, ElfFile
+from .sync import list_files, sha256_file
+
+
+MANIFEST_NAME = "library_manifest.json"
+MANIFEST_VERSION = 1
+DATA_DIRECTORIES = ["lib", "share"]
+
+
+def iter_shared_objects(lib_path: str) -> Iterator[str]:
+    """
+    Yields the path of every ELF shared object below `lib_path`, in a stable
+    order.  Symlinks are followed, so each link name is reported separately.
+    """
+    for directory, dirnames, filenames in os.walk(lib_path):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if ".so" in filename:
+                yield os.path.join(directory, filename)
+
+
+def build_manifest(packages_path: str) -> Dict:
+    """
+    Scans `packages_path/lib` and returns the manifest as a dictionary.
+    """
+    lib_path = os.path.join(packages_path, "lib")
+    libraries = {}
+    aliases = {}
+
+    for path in iter_shared_objects(lib_path):
+        try:
+            with open(path, "rb") as f:
+                elf = ElfFile(f)
+                if not elf.is_shared_object:
+                    continue
+                info = elf.dynamic_info()
+        except (OSError, ElfError):
+            continue
+
+        filename = os.path.basename(path)
+        soname = info.soname or filename
+        aliases[filename] = soname
+
+        # Several files (libfoo.so, libfoo.so.1, libfoo.so.1.2.3) usually
+        # provide the same soname; prefer the one named after it.
+        if soname in libraries and filename != soname:
+            continue
+
+        stat = os.stat(path)
+        libraries[soname] = {
+            "path": os.path.relpath(path, packages_path),
+            "needed": info.needed,
+            "size": stat.st_size,
+            "mtime": int(stat.st_mtime),
+        }
+
+    return {
+        "version": MANIFEST_VERSION,
+        "libraries": libraries,
+        "aliases": aliases,
+        "files": file_hashes(packages_path),
+    }
+
+
+def file_hashes(packages_path: str) -> Dict[str, Dict]:
+    """
+    Returns the size and SHA256 of every file in the data directories, keyed
+    by path relative to `packages_path`.
+    """
+    files = {}
+    for directory in DATA_DIRECTORIES:
+        root = os.path.join(packages_path, directory)
+        for relative_path in list_files(root):
+            path = os.path.join(root, relative_path)
+            files[os.path.relpath(path, packages_path)] = {
+                "size": os.path.getsize(path),
+                "sha256": sha256_file(path),
+            }
+    return files
+
+
+def write_manifest(packages_path: str, manifest: Dict) -> str:
+    """
+    Atomically writes the manifest into `packages_path`, so that a Lambda
+    never reads a partially written file.
+    """
+    manifest_path = os.path.join(packages_path, MANIFEST_NAME)
+    temp_path = manifest_path + ".tmp"
+
+    with open(temp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+    os.replace(temp_path, manifest_path)
+    return manifest_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Writes the soname manifest for a lambda_packages directory")
+    parser.add_argument("packages_path", help="Path of the lambda_packages directory")
+    args = parser.parse_args()
+
+    manifest = build_manifest(args.packages_path)
+    manifest_path = write_manifest(args.packages_path, manifest)
+    print(f"Wrote {len(manifest['libraries'])} libraries to {manifest_path}")
+
+
+if __name__ == "__main__":
+    main()
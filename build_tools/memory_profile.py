@@ -0,0 +1,177 @@
+"""
+Measures how much memory and time loading each of the Lambda's libraries
+costs, to size the function's memory setting.
+
+Each library in the closure of the `--root` libraries is profiled in a fresh
+interpreter: its dependencies are loaded first, in dependency order, and then
+the library itself, recording the wall time of the `dlopen`, the change in
+RSS and PSS from `/proc/self/smaps_rollup` and how many more files are mapped.
+A last process loads the whole set, and its peak RSS, plus headroom, gives
+the recommended memory size, which `__main__.py` reads from the JSON report.
+
+A library is flagged when its share of the total cost (RSS or load time) is
+more than `--flag-ratio` times its share of use, where use is how often cold
+starts load it according to `--trace` files (see `build_tools.layer`), or
+equal for every library without them.
+
+Usage: python3 -m build_tools.memory_profile [packages_path] --root proj --root exif [--output memory_profile.json]
+"""
+
+import argparse
+import ctypes
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+
+from typing import Dict, List
+
+from .layer import dependencies, load_frequencies, read_manifest, soname_for
+
+
+DEFAULT_OUTPUT = "memory_profile.json"
+DEFAULT_PACKAGES_PATH = "/mnt/efs/lambda_packages"
+LAMBDA_MIN_MEMORY_MB = 128
+LAMBDA_MEMORY_STEP_MB = 64
+
+
+def smaps_rollup(path: str = "/proc/self/smaps_rollup") -> Dict[str, int]:
+    """
+    Returns the RSS and PSS of the process in kB.
+    """
+    values = {}
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) >= 2 and fields[0] in ("Rss:", "Pss:"):
+                values[fields[0][:-1].lower() + "_kb"] = int(fields[1])
+    return values
+
+
+def mapped_file_count(path: str = "/proc/self/maps") -> int:
+    with open(path) as f:
+        return len({line.split(None, 5)[5].strip() for line in f if len(line.split(None, 5)) == 6
+                    and line.split(None, 5)[5].startswith("/")})
+
+
+def measure_load(path: str) -> Dict:
+    before = smaps_rollup()
+    files_before = mapped_file_count()
+    start = time.perf_counter()
+    ctypes.CDLL(path, mode=ctypes.RTLD_GLOBAL)
+    load_ms = (time.perf_counter() - start) * 1000
+    after = smaps_rollup()
+    return {
+        "load_ms": round(load_ms, 3),
+        "rss_kb": after["rss_kb"] - before["rss_kb"],
+        "pss_kb": after["pss_kb"] - before["pss_kb"],
+        "mapped_files": mapped_file_count() - files_before,
+    }
+
+
+def child(paths: List[str]) -> Dict:
+    """
+    Runs in the measured process: loads `paths` in order, measuring only the
+    last, or all of them together if `paths` starts with `--all`.
+    """
+    if paths[0] == "--all":
+        before = smaps_rollup()
+        start = time.perf_counter()
+        for path in paths[1:]:
+            ctypes.CDLL(path, mode=ctypes.RTLD_GLOBAL)
+        after = smaps_rollup()
+        return {"load_ms": round((time.perf_counter() - start) * 1000, 3), "baseline_rss_kb": before["rss_kb"],
+                "rss_kb": after["rss_kb"] - before["rss_kb"], "peak_rss_kb": after["rss_kb"],
+                "pss_kb": after["pss_kb"] - before["pss_kb"]}
+
+    for path in paths[:-1]:
+        ctypes.CDLL(path, mode=ctypes.RTLD_GLOBAL)
+    return measure_load(paths[-1])
+
+
+def run_child(paths: List[str]) -> Dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "build_tools.memory_profile", "--child"] + paths,
+        cwd=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."),
+        check=True, stdout=subprocess.PIPE, universal_newlines=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def recommended_memory_mb(peak_rss_kb: int, headroom: float) -> int:
+    needed = peak_rss_kb / 1024 * (1 + headroom)
+    return max(LAMBDA_MIN_MEMORY_MB, int(math.ceil(needed / LAMBDA_MEMORY_STEP_MB)) * LAMBDA_MEMORY_STEP_MB)
+
+
+def profile(generation_path: str, roots: List[str], traces: List[str] = (), headroom: float = 0.5,
+            flag_ratio: float = 2.0) -> Dict:
+    manifest = read_manifest(generation_path)
+    libraries = manifest["libraries"]
+    order = []
+    for root in roots:
+        order += [s for s in dependencies(manifest, soname_for(manifest, root)) if s not in order]
+
+    def path(soname):
+        return os.path.join(generation_path, libraries[soname]["path"])
+
+    results = {}
+    for soname in order:
+        results[soname] = run_child([path(s) for s in dependencies(manifest, soname)])
+        results[soname]["size"] = libraries[soname]["size"]
+
+    total = run_child(["--all"] + [path(s) for s in order])
+
+    frequencies = load_frequencies(manifest, list(traces), roots)
+    total_use = sum(frequencies.get(s, 0) for s in order) or 1
+    total_rss = sum(max(r["rss_kb"], 0) for r in results.values()) or 1
+    total_ms = sum(r["load_ms"] for r in results.values()) or 1
+    for soname, result in results.items():
+        use_share = frequencies.get(soname, 0) / total_use
+        cost_share = max(max(result["rss_kb"], 0) / total_rss, result["load_ms"] / total_ms)
+        result["use"] = round(frequencies.get(soname, 0), 3)
+        result["cost_share"] = round(cost_share, 3)
+        result["flagged"] = cost_share > flag_ratio * use_share
+
+    return {
+        "libraries": results,
+        "total": total,
+        "recommended_memory_mb": recommended_memory_mb(total["peak_rss_kb"], headroom),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profiles the memory and load time of each library")
+    parser.add_argument("packages_path", nargs="?", default=DEFAULT_PACKAGES_PATH,
+        help=f"lambda_packages directory or generation (default: {DEFAULT_PACKAGES_PATH})")
+    parser.add_argument("--root", action="append", default=[], help="Library loaded by the handler")
+    parser.add_argument("--trace", action="append", default=[], help="Prefetch profile or load count trace")
+    parser.add_argument("--headroom", type=float, default=0.5, help="Memory to allow beyond the measured peak")
+    parser.add_argument("--flag-ratio", type=float, default=2.0, help="Cost to use share ratio that is flagged")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Write the report as JSON to this file")
+    parser.add_argument("--child", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child)))
+        return
+
+    current = os.path.join(args.packages_path, "current")
+    generation_path = os.path.realpath(current if os.path.islink(current) else args.packages_path)
+    report = profile(generation_path, args.root, args.trace, args.headroom, args.flag_ratio)
+
+    print(f"{'library':<28} {'size':>11} {'load ms':>8} {'RSS kB':>8} {'PSS kB':>8} {'files':>5} {'use':>5}")
+    for soname, r in report["libraries"].items():
+        print(f"{soname:<28} {r['size']:>11} {r['load_ms']:>8.2f} {r['rss_kb']:>8} {r['pss_kb']:>8} "
+              f"{r['mapped_files']:>5} {r['use']:>5.2f}" + ("  <- out of proportion to use" if r["flagged"] else ""))
+    total = report["total"]
+    print(f"All together: {total['load_ms']:.1f} ms, +{total['rss_kb']} kB RSS over a {total['baseline_rss_kb']} kB "
+          f"interpreter; recommended memory size {report['recommended_memory_mb']} MB")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
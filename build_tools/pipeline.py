@@ -0,0 +1,378 @@
+"""
+Runs the build as a graph of stages, skipping those whose inputs have not
+changed since they last succeeded and running independent ones concurrently.
+
+Each stage declares its input files and directories and the stages it
+depends on.  Its fingerprint covers its command, the contents of its inputs
+and the fingerprints of its dependencies, so a change propagates to every
+stage downstream.  A stage's fingerprint is only computed once its dependencies have
+finished, so that it sees the files they wrote.  Fingerprints of successful
+runs are kept in a stamp file, which can live on EFS so that it outlasts each
+CodeBuild container.
+
+The files a stage writes for later stages (its `outputs`) are copied next to
+the stamp file when it succeeds.  A stage is only skipped if they can be
+restored from there with the digests recorded in its stamp; otherwise it runs
+again, so that later stages never read outputs missing from, or left stale
+in, a fresh checkout.
+
+Stages are plain `Stage` tuples whose command is either a shell command or a
+Python callable, and another set can be loaded with `--stages module:function`,
+e.g. to try the runner with fake commands.
+
+Usage: python3 -m build_tools.pipeline [--stamp-file PATH] [--force STAGE] [--dry-run] [--stages module:function]
+"""
+
+import argparse
+import glob
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, NamedTuple, Optional, Union
+
+from .sync import sha256_file
+
+
+SUCCEEDED = "succeeded"
+SKIPPED = "skipped"
+WOULD_RUN = "would-run"
+FAILED = "failed"
+BLOCKED = "blocked"
+
+DEFAULT_STAMP_FILE = ".pipeline_stamps.json"
+OUTPUTS_DIRECTORY = "pipeline_outputs"
+IGNORED_DIRECTORIES = {"__pycache__", ".git", ".pytest_cache", ".mypy_cache"}
+CURRENT_GENERATION = "/mnt/efs/lambda_packages/current"
+
+
+class Stage(NamedTuple):
+    name: str
+    command: Union[str, Callable[[], None]]
+    inputs: List[str] = []
+    depends_on: List[str] = []
+    outputs: List[str] = []
+
+
+class StageResult(NamedTuple):
+    name: str
+    status: str
+    seconds: float
+    fingerprint: str
+    error: Optional[str] = None
+
+
+def default_stages() -> List[Stage]:
+    """
+    The CodeBuild pipeline: packaging the Lambda, installing the Brewfile to
+    EFS, packing its hot libraries into a layer, profiling their memory use,
+    checking the Pulumi program's import time and deploying the stack.  The
+    brew install does not depend on the deploy, as the EFS it installs to
+    already exists once CodeBuild can run.
+    """
+    return [
+        Stage(
+            "package",
+            "python -m build_tools.lambda_package src -o lambda.zip --python python --report-import-time",
+            inputs=["src", "build_tools/lambda_package.py"],
+            outputs=["lambda.zip"],
+        ),
+        Stage(
+            "deploy",
+            "pulumi up -y --stack dev",
+            inputs=["__main__.py", "pulumi_infrastructure", "Pulumi.yaml", "Pulumi.*.yaml", "requirements.txt",
+                    "filebase64sha256.py"],
+            depends_on=["package", "layer", "memory_profile", "startup_check"],
+        ),
+        Stage(
+            "startup_check",
+            "python -m pytest -q tests/test_pulumi_startup.py",
+            inputs=["__main__.py", "pulumi_infrastructure", "requirements.txt", "filebase64sha256.py",
+                    "benchmarks/pulumi_import.py", "tests/test_pulumi_startup.py"],
+        ),
+        Stage(
+            "brew_install",
+            "./brew_install_efs_codebuild.sh ${FILESYSTEM_ID}",
+            inputs=["Brewfile", "footprint_budgets.json", "brew_install.sh", "brew_install_efs_codebuild.sh", "build_tools"],
+        ),
+        Stage(
+            "layer",
+            f"python -m build_tools.layer {CURRENT_GENERATION} -o layer.zip --root proj --root exif"
+            f" $([ -f {CURRENT_GENERATION}/prefetch_profile.json ] && echo --trace {CURRENT_GENERATION}/prefetch_profile.json)",
+            inputs=["build_tools/layer.py", f"{CURRENT_GENERATION}/library_manifest.json",
+                    f"{CURRENT_GENERATION}/prefetch_profile.json"],
+            depends_on=["brew_install"],
+            outputs=["layer.zip"],
+        ),
+        Stage(
+            "memory_profile",
+            "python -m build_tools.memory_profile /mnt/efs/lambda_packages --root proj --root exif"
+            " --output memory_profile.json",
+            inputs=["build_tools/memory_profile.py", f"{CURRENT_GENERATION}/library_manifest.json"],
+            depends_on=["brew_install"],
+            outputs=["memory_profile.json"],
+        ),
+    ]
+
+
+def input_files(root: str, patterns: List[str]) -> List[str]:
+    """
+    Expands input patterns into the relative paths of the files they cover,
+    sorted.  Directories are walked; patterns matching nothing are kept as
+    they are, so that a file appearing or disappearing changes the
+    fingerprint.
+    """
+    files = set()
+    for pattern in patterns:
+        matches = glob.glob(os.path.join(root, pattern))
+        if not matches:
+            files.add(pattern)
+        for match in matches:
+            if os.path.isdir(match):
+                for directory, directories, filenames in os.walk(match):
+                    directories[:] = [d for d in directories if d not in IGNORED_DIRECTORIES]
+                    for filename in filenames:
+                        if not filename.endswith((".pyc", ".pyo")):
+                            files.add(os.path.relpath(os.path.join(directory, filename), root))
+            else:
+                files.add(os.path.relpath(match, root))
+    return sorted(files)
+
+
+def command_description(command) -> str:
+    if callable(command):
+        return f"{getattr(command, '__module__', '')}.{getattr(command, '__qualname__', repr(command))}"
+    return command
+
+
+def fingerprint(root: str, stage: Stage, upstream: Dict[str, str]) -> str:
+    h = hashlib.sha256(json.dumps({
+        "command": command_description(stage.command),
+        "upstream": {name: upstream[name] for name in sorted(stage.depends_on)},
+    }, sort_keys=True).encode())
+    for relative_path in input_files(root, stage.inputs):
+        path = os.path.join(root, relative_path)
+        digest = sha256_file(path) if os.path.isfile(path) else "missing"
+        h.update(f"{relative_path}\0{digest}\n".encode())
+    return h.hexdigest()
+
+
+class StampFile:
+    """
+    The fingerprint of each stage's last successful run.  Writes re-read the
+    file first, so that concurrent builds only overwrite their own stages.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamps = self._read()
+
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path) as f:
+                return json.load(f).get("stages", {})
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def fingerprint(self, name: str) -> Optional[str]:
+        return self._stamps.get(name, {}).get("fingerprint")
+
+    def outputs(self, name: str) -> Dict[str, str]:
+        return self._stamps.get(name, {}).get("outputs", {})
+
+    def record(self, name: str, stage_fingerprint: str, seconds: float, outputs: Dict[str, str] = None):
+        with self._lock:
+            self._stamps = self._read()
+            self._stamps[name] = {"fingerprint": stage_fingerprint, "finished": int(time.time()), "seconds": round(seconds, 3),
+                                  "outputs": outputs or {}}
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump({"stages": self._stamps}, f, indent=1, sort_keys=True)
+            os.replace(temp_path, self.path)
+
+
+def copy_atomically(source: str, target: str):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    temp_path = f"{target}.{os.getpid()}.tmp"
+    shutil.copyfile(source, temp_path)
+    os.replace(temp_path, target)
+
+
+def run_command(stage: Stage, root: str):
+    """
+    Runs a stage's command, prefixing each line of its output with the stage
+    name so that concurrent stages can be told apart.
+    """
+    if callable(stage.command):
+        stage.command()
+        return
+
+    process = subprocess.Popen(
+        stage.command, shell=True, cwd=root, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        universal_newlines=True, errors="replace",
+    )
+    for line in process.stdout:
+        print(f"[{stage.name}] {line}", end="", flush=True)
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, stage.command)
+
+
+def topological_order(stages: List[Stage]) -> List[Stage]:
+    by_name = {stage.name: stage for stage in stages}
+    order = []
+    state = {}
+
+    def visit(stage: Stage):
+        if state.get(stage.name) == "done":
+            return
+        if state.get(stage.name) == "visiting":
+            raise ValueError(f"Stage {stage.name} depends on itself")
+        state[stage.name] = "visiting"
+        for dependency in stage.depends_on:
+            if dependency not in by_name:
+                raise ValueError(f"Stage {stage.name} depends on unknown stage {dependency}")
+            visit(by_name[dependency])
+        state[stage.name] = "done"
+        order.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return order
+
+
+class Pipeline:
+    def __init__(self, stages: List[Stage], stamps: StampFile, root: str = ".", workers: int = 4,
+                 runner: Callable[[Stage, str], None] = run_command, outputs_dir: Optional[str] = None):
+        self.stages = topological_order(stages)
+        self.stamps = stamps
+        self.root = root
+        self.workers = workers
+        self.runner = runner
+        self.outputs_dir = outputs_dir or os.path.join(os.path.dirname(os.path.abspath(stamps.path)), OUTPUTS_DIRECTORY)
+
+    def _stored_output(self, stage: Stage, relative_path: str) -> str:
+        return os.path.join(self.outputs_dir, stage.name, relative_path)
+
+    def _save_outputs(self, stage: Stage) -> Dict[str, str]:
+        digests = {}
+        for relative_path in stage.outputs:
+            path = os.path.join(self.root, relative_path)
+            if not os.path.isfile(path):
+                raise FileNotFoundError(f"Stage {stage.name} did not write {relative_path}")
+            copy_atomically(path, self._stored_output(stage, relative_path))
+            digests[relative_path] = sha256_file(path)
+        return digests
+
+    def _restore_outputs(self, stage: Stage, dry_run: bool = False) -> bool:
+        """
+        Copies a stage's stored outputs back below the root, returning False,
+        without copying anything, unless all of them match its stamp.
+        """
+        recorded = self.stamps.outputs(stage.name)
+        for relative_path in stage.outputs:
+            stored = self._stored_output(stage, relative_path)
+            if relative_path not in recorded or not os.path.isfile(stored) or sha256_file(stored) != recorded[relative_path]:
+                return False
+        if not dry_run:
+            for relative_path in stage.outputs:
+                copy_atomically(self._stored_output(stage, relative_path), os.path.join(self.root, relative_path))
+        return True
+
+    def _run_stage(self, stage: Stage, stage_fingerprint: str) -> StageResult:
+        start = time.perf_counter()
+        try:
+            self.runner(stage, self.root)
+            outputs = self._save_outputs(stage)
+        except Exception as e:
+            return StageResult(stage.name, FAILED, time.perf_counter() - start, stage_fingerprint, str(e))
+        seconds = time.perf_counter() - start
+        self.stamps.record(stage.name, stage_fingerprint, seconds, outputs)
+        return StageResult(stage.name, SUCCEEDED, seconds, stage_fingerprint)
+
+    def run(self, force: List[str] = (), dry_run: bool = False) -> List[StageResult]:
+        """
+        Runs every stage whose fingerprint differs from its stamp, whose
+        outputs cannot be restored, or which is in `force`, as soon as its
+        dependencies have succeeded or been skipped.
+        """
+        results: Dict[str, StageResult] = {}
+        pending = {}
+
+        def ready(stage: Stage) -> bool:
+            return stage.name not in results and stage.name not in pending.values() and all(
+                d in results for d in stage.depends_on)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while len(results) < len(self.stages):
+                for stage in [s for s in self.stages if ready(s)]:
+                    if any(results[d].status in (FAILED, BLOCKED) for d in stage.depends_on):
+                        results[stage.name] = StageResult(stage.name, BLOCKED, 0.0, "")
+                        continue
+                    stage_fingerprint = fingerprint(self.root, stage, {d: results[d].fingerprint for d in stage.depends_on})
+                    if (stage.name not in force and self.stamps.fingerprint(stage.name) == stage_fingerprint
+                            and self._restore_outputs(stage, dry_run)):
+                        results[stage.name] = StageResult(stage.name, SKIPPED, 0.0, stage_fingerprint)
+                    elif dry_run:
+                        results[stage.name] = StageResult(stage.name, WOULD_RUN, 0.0, stage_fingerprint)
+                    else:
+                        pending[pool.submit(self._run_stage, stage, stage_fingerprint)] = stage.name
+
+                if pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        result = future.result()
+                        results[result.name] = result
+                        del pending[future]
+
+        return [results[stage.name] for stage in self.stages]
+
+
+def load_stages(spec: str) -> List[Stage]:
+    module_name, function_name = spec.split(":", 1)
+    return getattr(importlib.import_module(module_name), function_name)()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the build pipeline, skipping unchanged stages")
+    parser.add_argument("--stamp-file", default=os.environ.get("PIPELINE_STAMP_FILE", DEFAULT_STAMP_FILE),
+        help="Where to keep the fingerprints of successful stages")
+    parser.add_argument("--outputs-dir", default=os.environ.get("PIPELINE_OUTPUTS_DIR"),
+        help=f"Where to keep the stages' outputs (default: {OUTPUTS_DIRECTORY} beside the stamp file)")
+    parser.add_argument("--root", default=".", help="Directory the inputs and commands are relative to")
+    parser.add_argument("--force", action="append", default=[], help="Run this stage even if unchanged")
+    parser.add_argument("--workers", type=int, default=4, help="Number of stages run at once")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which stages would run")
+    parser.add_argument("--stages", help="module:function returning the stages to run instead of the default ones")
+    parser.add_argument("--output", help="Write the stage timings as JSON to this file")
+    args = parser.parse_args()
+
+    stages = load_stages(args.stages) if args.stages else default_stages()
+    pipeline = Pipeline(stages, StampFile(args.stamp_file), root=args.root, workers=args.workers,
+                        outputs_dir=args.outputs_dir)
+    start = time.perf_counter()
+    results = pipeline.run(force=args.force, dry_run=args.dry_run)
+    total = time.perf_counter() - start
+
+    for result in results:
+        print(f"{result.name:<20} {result.status:<10} {result.seconds:>9.1f} s  {result.fingerprint[:12]}"
+              + (f"  {result.error}" if result.error else ""))
+    print(f"Pipeline finished in {total:.1f} s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"seconds": round(total, 3), "stages": [r._asdict() for r in results]}, f, indent=1)
+
+    if any(result.status in (FAILED, BLOCKED) for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Selects the part of a Homebrew `lib` directory which the Lambda actually
+needs: the libraries it loads (the roots), the transitive closure of their
+`DT_NEEDED` entries and any declared data files.  Static archives, pkgconfig
+and cmake files, and libraries which nothing loads are left behind.
+
+The selection is copied to a staging directory, which later steps patch and
+strip in place and `build_tools.blob_store` then installs to EFS.
+
+Usage: python3 -m build_tools.prune [source] [staging] --root proj --root exif
+"""
+
+import argparse
+import fnmatch
+import os
+import shutil
+
+from typing import Dict, List, NamedTuple, Set
+
+from .elf import ElfError, read_dynamic_info
+from .manifest import iter_shared_objects
+from .sync import list_files
+
+
+class Closure(NamedTuple):
+    files: List[str]
+    sonames: List[str]
+    external: List[str]
+    missing_roots: List[str]
+
+
+class TreeSize(NamedTuple):
+    files: int
+    bytes: int
+
+
+def index_shared_objects(source: str) -> Dict[str, Dict]:
+    """
+    Returns the shared objects in `source` keyed by both soname and filename.
+    Each entry holds the soname, the `DT_NEEDED` list and the relative paths of
+    every file providing that soname.
+    """
+    by_soname = {}
+    by_filename = {}
+
+    for path in iter_shared_objects(source):
+        try:
+            info = read_dynamic_info(path)
+        except (OSError, ElfError):
+            continue
+
+        filename = os.path.basename(path)
+        soname = info.soname or filename
+        entry = by_soname.setdefault(soname, {"soname": soname, "needed": info.needed, "files": []})
+        entry["files"].append(os.path.relpath(path, source))
+        by_filename[filename] = entry
+
+    index = dict(by_filename)
+    index.update(by_soname)
+    return index
+
+
+def dependency_closure(source: str, roots: List[str]) -> Closure:
+    """
+    Walks `DT_NEEDED` from the root libraries.  A root may be a short name
+    (`proj`), a link name (`libproj.so`) or a soname.  Dependencies which are
+    not in `source` (e.g. libc) are reported as external and not copied.
+    """
+    index = index_shared_objects(source)
+    files: Set[str] = set()
+    sonames: List[str] = []
+    external: Set[str] = set()
+    missing_roots = []
+
+    pending = []
+    for root in roots:
+        candidate = next((c for c in (root, f"lib{root}.so") if c in index), None)
+        if candidate is None:
+            missing_roots.append(root)
+            continue
+        # Keep the link name of a root as well as its soname, so that the
+        # resolver can look it up by its short name.
+        files.update(f for f in index[candidate]["files"] if os.path.basename(f) == candidate)
+        pending.append(index[candidate]["soname"])
+
+    while pending:
+        soname = pending.pop()
+        if soname in sonames:
+            continue
+        if soname not in index:
+            external.add(soname)
+            continue
+
+        entry = index[soname]
+        sonames.append(soname)
+        preferred = [f for f in entry["files"] if os.path.basename(f) == soname]
+        files.update(preferred or entry["files"][:1])
+        pending.extend(entry["needed"])
+
+    return Closure(sorted(files), sorted(sonames), sorted(external), missing_roots)
+
+
+def match_data_files(source: str, patterns: List[str]) -> List[str]:
+    return [
+        relative_path for relative_path in list_files(source)
+        if any(fnmatch.fnmatch(relative_path, pattern) for pattern in patterns)
+    ]
+
+
+def tree_size(root: str, relative_paths: List[str] = None) -> TreeSize:
+    if relative_paths is None:
+        relative_paths = list_files(root)
+    return TreeSize(
+        len(relative_paths),
+        sum(os.path.getsize(os.path.join(root, p)) for p in relative_paths)
+    )
+
+
+def write_staging(source: str, staging: str, relative_paths: List[str]):
+    """
+    Recreates `staging` as a copy of the selected source files, so that the
+    steps which modify them do not modify Homebrew's own files.  Selected
+    names of the same file are staged as one copy, under the file's real
+    name if that was selected or else the most specific one, and relative
+    symlinks to it.
+    """
+    if os.path.isdir(staging):
+        shutil.rmtree(staging)
+
+    by_real_path: Dict[str, List[str]] = {}
+    for relative_path in relative_paths:
+        by_real_path.setdefault(os.path.realpath(os.path.join(source, relative_path)), []).append(relative_path)
+
+    for real_path, names in by_real_path.items():
+        copy_name = next((n for n in names if os.path.basename(n) == os.path.basename(real_path)),
+                         max(names, key=lambda n: (len(n), n)))
+        copy_path = os.path.join(staging, copy_name)
+        os.makedirs(os.path.dirname(copy_path), exist_ok=True)
+        shutil.copy2(real_path, copy_path)
+        for name in names:
+            if name == copy_name:
+                continue
+            link_path = os.path.join(staging, name)
+            os.makedirs(os.path.dirname(link_path), exist_ok=True)
+            os.symlink(os.path.relpath(copy_path, os.path.dirname(link_path)), link_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stages the DT_NEEDED closure of the Lambda's libraries")
+    parser.add_argument("source", help="Library directory to select from, e.g. /home/linuxbrew/.linuxbrew/lib")
+    parser.add_argument("staging", help="Directory in which to copy the selected files")
+    parser.add_argument("--root", action="append", default=[], help="Library loaded by the Lambda, e.g. proj")
+    parser.add_argument("--data", action="append", default=[], help="Glob (relative to source) of data files to keep")
+    args = parser.parse_args()
+
+    closure = dependency_closure(args.source, args.root)
+    if closure.missing_roots:
+        print(f"WARNING: root libraries not found: {', '.join(closure.missing_roots)}")
+
+    selected = sorted(set(closure.files) | set(match_data_files(args.source, args.data)))
+    write_staging(args.source, args.staging, selected)
+
+    before = tree_size(args.source)
+    after = tree_size(args.source, selected)
+    print(f"Libraries needed: {', '.join(closure.sonames)}")
+    print(f"Provided by the system: {', '.join(closure.external)}")
+    print(f"Before pruning: {before.files} files, {before.bytes} bytes")
+    print(f"After pruning:  {after.files} files, {after.bytes} bytes")
+
+
+if __name__ == "__main__":
+    main()
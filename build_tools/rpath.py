@@ -0,0 +1,245 @@
+"""
+Rewrites the run path of installed libraries to `$ORIGIN`, and analyzes how
+many failed `open` calls the dynamic linker makes to find their dependencies.
+
+Homebrew links its libraries with a run path pointing into its own prefix,
+which does not exist on Lambda, so every dependency is instead found through
+`LD_LIBRARY_PATH`, after failing in each of the directories before it.  With
+`DT_RUNPATH` set to `$ORIGIN`, dependencies resolve next to the library which
+needs them (as they do with a `DT_RPATH` of `$ORIGIN`, for libraries linked
+with one).  The patch is made in place, by overwriting the existing run path
+string, so no sections have to be moved.
+
+Usage:
+    python3 -m build_tools.rpath patch [lib_path]
+    python3 -m build_tools.rpath analyze [lib_path] --root proj [--ld-library-path PATH] [--map FROM=TO]
+"""
+
+import argparse
+import json
+import os
+
+from typing import Dict, List, NamedTuple, Optional
+
+from .elf import DT_RPATH, DT_RUNPATH, ElfError, ElfFile, read_dynamic_info
+from .manifest import iter_shared_objects
+
+
+# The Lambda runtime's default library path
+LAMBDA_RUNTIME_LIBRARY_PATH = [
+    "/var/lang/lib", "/lib64", "/usr/lib64", "/var/runtime", "/var/runtime/lib",
+    "/var/task", "/var/task/lib", "/opt/lib",
+]
+# The part of it the runtime itself needs regardless of what the installed
+# libraries need: the interpreter's own libraries.  /lib64 and /usr/lib64 are
+# searched by default anyway, and the handler loads the hot libraries layer
+# from /opt/lib by absolute path.
+REQUIRED_RUNTIME_LIBRARY_PATH = ["/var/lang/lib"]
+# Kept last, for libraries whose run path could not be patched (see
+# `set_runpath`); it costs no failed probes for dependencies found before it
+EFS_LIBRARY_DIRECTORY = "/mnt/efs/lambda_packages/lib"
+DEFAULT_LIBRARY_DIRECTORIES = ["/lib64", "/usr/lib64"]
+
+
+class PatchResult(NamedTuple):
+    path: str
+    status: str
+    previous: Optional[str]
+
+
+def set_runpath(path: str, runpath: str = "$ORIGIN") -> PatchResult:
+    """
+    Sets the run path to `runpath`, in `DT_RUNPATH` or, for libraries with
+    only a `DT_RPATH`, in that.  The new value must fit in the space of the
+    old string; libraries with no run path at all, or too short a one, are
+    left alone.
+    """
+    with open(path, "r+b") as f:
+        elf = ElfFile(f)
+        strtab = elf.dynamic_string_table()
+        entries = [e for e in elf.dynamic_entries() if e.tag in (DT_RPATH, DT_RUNPATH)]
+        if strtab is None or not entries:
+            return PatchResult(path, "no-runpath", None)
+
+        entry = next((e for e in entries if e.tag == DT_RUNPATH), entries[0])
+        previous = elf.read_string(strtab + entry.value)
+        if previous == runpath:
+            return PatchResult(path, "unchanged", previous)
+        if len(runpath) > len(previous):
+            return PatchResult(path, "too-short", previous)
+
+        f.seek(strtab + entry.value)
+        # A DT_RUNPATH entry, if present, makes the linker ignore DT_RPATH.  A
+        # DT_RPATH alone keeps its tag: changing it would also change where
+        # the run path is searched relative to LD_LIBRARY_PATH, and whether it
+        # applies to the library's indirect dependencies.
+        f.write(runpath.encode() + b"\0" * (len(previous) - len(runpath) + 1))
+
+    return PatchResult(path, "patched", previous)
+
+
+def patch_directory(lib_path: str, runpath: str = "$ORIGIN") -> List[PatchResult]:
+    """
+    Patches every shared object below `lib_path`.  Symlinks are followed and
+    each real file is patched once.
+    """
+    results = []
+    seen = set()
+    for path in iter_shared_objects(lib_path):
+        real_path = os.path.realpath(path)
+        if real_path in seen:
+            continue
+        seen.add(real_path)
+        try:
+            results.append(set_runpath(path, runpath))
+        except (OSError, ElfError):
+            results.append(PatchResult(path, "error", None))
+    return results
+
+
+class LoadProbes(NamedTuple):
+    soname: str
+    needed_by: str
+    failed_probes: int
+    found: Optional[str]
+
+
+def expand_origin(directory: str, origin: str) -> str:
+    return directory.replace("$ORIGIN", origin).replace("${ORIGIN}", origin)
+
+
+def analyze(lib_path: str, roots: List[str], ld_library_path: List[str], path_map: Dict[str, str] = None,
+            default_directories: List[str] = None) -> List[LoadProbes]:
+    """
+    Simulates the dynamic linker loading each root library from `lib_path` and
+    then its dependencies, counting the directories probed unsuccessfully
+    before each dependency is found.  `path_map` maps directories as seen by
+    the Lambda (e.g. `/mnt/efs/lambda_packages/lib`) to where they are on
+    this machine.
+    """
+    path_map = path_map or {}
+    default_directories = DEFAULT_LIBRARY_DIRECTORIES if default_directories is None else default_directories
+
+    def local(directory: str) -> str:
+        for remote, local_directory in path_map.items():
+            if directory == remote or directory.startswith(remote.rstrip("/") + "/"):
+                return local_directory + directory[len(remote.rstrip("/")):]
+        return directory
+
+    loaded = set()
+    probes = []
+    pending: List[str] = []
+
+    for root in roots:
+        for candidate in (root, f"lib{root}.so"):
+            path = os.path.join(lib_path, candidate)
+            if os.path.exists(path):
+                pending.append(path)
+                break
+
+    while pending:
+        path = pending.pop(0)
+        info = read_dynamic_info(path)
+        loaded.add(info.soname or os.path.basename(path))
+        # As in glibc, $ORIGIN is the directory of the path the object was
+        # opened by, without resolving symlinks
+        origin = os.path.dirname(os.path.abspath(path))
+
+        search = []
+        if info.rpath and not info.runpath:
+            search += [expand_origin(d, origin) for d in info.rpath.split(":")]
+        search += [local(d) for d in ld_library_path]
+        if info.runpath:
+            search += [expand_origin(d, origin) for d in info.runpath.split(":")]
+        search += default_directories
+
+        for soname in info.needed:
+            if soname in loaded:
+                continue
+            failed, found = 0, None
+            for directory in search:
+                candidate = os.path.join(directory, soname)
+                if os.path.exists(candidate):
+                    found = candidate
+                    break
+                failed += 1
+            probes.append(LoadProbes(soname, os.path.basename(path), failed, found))
+            loaded.add(soname)
+            if found is not None:
+                pending.append(found)
+
+    return probes
+
+
+def minimal_library_path(lib_path: str, roots: List[str], ld_library_path: List[str], keep: List[str],
+                         path_map: Dict[str, str] = None) -> List[str]:
+    """
+    Removes each directory of `ld_library_path` in turn, other than those in
+    `keep`, as long as every dependency still resolves to the same file.
+    """
+    def resolved(search_path):
+        return {p.soname: p.found and os.path.realpath(p.found) for p in analyze(lib_path, roots, search_path, path_map)}
+
+    expected = resolved(ld_library_path)
+    minimal = list(ld_library_path)
+    for directory in ld_library_path:
+        if directory in keep:
+            continue
+        candidate = [d for d in minimal if d != directory]
+        if resolved(candidate) == expected:
+            minimal = candidate
+    return minimal
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run path patching and library search analysis")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    patch_parser = subparsers.add_parser("patch", help="Set the run path of every library to $ORIGIN")
+    patch_parser.add_argument("lib_path", help="Directory of libraries to patch")
+    patch_parser.add_argument("--runpath", default="$ORIGIN", help="Run path to set")
+
+    analyze_parser = subparsers.add_parser("analyze", help="Count failed probes and suggest LD_LIBRARY_PATH")
+    analyze_parser.add_argument("lib_path", help="Directory of installed libraries")
+    analyze_parser.add_argument("--root", action="append", default=[], help="Library loaded by the Lambda")
+    analyze_parser.add_argument("--ld-library-path", default=":".join(LAMBDA_RUNTIME_LIBRARY_PATH + [EFS_LIBRARY_DIRECTORY]),
+        help="LD_LIBRARY_PATH to analyze")
+    analyze_parser.add_argument("--keep", default=":".join(REQUIRED_RUNTIME_LIBRARY_PATH),
+        help="Directories which must stay in LD_LIBRARY_PATH")
+    analyze_parser.add_argument("--map", action="append", default=[], help="FROM=TO mapping of Lambda paths to local ones")
+    analyze_parser.add_argument("--output", help="Write the report as JSON to this file")
+
+    args = parser.parse_args()
+
+    if args.command == "patch":
+        results = patch_directory(args.lib_path, args.runpath)
+        for result in results:
+            if result.status != "unchanged":
+                print(f"{result.status:>10}  {result.path}  (was {result.previous})")
+        print(f"Patched {sum(r.status == 'patched' for r in results)} of {len(results)} libraries")
+        return
+
+    path_map = dict(mapping.split("=", 1) for mapping in args.map)
+    ld_library_path = [d for d in args.ld_library_path.split(":") if d]
+    keep = [d for d in args.keep.split(":") if d]
+
+    probes = analyze(args.lib_path, args.root, ld_library_path, path_map)
+    minimal = minimal_library_path(args.lib_path, args.root, ld_library_path, keep, path_map)
+    minimal_probes = analyze(args.lib_path, args.root, minimal, path_map)
+
+    for probe in probes:
+        print(f"{probe.failed_probes:>4} failed probes  {probe.soname} (needed by {probe.needed_by})")
+    print(f"Total failed probes: {sum(p.failed_probes for p in probes)}")
+    print(f"Total failed probes with minimal path: {sum(p.failed_probes for p in minimal_probes)}")
+    print(f"Minimal LD_LIBRARY_PATH={':'.join(minimal)}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "probes": [p._asdict() for p in probes],
+                "ld_library_path": ":".join(minimal),
+            }, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Strips debug information and unneeded symbols from the libraries to be
+installed, so that the dynamic linker has fewer bytes to read from EFS.
+
+Homebrew's libraries keep their full symbol tables and, for some formulae,
+debug sections, none of which is mapped or used at run time.  Each library is
+stripped with binutils' `strip --strip-unneeded`, which keeps the dynamic
+symbol table that `dlopen` and ctypes resolve names from.  A stripped library
+whose soname or dependencies no longer read back the same is restored.
+
+The unstripped originals can be kept in a side directory, which
+`brew_install.sh` installs as the generation's `debug/lib` folder.
+
+Usage: python3 -m build_tools.strip [lib_path] [--originals DIR] [--output report.json]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional
+
+from .elf import ElfError, read_dynamic_info
+from .manifest import iter_shared_objects
+
+
+DEBUG_DIRECTORY = "debug"
+STRIP_ARGUMENTS = ["--strip-unneeded", "--remove-section=.comment"]
+
+
+class StripResult(NamedTuple):
+    path: str
+    status: str
+    before: int
+    after: int
+    error: Optional[str] = None
+
+
+def strip_library(path: str, lib_path: str, originals: Optional[str], strip: str = "strip") -> StripResult:
+    """
+    Strips one library in place, first copying it below `originals` if given.
+    """
+    real_path = os.path.realpath(path)
+    relative_path = os.path.join(os.path.dirname(os.path.relpath(path, lib_path)), os.path.basename(real_path))
+    before = os.path.getsize(real_path)
+    try:
+        info = read_dynamic_info(real_path)
+    except (OSError, ElfError):
+        return StripResult(relative_path, "not-elf", before, before)
+
+    backup = os.path.join(originals, relative_path) if originals else real_path + ".unstripped"
+    os.makedirs(os.path.dirname(backup), exist_ok=True)
+    shutil.copy2(real_path, backup)
+
+    try:
+        subprocess.run([strip] + STRIP_ARGUMENTS + [real_path], check=True, stderr=subprocess.PIPE,
+                       universal_newlines=True)
+        stripped = read_dynamic_info(real_path)
+        if (stripped.soname, stripped.needed) != (info.soname, info.needed):
+            raise ElfError("dynamic section changed")
+    except (OSError, ElfError, subprocess.CalledProcessError) as e:
+        shutil.copy2(backup, real_path)
+        error = e.stderr.strip() if isinstance(e, subprocess.CalledProcessError) else str(e)
+        return StripResult(relative_path, "restored", before, before, error)
+    finally:
+        if not originals:
+            os.remove(backup)
+
+    return StripResult(relative_path, "stripped", before, os.path.getsize(real_path))
+
+
+def strip_directory(lib_path: str, originals: str = None, strip: str = "strip", workers: int = 8) -> List[StripResult]:
+    """
+    Strips every shared object below `lib_path`.  Symlinks are followed and
+    each real file is stripped once.
+    """
+    paths = []
+    seen = set()
+    for path in iter_shared_objects(lib_path):
+        real_path = os.path.realpath(path)
+        if real_path in seen or not os.path.isfile(real_path):
+            continue
+        seen.add(real_path)
+        paths.append(path)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda path: strip_library(path, lib_path, originals, strip), paths))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Strips debug and unneeded sections from installed libraries")
+    parser.add_argument("lib_path", help="Directory of libraries to strip, e.g. the pruned staging directory")
+    parser.add_argument("--originals", help="Directory in which to keep the unstripped libraries")
+    parser.add_argument("--strip", default=os.environ.get("STRIP_PROGRAM", "strip"), help="strip program to use")
+    parser.add_argument("--workers", type=int, default=8, help="Number of libraries stripped at once")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    if shutil.which(args.strip) is None:
+        print(f"WARNING: {args.strip} not found, libraries left unstripped")
+        return
+
+    results = strip_directory(args.lib_path, args.originals, args.strip, args.workers)
+    for result in results:
+        saved = result.before - result.after
+        print(f"{result.status:>9} {result.before:>12} -> {result.after:>12} ({saved:>10} saved)  {result.path}"
+              + (f"  {result.error}" if result.error else ""))
+
+    before = sum(r.before for r in results)
+    after = sum(r.after for r in results)
+    print(f"Stripped {sum(r.status == 'stripped' for r in results)} of {len(results)} libraries: "
+          f"{before} -> {after} bytes ({100 * (before - after) / max(before, 1):.1f}% smaller)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"before": before, "after": after, "libraries": [r._asdict() for r in results]}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
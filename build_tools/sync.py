@@ -0,0 +1,154 @@
+"""
+Incrementally copies a directory tree (e.g. Homebrew's `lib`) into
+`lambda_packages` on EFS.
+
+A manifest of content hashes is kept in the target directory, so files which
+have not changed since the last run are skipped, and the remaining copies are
+spread over a pool of workers because EFS throughput scales with the number of
+parallel writers.  Symlinks in the source are followed, as with `cp -L`.
+Files in the target which no longer exist in the source are deleted.
+
+brew_install.sh now installs through `blob_store`, which supersedes `sync`
+for `lambda_packages`.  The file helpers here (`list_files`, `sha256_file`,
+`copy_file` and `remove_empty_directories`) are still shared by
+`blob_store`, `manifest`, `lambda_package` and the other build tools.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+
+SYNC_MANIFEST_NAME = ".sync_manifest.json"
+
+
+class SyncReport:
+    """
+    Totals for a single sync run.
+    """
+
+    def __init__(self):
+        self.files_written = 0
+        self.files_skipped = 0
+        self.files_deleted = 0
+        self.bytes_written = 0
+        self.bytes_skipped = 0
+
+    def as_dict(self) -> Dict:
+        return dict(vars(self))
+
+    def __str__(self):
+        return (
+            f"{self.files_written} files written ({self.bytes_written} bytes), "
+            f"{self.files_skipped} files skipped ({self.bytes_skipped} bytes), "
+            f"{self.files_deleted} files deleted"
+        )
+
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def list_files(root: str) -> List[str]:
+    """
+    Returns the paths of all files below `root`, relative to it, following
+    symlinked files and directories.
+    """
+    files = []
+    for directory, dirnames, filenames in os.walk(root, followlinks=True):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(directory, filename)
+            if os.path.isfile(path):
+                files.append(os.path.relpath(path, root))
+    return files
+
+
+def load_sync_manifest(target: str) -> Dict[str, Dict]:
+    try:
+        with open(os.path.join(target, SYNC_MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_sync_manifest(target: str, manifest: Dict[str, Dict]):
+    manifest_path = os.path.join(target, SYNC_MANIFEST_NAME)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def copy_file(source_path: str, target_path: str):
+    """
+    Copies a file via a temporary name and renames it into place, so that a
+    reader never sees a partially written library.
+    """
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    temp_path = target_path + ".sync-tmp"
+    shutil.copy2(source_path, temp_path)
+    os.replace(temp_path, target_path)
+
+
+def sync(source: str, target: str, workers: int = 16, delete: bool = True) -> SyncReport:
+    """
+    Makes `target` a copy of `source`, writing only files whose content hash
+    differs from the one recorded in the target's sync manifest.
+    """
+    report = SyncReport()
+    os.makedirs(target, exist_ok=True)
+
+    previous = load_sync_manifest(target)
+    source_files = list_files(source)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        hashes = list(pool.map(lambda f: sha256_file(os.path.join(source, f)), source_files))
+
+        current = {}
+        to_copy: List[Tuple[str, int]] = []
+
+        for relative_path, digest in zip(source_files, hashes):
+            size = os.path.getsize(os.path.join(source, relative_path))
+            current[relative_path] = {"sha256": digest, "size": size}
+
+            recorded = previous.get(relative_path)
+            target_path = os.path.join(target, relative_path)
+            if (recorded is not None and recorded["sha256"] == digest
+                    and os.path.isfile(target_path) and os.path.getsize(target_path) == size):
+                report.files_skipped += 1
+                report.bytes_skipped += size
+            else:
+                to_copy.append((relative_path, size))
+
+        list(pool.map(
+            lambda item: copy_file(os.path.join(source, item[0]), os.path.join(target, item[0])),
+            to_copy
+        ))
+
+    report.files_written = len(to_copy)
+    report.bytes_written = sum(size for _, size in to_copy)
+
+    if delete:
+        for relative_path in list_files(target):
+            if relative_path != SYNC_MANIFEST_NAME and relative_path not in current:
+                os.remove(os.path.join(target, relative_path))
+                report.files_deleted += 1
+        remove_empty_directories(target)
+
+    write_sync_manifest(target, current)
+    return report
+
+
+def remove_empty_directories(root: str):
+    for directory, _, _ in sorted(os.walk(root), key=lambda entry: -len(entry[0])):
+        if directory != root and not os.listdir(directory):
+            os.rmdir(directory)
+
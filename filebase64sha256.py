@@ -1,11 +1,33 @@
 """
-Terraform's `filebase64sha256` function, in Python (cf. https://www.terraform.io/docs/providers/aws/r/lambda_function.html) 
+Terraform's `filebase64sha256` function, in Python (cf. https://www.terraform.io/docs/providers/aws/r/lambda_function.html)
 
 See https://gist.github.com/LouisAmon/ea395d39d80b28eb78181831fa523456
+
+Digests are remembered in a sidecar cache file, keyed by path, size,
+modification time and inode, so that artifacts which have not changed since
+the last `pulumi up` are not read again.  Large files are hashed through
+`mmap`, and several files can be hashed at once: `hashlib` releases the GIL
+while it hashes, so threads run in parallel.
+
+Usage: python3 filebase64sha256.py [--tree] path...
 """
 
 import base64
 import hashlib
+import json
+import mmap
+import os
+import stat
+import threading
+import time
+
+
+CACHE_PATH = os.environ.get("FILEBASE64SHA256_CACHE", ".filebase64sha256_cache.json")
+CACHE_VERSION = 1
+MMAP_THRESHOLD = 16 * 1024 * 1024
+# Files modified this recently may change again within the same mtime tick, so
+# their digests are not cached
+RACY_NANOSECONDS = 2 * 1000 * 1000 * 1000
 
 
 def sha256sum(filename):
@@ -18,19 +40,195 @@ def sha256sum(filename):
     mimic Terraform.
     """
     h  = hashlib.sha256()
-    b  = bytearray(128*1024)
-    mv = memoryview(b)
     with open(filename, 'rb', buffering=0) as f:
+        if os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                h.update(m)
+            return h.digest()
+
+        b  = bytearray(128*1024)
+        mv = memoryview(b)
         for n in iter(lambda : f.readinto(mv), 0):
             h.update(mv[:n])
     return h.digest()
 
-def filebase64sha256(filename):
+
+class HashCache:
+    """
+    The digests of files, keyed by absolute path and valid for as long as the
+    file's size, `mtime_ns` and inode are unchanged.
+    """
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            self._entries = data["files"] if data.get("version") == CACHE_VERSION else {}
+        except (OSError, ValueError, KeyError, AttributeError):
+            self._entries = {}
+
+    @staticmethod
+    def _key(st):
+        return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+    def digest(self, filename):
+        """
+        Returns the SHA256 digest of a file, hashing it only if it is not in
+        the cache or has changed.
+        """
+        path = os.path.abspath(filename)
+        st = os.stat(path)
+        key = self._key(st)
+
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is not None and entry["stat"] == key:
+            with self._lock:
+                self.hits += 1
+            return base64.b64decode(entry["sha256"])
+
+        digest = sha256sum(path)
+        # The file may have been written to while it was hashed
+        if self._key(os.stat(path)) != key:
+            return digest
+
+        with self._lock:
+            self.misses += 1
+            if time.time_ns() - st.st_mtime_ns >= RACY_NANOSECONDS:
+                self._entries[path] = {"stat": key, "sha256": base64.b64encode(digest).decode()}
+                self._dirty = True
+        return digest
+
+    def save(self):
+        """
+        Writes the cache atomically, dropping entries for files which no
+        longer exist.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = {p: e for p, e in self._entries.items() if os.path.exists(p)}
+            self._dirty = False
+
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump({"version": CACHE_VERSION, "files": entries}, f, indent=1, sort_keys=True)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
+
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = HashCache()
+    return _default_cache
+
+
+def filebase64sha256(filename, cache=True):
     """
     Computes the Base64-encoded SHA256 hash of a file
     This function mimics its Terraform counterpart, therefore being compatible
     with Pulumi's provisioning engine.
     """
-    h = sha256sum(filename)
+    if cache:
+        hash_cache = default_cache()
+        h = hash_cache.digest(filename)
+        hash_cache.save()
+    else:
+        h = sha256sum(filename)
     b = base64.b64encode(h)
-    return b.decode()
\ No newline at end of file
+    return b.decode()
+
+
+def filebase64sha256_many(filenames, workers=4, cache=True):
+    """
+    Computes `filebase64sha256` of several files in parallel, returning a
+    dictionary keyed by the given filenames.
+    """
+    # Imported here, as are argparse and logging through it, to keep them out
+    # of the Pulumi program's startup when only single files are hashed
+    from concurrent.futures import ThreadPoolExecutor
+
+    hash_cache = default_cache() if cache else None
+    digest = hash_cache.digest if cache else sha256sum
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        digests = list(pool.map(digest, filenames))
+    if hash_cache is not None:
+        hash_cache.save()
+    return {f: base64.b64encode(d).decode() for f, d in zip(filenames, digests)}
+
+
+def tree_entries(directory):
+    """
+    Yields `(relative_path, kind, st)` for everything below `directory`, in a
+    stable order.  Symlinks are not followed.
+    """
+    for root, directories, filenames in os.walk(directory):
+        directories.sort()
+        for name in sorted(directories + filenames):
+            path = os.path.join(root, name)
+            st = os.lstat(path)
+            if stat.S_ISLNK(st.st_mode):
+                kind = "link"
+            elif stat.S_ISDIR(st.st_mode):
+                kind = "dir"
+            else:
+                kind = "file"
+            yield os.path.relpath(path, directory).replace(os.sep, "/"), kind, st
+
+
+def dirbase64sha256(directory, workers=4, cache=True):
+    """
+    Computes a Base64-encoded SHA256 hash of a directory tree, which depends
+    only on the relative paths, kinds, executable bits and contents of its
+    entries (and symlink targets), not on timestamps or the order in which
+    the file system lists them.
+    """
+    entries = list(tree_entries(directory))
+    files = [os.path.join(directory, p) for p, kind, _ in entries if kind == "file"]
+    digests = iter(filebase64sha256_many(files, workers, cache).values())
+
+    h = hashlib.sha256()
+    for relative_path, kind, st in entries:
+        if kind == "file":
+            executable = "x" if st.st_mode & stat.S_IXUSR else "-"
+            line = f"file {executable} {relative_path} {next(digests)}"
+        elif kind == "link":
+            line = f"link - {relative_path} {os.readlink(os.path.join(directory, relative_path))}"
+        else:
+            line = f"dir - {relative_path}"
+        h.update(line.encode() + b"\n")
+    return base64.b64encode(h.digest()).decode()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Terraform-compatible filebase64sha256 of files and trees")
+    parser.add_argument("paths", nargs="+", help="Files to hash, or directories with --tree")
+    parser.add_argument("--tree", action="store_true", help="Hash each path as a directory tree")
+    parser.add_argument("--workers", type=int, default=4, help="Number of files hashed at once")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore and do not update the cache")
+    args = parser.parse_args()
+
+    if args.tree:
+        for path in args.paths:
+            print(f"{dirbase64sha256(path, args.workers, not args.no_cache)}  {path}")
+    else:
+        for path, digest in filebase64sha256_many(args.paths, args.workers, not args.no_cache).items():
+            print(f"{digest}  {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,16 @@
 import json
 
-from typing import List, Dict
 import pulumi
 from pulumi.output import Input, Output
 from pulumi.resource import ResourceOptions
-from pulumi_aws import config, iam, kinesis, pinpoint, s3, ec2, efs, codebuild, ssm
+from pulumi_aws import iam, codebuild, ssm
 from pulumi_aws.get_caller_identity import get_caller_identity
 
 from .codebuild_policy import get_codebuild_base_policy, get_codebuild_vpc_policy
 from .vpc import VPC
 from .efs import EFS
 
+
 class CodeBuild(pulumi.ComponentResource):
     """
     The `nuage:aws:DevelopmentEnvironment:CodeBuild` component creates a
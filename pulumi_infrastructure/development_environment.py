@@ -1,17 +1,12 @@
-import json
-
-from typing import List, Dict
+from typing import List
 import pulumi
 from pulumi.output import Input, Output
-from pulumi.resource import ResourceOptions
-from pulumi_aws import config, iam, kinesis, pinpoint, s3, ec2, efs, codebuild, ssm
-from pulumi_aws.get_caller_identity import get_caller_identity
 
-from .codebuild_policy import get_codebuild_base_policy, get_codebuild_vpc_policy
 from .vpc import VPC
 from .efs import EFS
 from .codebuild import CodeBuild
 
+
 class DevelopmentEnvironment(pulumi.ComponentResource):
     """
     The `nuage:aws:DevelopmentEnvironment` component creates a VPC, Elastic
@@ -1,15 +1,11 @@
-import json
-
-from typing import List, Dict
 import pulumi
-from pulumi.output import Input, Output
+from pulumi.output import Output
 from pulumi.resource import ResourceOptions
-from pulumi_aws import config, iam, kinesis, pinpoint, s3, ec2, efs, codebuild, ssm
-from pulumi_aws.get_caller_identity import get_caller_identity
+from pulumi_aws import efs
 
-from .codebuild_policy import get_codebuild_base_policy, get_codebuild_vpc_policy
 from .vpc import VPC
 
+
 class EFS(pulumi.ComponentResource):
     """
     The `nuage:aws:DevelopmentEnvironment:EFS` component creates an EFS
@@ -1,11 +1,8 @@
-import json
-
-from typing import List, Dict
+from typing import List
 import pulumi
-from pulumi.output import Input, Output
+from pulumi.output import Output
 from pulumi.resource import ResourceOptions
-from pulumi_aws import config, iam, kinesis, pinpoint, s3, ec2, efs, codebuild, ssm
-from pulumi_aws.get_caller_identity import get_caller_identity
+from pulumi_aws import ec2
 
 
 class VPC(pulumi.ComponentResource):
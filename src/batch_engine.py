@@ -0,0 +1,218 @@
+"""
+Processes batches of event records (SQS, Kinesis or DynamoDB streams) over a
+bounded thread pool, reporting partial batch failures.
+
+At most `workers` records are in flight at once, and no record is started once
+the invocation's remaining time, from `context.get_remaining_time_in_millis()`,
+drops below `reserve_ms`.  Records which fail, are still running at that point
+or are never started are returned as `batchItemFailures`, so that only they
+are retried (the event source mapping must have `ReportBatchItemFailures`
+enabled).  A record still running when the batch returns carries on in the
+background and may be processed twice; handlers should be idempotent.
+
+Records of SQS FIFO queues (those with a `MessageGroupId`) and of Kinesis and
+DynamoDB streams must be processed in order, so such batches are processed
+one record at a time and stop at the first failure: the failed record and
+every record after it are reported.  For a stream, Lambda resumes the shard
+from the first reported sequence number.
+
+Any object with a `get_remaining_time_in_millis` method will do as the
+context, and `None` means no time limit.
+"""
+
+import threading
+import time
+import traceback
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TIMED_OUT = "timed-out"
+SKIPPED = "skipped"
+
+STREAM_EVENT_SOURCES = {"aws:kinesis", "aws:dynamodb"}
+BATCH_EVENT_SOURCES = {"aws:sqs"} | STREAM_EVENT_SOURCES
+
+
+class RecordResult(NamedTuple):
+    item_identifier: str
+    status: str
+    latency_ms: Optional[float]
+    result: Any = None
+    error: Optional[str] = None
+
+
+def record_identifier(record: Dict) -> str:
+    """
+    Returns the identifier Lambda expects in `batchItemFailures`: the message
+    ID for SQS and the sequence number for Kinesis and DynamoDB streams.
+    """
+    if "messageId" in record:
+        return record["messageId"]
+    if "kinesis" in record:
+        return record["kinesis"]["sequenceNumber"]
+    if "dynamodb" in record:
+        return record["dynamodb"]["SequenceNumber"]
+    raise ValueError("Cannot identify record")
+
+
+def is_fifo_record(record: Dict) -> bool:
+    return "MessageGroupId" in (record.get("attributes") or {})
+
+
+def is_ordered_record(record: Dict) -> bool:
+    """
+    Returns whether the record's batch must be processed in order: records of
+    FIFO queues and of streams, whose shards are ordered by sequence number.
+    """
+    return is_fifo_record(record) or record.get("eventSource") in STREAM_EVENT_SOURCES
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class BatchResult:
+    def __init__(self, results: List[RecordResult], elapsed_ms: float):
+        self.results = results
+        self.elapsed_ms = elapsed_ms
+
+    @property
+    def failures(self) -> List[RecordResult]:
+        return [r for r in self.results if r.status != SUCCEEDED]
+
+    def response(self) -> Dict:
+        """
+        The partial batch response to return from the handler.
+        """
+        return {"batchItemFailures": [{"itemIdentifier": r.item_identifier} for r in self.failures]}
+
+    def stats(self) -> Dict:
+        latencies = [r.latency_ms for r in self.results if r.latency_ms is not None]
+        counts = {status: 0 for status in (SUCCEEDED, FAILED, TIMED_OUT, SKIPPED)}
+        for result in self.results:
+            counts[result.status] += 1
+
+        def rounded(value):
+            return None if value is None else round(value, 3)
+
+        return {
+            "records": len(self.results),
+            **counts,
+            "elapsed_ms": round(self.elapsed_ms, 3),
+            "latency_ms": {
+                "mean": rounded(sum(latencies) / len(latencies) if latencies else None),
+                "p50": rounded(percentile(latencies, 0.5)),
+                "p95": rounded(percentile(latencies, 0.95)),
+                "p99": rounded(percentile(latencies, 0.99)),
+                "max": rounded(max(latencies) if latencies else None),
+            },
+        }
+
+
+class BatchProcessor:
+    """
+    Calls `process_record(record)` for each record of a batch event.  A
+    record fails if it raises.  The thread pool is kept across invocations, so
+    that per-thread state such as PROJ contexts is reused by warm containers.
+    """
+
+    def __init__(self, process_record: Callable[[Dict], Any], workers: int = 8, reserve_ms: int = 1000):
+        self.process_record = process_record
+        self.workers = workers
+        self.reserve_ms = reserve_ms
+
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def _remaining_ms(self, context) -> float:
+        if context is None:
+            return float("inf")
+        return context.get_remaining_time_in_millis() - self.reserve_ms
+
+    def _run(self, record: Dict, identifier: str, stopped: threading.Event) -> RecordResult:
+        # Records still queued behind stragglers from an earlier batch may only
+        # start after their own batch has given up on them
+        if stopped.is_set():
+            return RecordResult(identifier, SKIPPED, None)
+
+        start = time.perf_counter()
+        try:
+            result = self.process_record(record)
+        except Exception:
+            latency_ms = (time.perf_counter() - start) * 1000
+            return RecordResult(identifier, FAILED, latency_ms, error=traceback.format_exc(limit=5))
+        return RecordResult(identifier, SUCCEEDED, (time.perf_counter() - start) * 1000, result)
+
+    def process(self, event: Dict, context=None) -> BatchResult:
+        """
+        Processes the event's `Records`, returning once every record has
+        finished, the remaining time has run out or, for a FIFO queue or a
+        stream, a record has failed.
+        """
+        start = time.perf_counter()
+        records = event.get("Records", [])
+        identifiers = [record_identifier(record) for record in records]
+        results: List[Optional[RecordResult]] = [None] * len(records)
+        stopped = threading.Event()
+        pool = self._executor()
+        in_order = any(is_ordered_record(record) for record in records)
+        in_flight = 1 if in_order else self.workers
+
+        pending = {}
+        next_index = 0
+        halted = False
+        while (next_index < len(records) and not halted) or pending:
+            while (next_index < len(records) and not halted and len(pending) < in_flight
+                   and self._remaining_ms(context) > 0):
+                future = pool.submit(self._run, records[next_index], identifiers[next_index], stopped)
+                pending[future] = next_index
+                next_index += 1
+
+            remaining_ms = self._remaining_ms(context)
+            if not pending or remaining_ms <= 0:
+                break
+
+            timeout = None if remaining_ms == float("inf") else remaining_ms / 1000
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = results[pending.pop(future)] = future.result()
+                halted = halted or (in_order and result.status != SUCCEEDED)
+
+        stopped.set()
+        for future, index in pending.items():
+            results[index] = future.result() if future.done() else RecordResult(identifiers[index], TIMED_OUT, None)
+        for index in range(next_index, len(records)):
+            results[index] = RecordResult(identifiers[index], SKIPPED, None)
+
+        return BatchResult(results, (time.perf_counter() - start) * 1000)
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+
+
+def is_batch_event(event) -> bool:
+    """
+    Returns whether the event is a batch from an event source mapping which
+    supports partial batch responses.  Other events with `Records`, such as S3
+    and SNS notifications, are not.
+    """
+    if not isinstance(event, dict) or not isinstance(event.get("Records"), list) or not event["Records"]:
+        return False
+    return all(isinstance(record, dict) and record.get("eventSource") in BATCH_EVENT_SOURCES
+               for record in event["Records"])
@@ -0,0 +1,123 @@
+"""
+Unpacks a library bundle written by `build_tools.bundle` from EFS into `/tmp`.
+
+The bundle is read from EFS front to back in a single pass, while a pool of
+threads decompresses its independent chunks and writes them into place (zlib
+releases the GIL, so this is genuinely parallel).  The result is a local copy
+of the generation, including its manifest, which the resolver then uses
+instead of EFS.
+"""
+
+import json
+import os
+import shutil
+import struct
+import threading
+import zlib
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+
+BUNDLE_NAME = "library_bundle.lpb"
+BUNDLE_MAGIC = b"LPBUNDL1"
+HEADER_FORMAT = "<8sQQ"
+COMPLETE_MARKER = ".complete"
+DEFAULT_LOCAL_ROOT = "/tmp/lambda_packages"
+
+
+def read_index(bundle_path: str) -> Dict:
+    with open(bundle_path, "rb") as f:
+        magic, index_offset, index_length = struct.unpack(HEADER_FORMAT, f.read(struct.calcsize(HEADER_FORMAT)))
+        if magic != BUNDLE_MAGIC:
+            raise ValueError(f"{bundle_path} is not a library bundle")
+        f.seek(index_offset)
+        return json.loads(f.read(index_length))
+
+
+def extract_bundle(bundle_path: str, destination: str, workers: int = 4, max_pending: int = 16) -> str:
+    """
+    Extracts the bundle into `destination`, unless a complete copy is already
+    there, and returns `destination`.  Files are written into a temporary
+    directory which is renamed into place once everything has been written,
+    or deleted if extraction fails.
+    """
+    if os.path.exists(os.path.join(destination, COMPLETE_MARKER)):
+        return destination
+
+    index = read_index(bundle_path)
+    temp_destination = f"{destination}.tmp-{os.getpid()}"
+    if os.path.isdir(temp_destination):
+        shutil.rmtree(temp_destination)
+    os.makedirs(temp_destination)
+    try:
+        _extract(bundle_path, index, temp_destination, workers, max_pending)
+    except BaseException:
+        shutil.rmtree(temp_destination, ignore_errors=True)
+        raise
+
+    if os.path.isdir(destination):
+        shutil.rmtree(destination)
+    os.replace(temp_destination, destination)
+    return destination
+
+
+def _extract(bundle_path: str, index: Dict, temp_destination: str, workers: int, max_pending: int):
+    for directory in index["directories"]:
+        os.makedirs(os.path.join(temp_destination, directory), exist_ok=True)
+
+    pending = threading.BoundedSemaphore(max_pending)
+
+    def write_chunk(fd: int, offset: int, data: bytes):
+        try:
+            os.pwrite(fd, zlib.decompress(data), offset)
+        finally:
+            pending.release()
+
+    descriptors = {}
+    try:
+        chunks = []
+        for entry in index["files"]:
+            path = os.path.join(temp_destination, entry["path"])
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            descriptors[entry["path"]] = fd
+            os.ftruncate(fd, entry["size"])
+            for offset, position, length, _ in entry["chunks"]:
+                chunks.append((position, length, fd, offset))
+        chunks.sort()
+
+        with open(bundle_path, "rb", buffering=1024 * 1024) as f, ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = []
+            for position, length, fd, offset in chunks:
+                f.seek(position)
+                data = f.read(length)
+                pending.acquire()
+                futures.append(pool.submit(write_chunk, fd, offset, data))
+            for future in futures:
+                future.result()
+    finally:
+        for fd in descriptors.values():
+            os.close(fd)
+
+    for entry in index["files"]:
+        path = os.path.join(temp_destination, entry["path"])
+        os.chmod(path, entry["mode"])
+        os.utime(path, (entry["mtime"], entry["mtime"]))
+
+    for relative_path, target in index["symlinks"]:
+        os.symlink(target, os.path.join(temp_destination, relative_path))
+
+    open(os.path.join(temp_destination, COMPLETE_MARKER), "w").close()
+
+
+def local_copy(generation_path: str, local_root: str = DEFAULT_LOCAL_ROOT, workers: int = 4) -> str:
+    """
+    Returns the path of a local copy of the generation's bundle, extracting
+    it if this container has not already done so, or `None` if the
+    generation was not packed as a bundle.
+    """
+    bundle_path = os.path.join(generation_path, BUNDLE_NAME)
+    if not os.path.isfile(bundle_path):
+        return None
+    destination = os.path.join(local_root, os.path.basename(os.path.normpath(generation_path)))
+    return extract_bundle(bundle_path, destination, workers=workers)
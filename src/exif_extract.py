@@ -0,0 +1,173 @@
+"""
+Batch EXIF extraction over libexif, straight from memory.
+
+Payloads are handed to `exif_data_new_from_data` in place: `bytes` are passed
+as a pointer to their own storage, and writable buffers (`bytearray`, writable
+`memoryview`s and files mapped with `map_file`) through `from_buffer`.  Only
+other read-only buffers are copied.  Entries are read from libexif's structures
+directly rather than through callbacks, so parsing a batch over a thread pool
+runs in parallel: ctypes releases the GIL during each foreign call.  Every
+`ExifData` is released with `exif_data_unref` as soon as its tags are read.
+"""
+
+import ctypes
+import mmap
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+import libraries
+
+from libraries import EXIF_IFD_COUNT
+
+
+VALUE_BUFFER_SIZE = 1024
+
+
+class ExifBuffer(NamedTuple):
+    """
+    The address and length of a payload, along with the object which must be
+    kept alive while it is parsed.
+    """
+    address: int
+    size: int
+    owner: Any
+
+
+def as_exif_buffer(data) -> ExifBuffer:
+    """
+    Returns a view of a payload which can be passed to libexif, without
+    copying it unless it is a read-only buffer other than `bytes`.
+    """
+    if isinstance(data, bytes):
+        pointer = ctypes.c_char_p(data)
+        return ExifBuffer(ctypes.cast(pointer, ctypes.c_void_p).value or 0, len(data), (data, pointer))
+
+    view = memoryview(data).cast("B")
+    if view.readonly:
+        buffer = (ctypes.c_char * view.nbytes).from_buffer_copy(view)
+    else:
+        buffer = (ctypes.c_char * view.nbytes).from_buffer(view)
+    return ExifBuffer(ctypes.addressof(buffer), view.nbytes, (view, buffer))
+
+
+def map_file(path: str) -> mmap.mmap:
+    """
+    Maps a file copy-on-write, so that it can be passed to libexif without
+    being read into a Python object.  The mapping should be closed once the
+    file has been parsed.
+    """
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+
+class ExifExtractor:
+    """
+    Extracts EXIF tags as compact `{tag name: value}` dictionaries, e.g.
+    `{"Make": "Canon", "Orientation": "Top-left"}`.  If `tags` is given, only
+    those tags are formatted.  Where a tag appears in several IFDs, the first
+    (the main image's) wins.
+    """
+
+    def __init__(self, tags: Iterable[str] = None, workers: int = 4):
+        self.tags = None if tags is None else set(tags)
+        self.workers = workers
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pool = None
+        self._tag_names = {}
+
+    def _value_buffer(self) -> ctypes.Array:
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = ctypes.create_string_buffer(VALUE_BUFFER_SIZE)
+            self._local.buffer = buffer
+        return buffer
+
+    def _tag_name(self, tag: int, ifd: int) -> Optional[str]:
+        key = (tag, ifd)
+        if key not in self._tag_names:
+            name = libraries.exif.exif_tag_get_name_in_ifd(tag, ifd)
+            self._tag_names[key] = name.decode() if name else None
+        return self._tag_names[key]
+
+    def read_tags(self, exif_data) -> Dict[str, str]:
+        """
+        Returns the tags of a parsed `ExifData`, which the caller still owns.
+        """
+        value = self._value_buffer()
+        tags = {}
+        contents = exif_data.contents.ifd
+        for ifd in range(EXIF_IFD_COUNT):
+            if not contents[ifd]:
+                continue
+            content = contents[ifd].contents
+            for i in range(content.count):
+                entry = content.entries[i]
+                name = self._tag_name(entry.contents.tag, ifd)
+                if name is None or name in tags or (self.tags is not None and name not in self.tags):
+                    continue
+                libraries.exif.exif_entry_get_value(entry, value, VALUE_BUFFER_SIZE)
+                tags[name] = value.value.decode("utf-8", "replace").strip()
+        return tags
+
+    def extract(self, data) -> Dict[str, str]:
+        """
+        Returns the tags of one payload, e.g. the bytes of a JPEG file.  A
+        payload with no EXIF data gives an empty dictionary.
+        """
+        exif = libraries.exif
+        buffer = as_exif_buffer(data)
+        exif_data = exif.exif_data_new_from_data(buffer.address, buffer.size)
+        if not exif_data:
+            raise MemoryError("libexif could not allocate ExifData")
+
+        try:
+            return self.read_tags(exif_data)
+        finally:
+            exif.exif_data_unref(exif_data)
+            del buffer
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def extract_batch(self, payloads: List) -> List[Dict[str, str]]:
+        """
+        Extracts the tags of each payload, over the thread pool if there is
+        more than one payload and more than one worker.
+        """
+        if self.workers <= 1 or len(payloads) <= 1:
+            return [self.extract(payload) for payload in payloads]
+        return list(self._executor().map(self.extract, payloads))
+
+    def extract_file(self, path: str) -> Dict[str, str]:
+        mapped = map_file(path)
+        try:
+            return self.extract(mapped)
+        finally:
+            mapped.close()
+
+    def extract_files(self, paths: List[str]) -> List[Dict[str, str]]:
+        """
+        Maps and extracts the tags of each file, over the thread pool.
+        """
+        if self.workers <= 1 or len(paths) <= 1:
+            return [self.extract_file(path) for path in paths]
+        return list(self._executor().map(self.extract_file, paths))
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
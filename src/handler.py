@@ -1,53 +1,90 @@
-import subprocess
+import json
 import os
-import shutil
-import ctypes
 
-from ctypes.util import find_library
+import libraries
 
-def my_handler(event, context):
-    # Debugging: check that the environment variables include the EFS libraries path
-    print("EFS libraries: ", os.environ["LAMBDA_PACKAGES_PATH"])
-    print("PATH=", os.environ["PATH"])
-    print("LD_LIBRARY_PATH=", os.environ["LD_LIBRARY_PATH"])
-
-    # Debugging: check that the tools required by ctypes are present
-    print(subprocess.run(["/sbin/ldconfig", "--version"], check=False, capture_output=True, encoding="utf-8").stdout)
-    print(shutil.which("objdump"))
-    print(shutil.which("ld"))
-
-    # Debugging: Check that find_library can see the libraries
-    print("find_library proj:", find_library('proj'))
-    print("find_library exif:", find_library('exif'))
+from batch_engine import BatchProcessor, is_batch_event
+from library_registry import registry
+from library_resolver import get_resolver
 
+def check_libraries(event):
     # Simple test to call the `proj_area_create` function on the proj library and the
     # `exif_content_new` function on the exif library.  If they return a pointer,
-    # they are working.
+    # they are working.  Libraries are only loaded from EFS the first time they are
+    # used in a container, and only if the event asks for them.
+    requested = event.get("libraries", ["proj", "exif"]) if isinstance(event, dict) else ["proj", "exif"]
 
     proj_result = None
     exif_result = None
 
-    try:
-        projlib = ctypes.CDLL(find_library('proj'))
-        proj_result = projlib.proj_area_create()
-        print("Call proj_area_create result:", proj_result)
-    except Exception:
-        pass
+    if "proj" in requested:
+        try:
+            proj_result = libraries.proj.proj_area_create()
+            print("Call proj_area_create result:", proj_result)
+        except Exception:
+            pass
 
-    try:
-        exiflib = ctypes.CDLL(find_library('exif'))
-        exif_result = exiflib.exif_content_new()
-        print("Call exif_content_new result:", exif_result)
-    except Exception:
-        pass
+    if "exif" in requested:
+        try:
+            exif_result = libraries.exif.exif_content_new()
+            print("Call exif_content_new result:", exif_result)
+        except Exception:
+            pass
 
     if proj_result is None and exif_result is None:
         raise Exception("Could not find libraries")
-    
-    return { 
+
+    return {
             'message' : "Found a library",
             'libproj_found': proj_result is not None,
             'libexif_found': exif_result is not None,
             'libproj_pointer': proj_result,
             'libexif_pointer': exif_result,
         }
+
+def process_record(record):
+    # Each record of a batch carries an event like the ones `my_handler` takes on
+    # its own, as a JSON body (SQS) or not at all
+    body = record.get("body")
+    return check_libraries(json.loads(body) if body else {})
+
+batch_processor = BatchProcessor(process_record, workers=int(os.environ.get("BATCH_WORKERS", "8")))
+
+# Resolve the generation of lambda_packages, and unpack its bundle or prefetch
+# its libraries, while the function initializes rather than in the first
+# invocation
+get_resolver()
+
+def my_handler(event, context):
+    # Debugging: check that the environment variables include the EFS libraries path
+    print("EFS libraries: ", os.environ["LAMBDA_PACKAGES_PATH"])
+    print("PATH=", os.environ["PATH"])
+    print("LD_LIBRARY_PATH=", os.environ["LD_LIBRARY_PATH"])
+
+    # Stop the generation of lambda_packages this container resolved at startup
+    # from being garbage collected while it is still in use
+    get_resolver().mark_in_use()
+    if get_resolver().bundle_error is not None:
+        print("Could not unpack library bundle, loading from EFS:", get_resolver().bundle_error)
+
+    # Batches of records are fanned out to a thread pool, and only the records
+    # which fail or run out of time are retried
+    if is_batch_event(event):
+        batch = batch_processor.process(event, context)
+        print("Batch stats:", batch.stats())
+        for failure in batch.failures:
+            print("Record", failure.item_identifier, failure.status, failure.error or "")
+        result = batch.response()
+    else:
+        result = check_libraries(event)
+        result['library_stats'] = registry.stats()
+
+    print("Library stats:", registry.stats())
+    if os.environ.get("LAMBDA_PACKAGES_RECORD_PREFETCH") == "1":
+        profile = get_resolver().record_prefetch_profile()
+        if profile is not None:
+            print("Recorded prefetch profile:", profile)
+    if get_resolver().cache is not None:
+        print("Library cache stats:", get_resolver().cache.stats.as_dict())
+
+    return result
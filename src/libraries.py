@@ -0,0 +1,91 @@
+"""
+Declarations of the Homebrew libraries used by the Lambda.  Importing this
+module does not touch EFS; each library is loaded on first use.
+"""
+
+import ctypes
+
+from library_registry import registry
+
+
+class PJ_COORD(ctypes.Structure):
+    """
+    PROJ's coordinate union, passed by value to `proj_trans`.
+    """
+    _fields_ = [("v", ctypes.c_double * 4)]
+
+
+PJ_FWD = 1
+PJ_IDENT = 0
+PJ_INV = -1
+
+# const char *(*)(PJ_CONTEXT *, const char *name, void *user_data).  The result
+# is declared as a pointer rather than c_char_p, so that the callback can return
+# the address of a buffer which outlives the call.
+PROJ_FILE_FINDER = ctypes.CFUNCTYPE(ctypes.c_void_p, ctypes.c_void_p, ctypes.c_char_p, ctypes.c_void_p)
+
+_double_array = (ctypes.c_void_p, ctypes.c_size_t, ctypes.c_size_t)
+
+proj = registry.declare("proj", {
+    "proj_area_create": (ctypes.c_void_p, []),
+    "proj_context_create": (ctypes.c_void_p, []),
+    "proj_context_destroy": (None, [ctypes.c_void_p]),
+    "proj_context_errno": (ctypes.c_int, [ctypes.c_void_p]),
+    "proj_context_set_file_finder": (None, [ctypes.c_void_p, PROJ_FILE_FINDER, ctypes.c_void_p]),
+    "proj_context_set_search_paths": (None, [ctypes.c_void_p, ctypes.c_int, ctypes.POINTER(ctypes.c_char_p)]),
+    "proj_create": (ctypes.c_void_p, [ctypes.c_void_p, ctypes.c_char_p]),
+    "proj_create_crs_to_crs": (ctypes.c_void_p, [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_void_p]),
+    "proj_create_crs_to_crs_from_pj": (ctypes.c_void_p, [ctypes.c_void_p] * 4 + [ctypes.POINTER(ctypes.c_char_p)]),
+    "proj_normalize_for_visualization": (ctypes.c_void_p, [ctypes.c_void_p, ctypes.c_void_p]),
+    "proj_destroy": (ctypes.c_void_p, [ctypes.c_void_p]),
+    "proj_trans": (PJ_COORD, [ctypes.c_void_p, ctypes.c_int, PJ_COORD]),
+    "proj_trans_generic": (ctypes.c_size_t, [ctypes.c_void_p, ctypes.c_int] + list(_double_array * 4)),
+})
+
+EXIF_IFD_COUNT = 5
+
+
+class ExifEntry(ctypes.Structure):
+    """
+    The public part of libexif's `ExifEntry`: a tag and its raw value.
+    """
+    _fields_ = [
+        ("tag", ctypes.c_int),
+        ("format", ctypes.c_int),
+        ("components", ctypes.c_ulong),
+        ("data", ctypes.c_void_p),
+        ("size", ctypes.c_uint),
+        ("parent", ctypes.c_void_p),
+        ("priv", ctypes.c_void_p),
+    ]
+
+
+class ExifContent(ctypes.Structure):
+    """
+    The entries of one IFD (image file directory).
+    """
+    _fields_ = [
+        ("entries", ctypes.POINTER(ctypes.POINTER(ExifEntry))),
+        ("count", ctypes.c_uint),
+        ("parent", ctypes.c_void_p),
+        ("priv", ctypes.c_void_p),
+    ]
+
+
+class ExifData(ctypes.Structure):
+    _fields_ = [
+        ("ifd", ctypes.POINTER(ExifContent) * EXIF_IFD_COUNT),
+        ("data", ctypes.c_void_p),
+        ("size", ctypes.c_uint),
+        ("priv", ctypes.c_void_p),
+    ]
+
+
+exif = registry.declare("exif", {
+    "exif_content_new": (ctypes.c_void_p, []),
+    "exif_data_new_from_data": (ctypes.POINTER(ExifData), [ctypes.c_void_p, ctypes.c_uint]),
+    "exif_data_new_from_file": (ctypes.POINTER(ExifData), [ctypes.c_char_p]),
+    "exif_data_unref": (None, [ctypes.POINTER(ExifData)]),
+    "exif_entry_get_value": (ctypes.c_void_p, [ctypes.POINTER(ExifEntry), ctypes.c_char_p, ctypes.c_uint]),
+    "exif_tag_get_name_in_ifd": (ctypes.c_char_p, [ctypes.c_int, ctypes.c_int]),
+})
@@ -0,0 +1,139 @@
+"""
+A size-bounded, read-through cache of `lambda_packages` files on local disk.
+
+The first time a shared object or data file is requested it is copied from
+EFS to `/tmp`, hashing it on the way and checking the hash against the
+install manifest.  Later requests, including those of every warm invocation,
+are served from local disk.  When the cached files exceed the byte budget,
+the least recently used ones are deleted.
+"""
+
+import hashlib
+import os
+import threading
+
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+DEFAULT_CACHE_ROOT = "/tmp/lambda_packages_cache"
+
+
+class CacheIntegrityError(OSError):
+    """
+    Raised when a file copied from EFS does not match the manifest hash.
+    """
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_copied = 0
+        self.bytes_evicted = 0
+
+    def as_dict(self) -> Dict:
+        return dict(vars(self))
+
+
+class LibraryCache:
+    """
+    Caches files from `source_root` under `cache_root`, keeping at most
+    `max_bytes` of them.  `files` maps relative paths to their expected
+    `sha256` and `size`, as in the install manifest; files which are not
+    listed are copied without being checked.
+    """
+
+    def __init__(self, source_root: str, cache_root: str = DEFAULT_CACHE_ROOT, max_bytes: int = 256 * 1024 * 1024,
+                 files: Dict[str, Dict] = None):
+        self.source_root = source_root
+        self.cache_root = cache_root
+        self.max_bytes = max_bytes
+        self.files = files or {}
+        self.stats = CacheStats()
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    @property
+    def cached_bytes(self) -> int:
+        return sum(self._entries.values())
+
+    def _key_lock(self, relative_path: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(relative_path, threading.Lock())
+
+    def path(self, relative_path: str) -> str:
+        """
+        Returns the local path of the file, copying it from `source_root` if it
+        is not already cached.
+        """
+        with self._lock:
+            if relative_path in self._entries:
+                self._entries.move_to_end(relative_path)
+                self.stats.hits += 1
+                return os.path.join(self.cache_root, relative_path)
+
+        # Only one thread copies a given file; others wait for it and then
+        # count as hits.
+        with self._key_lock(relative_path):
+            with self._lock:
+                if relative_path in self._entries:
+                    self._entries.move_to_end(relative_path)
+                    self.stats.hits += 1
+                    return os.path.join(self.cache_root, relative_path)
+
+            size = self._copy(relative_path)
+
+            with self._lock:
+                self.stats.misses += 1
+                self.stats.bytes_copied += size
+                self._entries[relative_path] = size
+                self._evict(keep=relative_path)
+
+        return os.path.join(self.cache_root, relative_path)
+
+    def _copy(self, relative_path: str) -> int:
+        source_path = os.path.join(self.source_root, relative_path)
+        cache_path = os.path.join(self.cache_root, relative_path)
+        temp_path = f"{cache_path}.tmp-{threading.get_ident()}"
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+        h = hashlib.sha256()
+        size = 0
+        with open(source_path, "rb") as source, open(temp_path, "wb") as target:
+            for chunk in iter(lambda: source.read(1024 * 1024), b""):
+                h.update(chunk)
+                target.write(chunk)
+                size += len(chunk)
+
+        expected = self.files.get(relative_path)
+        if expected is not None and (expected["sha256"] != h.hexdigest() or expected["size"] != size):
+            os.remove(temp_path)
+            raise CacheIntegrityError(f"{source_path} does not match its manifest hash")
+
+        os.chmod(temp_path, os.stat(source_path).st_mode & 0o7777)
+        os.replace(temp_path, cache_path)
+        return size
+
+    def _evict(self, keep: Optional[str] = None):
+        """
+        Deletes least recently used files until the cache fits its budget.  The
+        file just added is never evicted, even if it alone exceeds the budget.
+        """
+        total = self.cached_bytes
+        for relative_path in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if relative_path == keep:
+                continue
+            size = self._entries.pop(relative_path)
+            try:
+                os.remove(os.path.join(self.cache_root, relative_path))
+            except OSError:
+                pass
+            total -= size
+            self.stats.evictions += 1
+            self.stats.bytes_evicted += size
@@ -0,0 +1,131 @@
+"""
+A per-container registry of the shared libraries used by the Lambda.
+
+Libraries are declared once, at import time, along with the prototypes of
+the functions the Lambda calls.  Nothing is loaded from EFS until a function
+is first looked up, and both the `CDLL` handle and the prototyped function
+objects are then kept for the lifetime of the container, so warm invocations
+skip resolution, loading and `argtypes`/`restype` setup entirely.
+"""
+
+import ctypes
+import threading
+import time
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+from library_resolver import LibraryResolver, get_resolver
+
+
+Prototype = Tuple[Any, Sequence[Any]]
+
+
+class LibraryStats:
+    """
+    Counters for a single library.  A miss is a function lookup which had to
+    load the library and/or bind the prototype; a hit reused a cached one.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self.load_time_ms = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def as_dict(self) -> Dict:
+        return {
+            "loaded": self.loaded,
+            "load_time_ms": round(self.load_time_ms, 3),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class Library:
+    """
+    A lazily-loaded library.  Attribute access returns the named function with
+    its declared prototype applied, e.g. `proj.proj_area_create()`.
+    """
+
+    def __init__(self, name: str, prototypes: Dict[str, Prototype], resolver: LibraryResolver = None):
+        self._name = name
+        self._prototypes = dict(prototypes)
+        self._resolver = resolver
+        self._handle = None
+        self._functions = {}
+        self._lock = threading.Lock()
+        self.stats = LibraryStats()
+
+    @property
+    def handle(self) -> ctypes.CDLL:
+        """
+        The underlying `CDLL`, loaded on first use.
+        """
+        if self._handle is None:
+            with self._lock:
+                if self._handle is None:
+                    start = time.perf_counter()
+                    self._handle = (self._resolver or get_resolver()).load(self._name)
+                    self.stats.load_time_ms = (time.perf_counter() - start) * 1000
+                    self.stats.loaded = True
+        return self._handle
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._handle is not None
+
+    def function(self, function_name: str):
+        function = self._functions.get(function_name)
+        if function is not None:
+            self.stats.hits += 1
+            return function
+
+        self.stats.misses += 1
+        function = getattr(self.handle, function_name)
+        if function_name in self._prototypes:
+            restype, argtypes = self._prototypes[function_name]
+            function.restype = restype
+            function.argtypes = list(argtypes)
+
+        self._functions[function_name] = function
+        return function
+
+    def __getattr__(self, function_name: str):
+        if function_name.startswith("_"):
+            raise AttributeError(function_name)
+        return self.function(function_name)
+
+
+class LibraryRegistry:
+    """
+    The set of libraries declared by the Lambda, keyed by name.
+    """
+
+    def __init__(self, resolver: LibraryResolver = None):
+        self._resolver = resolver
+        self._libraries = {}
+
+    def declare(self, name: str, prototypes: Dict[str, Prototype] = None) -> Library:
+        """
+        Declares a library and the prototypes of the functions called on it.
+        Declaring the same library twice merges the prototypes.
+        """
+        library = self._libraries.get(name)
+        if library is None:
+            library = Library(name, prototypes or {}, self._resolver)
+            self._libraries[name] = library
+        elif prototypes:
+            library._prototypes.update(prototypes)
+        return library
+
+    def __getitem__(self, name: str) -> Library:
+        return self._libraries[name]
+
+    def loaded(self) -> List[str]:
+        return [name for name, library in self._libraries.items() if library.is_loaded]
+
+    def stats(self) -> Dict[str, Dict]:
+        return {name: library.stats.as_dict() for name, library in self._libraries.items()}
+
+
+registry = LibraryRegistry()
@@ -0,0 +1,431 @@
+"""
+Locates shared libraries in the EFS `lambda_packages` directory without
+spawning any subprocesses.
+
+`ctypes.util.find_library` runs `ldconfig`, `gcc` and `objdump` on Linux, and
+each of those forks then scans directories over EFS.  Instead, the resolver
+reads the manifest written at install time by `build_tools.manifest` and loads
+libraries by absolute path.  If the manifest is missing, or an entry no longer
+matches the file on disk, it falls back to an in-process scan of the library
+directories which reads the soname straight out of each candidate ELF file.
+
+If `lambda_packages` contains generations (see `build_tools.generations`), the
+`current` link is resolved once when the resolver is created, so a container
+keeps using the same generation even if a newer one is activated meanwhile.
+If that generation was packed as a single bundle, it is unpacked to `/tmp`
+(see `bundle_loader`) and libraries are loaded from the local copy instead.
+Otherwise, if `LAMBDA_PACKAGES_CACHE_MB` is set, libraries are copied to a
+size-bounded cache in `/tmp` on first use (see `library_cache`), and failing
+that the files in the generation's prefetch profile are read concurrently
+before anything is loaded (see `prefetch`).
+
+Libraries packed into the hot-tier Lambda layer by `build_tools.layer` are
+loaded from `/opt/lib` instead, provided the layer's index records the same
+hash for them as the manifest does.
+"""
+
+import ctypes
+import json
+import os
+import re
+import struct
+import time
+import zlib
+
+from typing import Dict, List, Optional
+
+import bundle_loader
+import prefetch
+
+from library_cache import LibraryCache
+
+
+MANIFEST_NAME = "library_manifest.json"
+MANIFEST_VERSION = 1
+CURRENT_LINK = "current"
+LAST_USED_NAME = ".last_used"
+LAST_USED_INTERVAL = 3600
+LAYER_INDEX_NAME = "lambda_layer.json"
+
+
+def default_packages_path() -> str:
+    return os.path.join(os.environ.get("LAMBDA_PACKAGES_PATH", "/mnt/efs"), "lambda_packages")
+
+
+def default_layer_path() -> str:
+    return os.environ.get("LAMBDA_LAYER_PATH", "/opt")
+
+
+def resolve_generation(packages_path: str) -> str:
+    """
+    Returns the directory of the current generation, or `packages_path` itself
+    for an in-place install.
+    """
+    current = os.path.join(packages_path, CURRENT_LINK)
+    if os.path.islink(current):
+        return os.path.realpath(current)
+    return packages_path
+
+
+def read_soname(path: str) -> Optional[str]:
+    """
+    Returns the `DT_SONAME` of an ELF shared object, or `None` if the file is
+    not one or has no soname.  Only the headers and dynamic section are read.
+    """
+    try:
+        with open(path, "rb") as f:
+            ident = f.read(64)
+            if len(ident) < 64 or ident[:4] != b"\x7fELF":
+                return None
+
+            endian = "<" if ident[5] == 1 else ">"
+            if ident[4] == 2:
+                phoff, = struct.unpack_from(endian + "Q", ident, 32)
+                phentsize, phnum = struct.unpack_from(endian + "HH", ident, 54)
+                phdr_format, dyn_format = endian + "IIQQQQQQ", endian + "qQ"
+            else:
+                phoff, = struct.unpack_from(endian + "I", ident, 28)
+                phentsize, phnum = struct.unpack_from(endian + "HH", ident, 42)
+                phdr_format, dyn_format = endian + "IIIIIIII", endian + "iI"
+
+            f.seek(phoff)
+            table = f.read(phentsize * phnum)
+            loads, dynamic = [], None
+            for i in range(phnum):
+                fields = struct.unpack_from(phdr_format, table, i * phentsize)
+                if ident[4] == 2:
+                    p_type, _, p_offset, p_vaddr, _, p_filesz = fields[:6]
+                else:
+                    p_type, p_offset, p_vaddr, _, p_filesz = fields[:5]
+                if p_type == 1:
+                    loads.append((p_vaddr, p_offset, p_filesz))
+                elif p_type == 2:
+                    dynamic = (p_offset, p_filesz)
+
+            if dynamic is None:
+                return None
+
+            f.seek(dynamic[0])
+            data = f.read(dynamic[1])
+            entries = dict(
+                (tag, value) for tag, value in struct.iter_unpack(dyn_format, data[:len(data) - len(data) % struct.calcsize(dyn_format)])
+                if tag in (5, 14)
+            )
+            if 5 not in entries or 14 not in entries:
+                return None
+
+            for vaddr, offset, filesz in loads:
+                if vaddr <= entries[5] < vaddr + filesz:
+                    f.seek(entries[5] - vaddr + offset + entries[14])
+                    return f.read(256).split(b"\0", 1)[0].decode("utf-8", "replace")
+    except (OSError, struct.error):
+        pass
+
+    return None
+
+
+def _version_key(filename: str):
+    return [int(part) for part in re.findall(r"\d+", filename.split(".so", 1)[-1])]
+
+
+class LibraryResolver:
+    """
+    Resolves library names such as `proj` or `libproj.so.22` to absolute paths
+    and loads them with `ctypes`.  The manifest and any directory listings are
+    read once and cached for the lifetime of the container.
+    """
+
+    def __init__(self, packages_path: str = None, search_paths: List[str] = None, layer_path: str = None):
+        self.base_path = packages_path or default_packages_path()
+        self.layer_path = layer_path or default_layer_path()
+        self.packages_path = resolve_generation(self.base_path)
+        self.generation_path = self.packages_path if self.packages_path != self.base_path else None
+        self.data_files_used = set()
+        self._last_marked = None
+        self._profile_recorded = False
+        self._custom_search_paths = search_paths
+        self._loaded = {}
+        self.cache = None
+        self.bundle_error = None
+        self._reset()
+
+    def _reset(self):
+        search_paths = self._custom_search_paths
+        if search_paths is None:
+            search_paths = [os.path.join(self.packages_path, "lib")]
+            search_paths += [p for p in os.environ.get("LD_LIBRARY_PATH", "").split(":") if p]
+        self.search_paths = list(dict.fromkeys(search_paths))
+        self._manifest = None
+        self._layer_index = None
+        self._listings = {}
+
+    def use_cache(self, max_bytes: int, cache_root: str = None):
+        """
+        Serves libraries and data files through a local read-through cache,
+        checked against the manifest's file hashes.
+        """
+        kwargs = {"cache_root": cache_root} if cache_root else {}
+        self.cache = LibraryCache(self.packages_path, max_bytes=max_bytes, files=self.manifest.get("files", {}), **kwargs)
+
+    def data_path(self, relative_path: str) -> str:
+        """
+        Returns the path from which to read a file in `lambda_packages`, e.g.
+        `share/proj/proj.db`, going through the cache if there is one.
+        """
+        self.data_files_used.add(os.path.join(self.packages_path, relative_path))
+        if self.cache is not None:
+            try:
+                return self.cache.path(relative_path)
+            except OSError:
+                pass
+        return os.path.join(self.packages_path, relative_path)
+
+    @property
+    def prefetch_profile_path(self) -> str:
+        return os.path.join(self.generation_path or self.packages_path, prefetch.PROFILE_NAME)
+
+    def prefetch(self) -> Dict:
+        """
+        Reads the files in the prefetch profile into the page cache.
+        """
+        return prefetch.prefetch(self.base_path, self.prefetch_profile_path)
+
+    def record_prefetch_profile(self) -> Optional[Dict]:
+        """
+        Records the `lambda_packages` files this process has mapped or opened
+        as the prefetch profile for its generation.  Only the first call in a
+        container records anything, and returns the profile.
+        """
+        if self._profile_recorded:
+            return None
+        self._profile_recorded = True
+        return prefetch.record_profile(self.base_path, self.prefetch_profile_path, self.data_files_used)
+
+    def use_local_copy(self, local_path: str):
+        """
+        Resolves libraries from a local copy of the generation from now on.
+        Usage is still recorded against the generation on EFS.
+        """
+        self.packages_path = local_path
+        self._reset()
+
+    def mark_in_use(self, now: float = None):
+        """
+        Records that this container is using its generation, at most once per
+        `LAST_USED_INTERVAL`, so that it is not garbage collected from under
+        it.  Failures are ignored, e.g. on a read-only mount.
+        """
+        if self.generation_path is None:
+            return
+
+        now = time.time() if now is None else now
+        if self._last_marked is not None and now - self._last_marked < LAST_USED_INTERVAL:
+            return
+        self._last_marked = now
+
+        try:
+            with open(os.path.join(self.generation_path, LAST_USED_NAME), "a"):
+                pass
+            os.utime(os.path.join(self.generation_path, LAST_USED_NAME))
+        except OSError:
+            pass
+
+    @property
+    def manifest(self) -> Dict:
+        if self._manifest is None:
+            try:
+                with open(os.path.join(self.packages_path, MANIFEST_NAME)) as f:
+                    manifest = json.load(f)
+                if manifest.get("version") != MANIFEST_VERSION:
+                    manifest = {}
+            except (OSError, ValueError):
+                manifest = {}
+            self._manifest = manifest
+        return self._manifest
+
+    @property
+    def layer_index(self) -> Dict:
+        if self._layer_index is None:
+            try:
+                with open(os.path.join(self.layer_path, LAYER_INDEX_NAME)) as f:
+                    self._layer_index = json.load(f).get("libraries", {})
+            except (OSError, ValueError, AttributeError):
+                self._layer_index = {}
+        return self._layer_index
+
+    def _layer_path_for(self, soname: str, entry: Dict) -> Optional[str]:
+        """
+        Returns the path of the layer's copy of a library, if the layer was
+        built from a generation with the same file.
+        """
+        layer_entry = self.layer_index.get(soname)
+        if layer_entry is None:
+            return None
+        recorded = self.manifest.get("files", {}).get(entry["path"], {})
+        if layer_entry.get("sha256") is None or layer_entry["sha256"] != recorded.get("sha256"):
+            return None
+        return os.path.join(self.layer_path, "lib", soname)
+
+    def _soname_for(self, name: str) -> Optional[str]:
+        libraries = self.manifest.get("libraries", {})
+        aliases = self.manifest.get("aliases", {})
+        for candidate in (name, f"lib{name}.so"):
+            if candidate in libraries:
+                return candidate
+            if candidate in aliases:
+                return aliases[candidate]
+        return None
+
+    def _manifest_path(self, soname: str) -> Optional[str]:
+        """
+        Returns the absolute path the manifest gives for a soname, provided the
+        file on disk still matches what was recorded at install time.
+        """
+        entry = self.manifest.get("libraries", {}).get(soname)
+        if entry is None:
+            return None
+
+        layer_path = self._layer_path_for(soname, entry)
+        if layer_path is not None:
+            return layer_path
+
+        # Cached copies are checked against the manifest hash when copied, so
+        # they need no further checks
+        if self.cache is not None:
+            try:
+                return self.cache.path(entry["path"])
+            except OSError:
+                pass
+
+        path = os.path.join(self.packages_path, entry["path"])
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        if stat.st_size != entry["size"] or int(stat.st_mtime) != entry["mtime"]:
+            return None
+        return path
+
+    def _listing(self, directory: str) -> List[str]:
+        if directory not in self._listings:
+            try:
+                self._listings[directory] = sorted(os.listdir(directory))
+            except OSError:
+                self._listings[directory] = []
+        return self._listings[directory]
+
+    def _scan(self, name: str) -> Optional[str]:
+        """
+        Searches the library directories in order, as the dynamic linker
+        would, for a shared object matching `name`.
+        """
+        if "/" in name:
+            return name if os.path.exists(name) else None
+
+        if ".so" in name:
+            pattern = re.compile(re.escape(name) + r"$")
+        else:
+            pattern = re.compile(r"lib" + re.escape(name) + r"\.so(\.[\d.]+)?$")
+
+        for directory in self.search_paths:
+            matches = [f for f in self._listing(directory) if pattern.match(f)]
+            # Prefer the soname-bearing file with the highest version, as
+            # find_library does.
+            for filename in sorted(matches, key=_version_key, reverse=True):
+                path = os.path.join(directory, filename)
+                if read_soname(path) is not None or filename == name:
+                    return path
+        return None
+
+    def find_library(self, name: str) -> Optional[str]:
+        """
+        Returns the absolute path of the library, or `None` if it cannot be
+        found.  Unlike `ctypes.util.find_library`, this never forks.
+        """
+        soname = self._soname_for(name)
+        if soname is not None:
+            path = self._manifest_path(soname)
+            if path is not None:
+                return path
+            return self._scan(soname)
+        return self._scan(name)
+
+    def load(self, name: str, mode: int = ctypes.RTLD_GLOBAL) -> ctypes.CDLL:
+        """
+        Loads a library by absolute path.  Dependencies listed in the manifest
+        are loaded first so that the dynamic linker finds them already mapped
+        (by soname) instead of probing every directory in `LD_LIBRARY_PATH`.
+        """
+        soname = self._soname_for(name) or name
+        if soname in self._loaded:
+            return self._loaded[soname]
+
+        for dependency in self._dependency_order(soname):
+            if dependency not in self._loaded:
+                path = self._manifest_path(dependency)
+                if path is not None:
+                    self._loaded[dependency] = ctypes.CDLL(path, mode=mode)
+
+        path = self.find_library(name)
+        if path is None:
+            raise OSError(f"Could not find library {name}")
+
+        library = ctypes.CDLL(path, mode=mode)
+        self._loaded[soname] = library
+        return library
+
+    def _dependency_order(self, soname: str) -> List[str]:
+        """
+        Returns the manifest dependencies of `soname`, deepest first, excluding
+        `soname` itself and anything not provided by `lambda_packages`.
+        """
+        libraries = self.manifest.get("libraries", {})
+        order, visiting = [], set()
+
+        def visit(current):
+            if current in visiting or current not in libraries:
+                return
+            visiting.add(current)
+            for dependency in libraries[current]["needed"]:
+                visit(dependency)
+            order.append(current)
+
+        visit(soname)
+        return [s for s in order if s != soname]
+
+
+_default_resolver = None
+
+
+def get_resolver() -> LibraryResolver:
+    """
+    Returns a resolver shared across invocations of a warm container.  On
+    first use, a bundled generation is unpacked to local disk unless
+    `LAMBDA_PACKAGES_BUNDLE` is set to `0`, or it cannot be (e.g. `/tmp` is
+    full or the bundle is corrupt); failing that, the cache is enabled
+    if `LAMBDA_PACKAGES_CACHE_MB` is set, and failing that the prefetch profile
+    is read unless `LAMBDA_PACKAGES_PREFETCH` is set to `0`.
+    """
+    global _default_resolver
+    if _default_resolver is None:
+        resolver = LibraryResolver()
+        local_path = None
+        if resolver.generation_path is not None and os.environ.get("LAMBDA_PACKAGES_BUNDLE", "1") != "0":
+            try:
+                local_path = bundle_loader.local_copy(resolver.generation_path)
+            except (OSError, ValueError, KeyError, struct.error, zlib.error) as e:
+                resolver.bundle_error = f"{type(e).__name__}: {e}"
+
+        if local_path is not None:
+            resolver.use_local_copy(local_path)
+        elif os.environ.get("LAMBDA_PACKAGES_CACHE_MB"):
+            resolver.use_cache(int(os.environ["LAMBDA_PACKAGES_CACHE_MB"]) * 1024 * 1024)
+        elif os.environ.get("LAMBDA_PACKAGES_PREFETCH", "1") != "0":
+            resolver.prefetch()
+        _default_resolver = resolver
+    return _default_resolver
+
+
+def find_library(name: str) -> Optional[str]:
+    return get_resolver().find_library(name)
@@ -0,0 +1,129 @@
+"""
+Records which `lambda_packages` files the Lambda maps and opens, and reads
+them back concurrently at startup.
+
+When the handler loads a library, the dynamic linker reads each of its
+dependencies one after another, paying an EFS round-trip for each.  If the
+same files have already been read into the page cache by a pool of threads,
+those round-trips overlap instead of adding up.
+
+The profile lists paths relative to the `lambda_packages` directory and is
+stored in the generation it was recorded against, as `prefetch_profile.json`.
+"""
+
+import json
+import os
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Set
+
+
+PROFILE_NAME = "prefetch_profile.json"
+
+
+def mapped_files(maps_path: str = "/proc/self/maps") -> Set[str]:
+    """
+    Returns the paths of all files mapped into the process.
+    """
+    paths = set()
+    try:
+        with open(maps_path) as f:
+            for line in f:
+                fields = line.split(None, 5)
+                if len(fields) == 6 and fields[5].startswith("/"):
+                    paths.add(fields[5].rstrip("\n").replace(" (deleted)", ""))
+    except OSError:
+        pass
+    return paths
+
+
+def open_files(fd_path: str = "/proc/self/fd") -> Set[str]:
+    """
+    Returns the paths of all files the process currently has open.
+    """
+    paths = set()
+    try:
+        for fd in os.listdir(fd_path):
+            try:
+                target = os.readlink(os.path.join(fd_path, fd))
+            except OSError:
+                continue
+            if target.startswith("/"):
+                paths.add(target)
+    except OSError:
+        pass
+    return paths
+
+
+def build_profile(packages_root: str, paths: Iterable[str]) -> Dict:
+    """
+    Keeps the paths which are inside `packages_root`, in a stable order,
+    along with their sizes.
+    """
+    real_root = os.path.realpath(packages_root)
+    files = []
+    for path in sorted(set(os.path.realpath(p) for p in paths)):
+        if path.startswith(real_root + os.sep) and os.path.isfile(path):
+            files.append({"path": os.path.relpath(path, real_root), "size": os.path.getsize(path)})
+    return {"version": 1, "files": files}
+
+
+def record_profile(packages_root: str, profile_path: str, extra_paths: Iterable[str] = ()) -> Dict:
+    """
+    Writes a profile of the files below `packages_root` which are currently
+    mapped or open, plus `extra_paths` (e.g. data files which were opened and
+    closed again).  The profile is replaced atomically, so containers starting
+    meanwhile read either the old one or the new one.
+    """
+    profile = build_profile(packages_root, mapped_files() | open_files() | set(extra_paths))
+    temp_path = f"{profile_path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(profile, f, indent=1)
+    os.replace(temp_path, profile_path)
+    return profile
+
+
+def load_profile(profile_path: str) -> List[str]:
+    try:
+        with open(profile_path) as f:
+            return [entry["path"] for entry in json.load(f).get("files", [])]
+    except (OSError, ValueError, AttributeError):
+        return []
+
+
+def warm_file(path: str) -> int:
+    """
+    Reads a file so that its pages are in the page cache, asking the kernel to
+    read ahead first where `posix_fadvise` is available.  Returns the number
+    of bytes read.
+    """
+    total = 0
+    try:
+        with open(path, "rb", buffering=0) as f:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+            buffer = bytearray(1024 * 1024)
+            for n in iter(lambda: f.readinto(buffer), 0):
+                total += n
+    except OSError:
+        pass
+    return total
+
+
+def prefetch_files(paths: List[str], workers: int = 16) -> Dict:
+    """
+    Warms the page cache for `paths` from a pool of threads.
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        total = sum(pool.map(lambda path: warm_file(path), paths))
+    return {"files": len(paths), "bytes": total, "ms": round((time.perf_counter() - start) * 1000, 3)}
+
+
+def prefetch(packages_root: str, profile_path: str, workers: int = 16) -> Dict:
+    """
+    Warms every file listed in the profile, if there is one.
+    """
+    paths = [os.path.join(packages_root, p) for p in load_profile(profile_path)]
+    return prefetch_files(paths, workers=workers)
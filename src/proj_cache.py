@@ -0,0 +1,181 @@
+"""
+A bounded, per-container cache of PROJ transformation objects.
+
+Creating a transformation (`proj_create_crs_to_crs` and then
+`proj_normalize_for_visualization`) takes milliseconds and queries `proj.db`,
+while events tend to repeat the same few CRS pairs.  Transformations are kept
+in a least-recently-used cache keyed by source CRS, target CRS and options,
+which survives across warm invocations.
+
+PROJ objects must not be shared between threads, so each thread has its own
+`PJ_CONTEXT` (which finds resource files through `proj_data`) and its own
+cache.  Evicted objects are destroyed immediately, on the thread which owns
+them, and the objects of threads which have exited are destroyed the next time
+any thread creates a transformation.  A `PJ` returned by `get` must therefore
+not be kept across another call to `get`.
+"""
+
+import ctypes
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Dict, Sequence, Tuple
+
+import libraries
+import proj_data
+
+
+class ProjError(Exception):
+    """
+    Raised when PROJ cannot create a transformation.
+    """
+
+
+class TransformationCacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.creation_ms = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hit_rate, 4),
+            "creation_ms": round(self.creation_ms, 3),
+            "mean_creation_ms": round(self.creation_ms / self.misses, 3) if self.misses else 0.0,
+        }
+
+
+class _ThreadCache:
+    def __init__(self, thread: threading.Thread):
+        self.thread = thread
+        self.context = None
+        self.entries = OrderedDict()
+
+
+class TransformationCache:
+    """
+    Holds up to `maxsize` transformations per thread.  With a `maxsize` of 0,
+    every call creates a transformation and destroys the previous one.
+    """
+
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        self.stats = TransformationCacheStats()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._thread_caches = {}
+
+    def _thread_cache(self) -> _ThreadCache:
+        cache = getattr(self._local, "cache", None)
+        if cache is None:
+            data = proj_data.get_proj_data()
+            cache = _ThreadCache(threading.current_thread())
+            cache.context = libraries.proj.proj_context_create()
+            data.configure_context(cache.context)
+            self._local.cache = cache
+            with self._lock:
+                self._thread_caches[id(cache)] = cache
+        return cache
+
+    def _create(self, context: int, source_crs: str, target_crs: str, normalize: bool, options: Sequence[str]) -> int:
+        proj = libraries.proj
+
+        if options:
+            source = proj.proj_create(context, source_crs.encode())
+            target = proj.proj_create(context, target_crs.encode())
+            option_array = (ctypes.c_char_p * (len(options) + 1))(*[o.encode() for o in options], None)
+            pj = proj.proj_create_crs_to_crs_from_pj(context, source, target, None, option_array) if source and target else None
+            for crs in (source, target):
+                if crs:
+                    proj.proj_destroy(crs)
+        else:
+            pj = proj.proj_create_crs_to_crs(context, source_crs.encode(), target_crs.encode(), None)
+
+        if not pj:
+            errno = proj.proj_context_errno(context)
+            raise ProjError(f"Cannot create transformation from {source_crs} to {target_crs} (error {errno})")
+
+        if normalize:
+            normalized = proj.proj_normalize_for_visualization(context, pj)
+            proj.proj_destroy(pj)
+            if not normalized:
+                raise ProjError(f"Cannot normalize transformation from {source_crs} to {target_crs}")
+            pj = normalized
+
+        return pj
+
+    def get(self, source_crs: str, target_crs: str, normalize: bool = True, options: Sequence[str] = ()) -> int:
+        """
+        Returns the calling thread's transformation for the key, creating it
+        (and evicting the least recently used one if the cache is full) if
+        necessary.
+        """
+        cache = self._thread_cache()
+        key: Tuple = (source_crs, target_crs, normalize, tuple(options))
+
+        pj = cache.entries.get(key)
+        if pj is not None:
+            cache.entries.move_to_end(key)
+            with self._lock:
+                self.stats.hits += 1
+            return pj
+
+        self._reap()
+        start = time.perf_counter()
+        pj = self._create(cache.context, source_crs, target_crs, normalize, options)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        cache.entries[key] = pj
+        evicted = 0
+        while len(cache.entries) > max(self.maxsize, 1):
+            _, old_pj = cache.entries.popitem(last=False)
+            libraries.proj.proj_destroy(old_pj)
+            evicted += 1
+
+        with self._lock:
+            self.stats.misses += 1
+            self.stats.evictions += evicted
+            self.stats.creation_ms += elapsed_ms
+        return pj
+
+    def _reap(self):
+        """
+        Destroys the transformations and contexts of threads which have exited.
+        """
+        with self._lock:
+            dead = [key for key, cache in self._thread_caches.items() if not cache.thread.is_alive()]
+            caches = [self._thread_caches.pop(key) for key in dead]
+
+        for cache in caches:
+            self._destroy(cache)
+
+    def _destroy(self, cache: _ThreadCache):
+        for pj in cache.entries.values():
+            libraries.proj.proj_destroy(pj)
+        cache.entries.clear()
+        if cache.context:
+            libraries.proj.proj_context_destroy(cache.context)
+            cache.context = None
+
+    def clear(self):
+        """
+        Destroys the calling thread's transformations.
+        """
+        cache = getattr(self._local, "cache", None)
+        if cache is not None:
+            for pj in cache.entries.values():
+                libraries.proj.proj_destroy(pj)
+            cache.entries.clear()
+
+
+transformation_cache = TransformationCache()
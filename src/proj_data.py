@@ -0,0 +1,159 @@
+"""
+Places PROJ's resource files (`proj.db` and grids) on local disk.
+
+The install stages the proj formula's `share/proj` directory into
+`lambda_packages`.  Read in place over EFS, every SQLite page `proj.db` reads is
+a network round-trip, so before the first PROJ context is created, `proj.db`
+and the other small resource files are copied to `/tmp` in one sequential read
+each.  Grids are large and most transformations never use them, so each is
+only copied when PROJ first asks for it, through the context's file finder, or
+read straight from EFS if it would take `/tmp` over budget.
+
+`LAMBDA_PACKAGES_PROJ_DATA=efs` leaves every file on EFS, for comparison.
+"""
+
+import ctypes
+import os
+import shutil
+import threading
+
+from typing import Dict, Optional
+
+import libraries
+
+from libraries import PROJ_FILE_FINDER
+from library_resolver import get_resolver
+
+
+PROJ_DATA_DIRECTORY = os.path.join("share", "proj")
+DEFAULT_LOCAL_ROOT = "/tmp/proj_data"
+EAGER_NAMES = {"proj.db", "proj.ini"}
+EAGER_MAX_BYTES = 1024 * 1024
+DEFAULT_MAX_LOCAL_BYTES = 256 * 1024 * 1024
+
+
+class ProjData:
+    """
+    Resolves PROJ resource names to paths, copying files from `source_root`
+    to `local_root` as described above.  With `local_root` of `None`, files
+    are used where they are.
+    """
+
+    def __init__(self, source_root: str, local_root: Optional[str] = DEFAULT_LOCAL_ROOT,
+                 max_local_bytes: int = DEFAULT_MAX_LOCAL_BYTES):
+        self.source_root = source_root
+        self.local_root = local_root
+        self.max_local_bytes = max_local_bytes
+        self.local_bytes = 0
+        self.fetched: Dict[str, int] = {}
+
+        self._lock = threading.Lock()
+        self._paths: Dict[str, ctypes.Array] = {}
+        # Kept referenced for as long as any context may call it
+        self._finder = PROJ_FILE_FINDER(self._find)
+
+    def _copy(self, name: str) -> Optional[str]:
+        source = os.path.join(self.source_root, name)
+        local = os.path.join(self.local_root, name)
+        if os.path.isfile(local):
+            return local
+
+        size = os.path.getsize(source)
+        if self.local_bytes + size > self.max_local_bytes:
+            return None
+
+        os.makedirs(os.path.dirname(local), exist_ok=True)
+        temp_path = f"{local}.{os.getpid()}.tmp"
+        shutil.copyfile(source, temp_path)
+        os.replace(temp_path, local)
+        self.local_bytes += size
+        return local
+
+    def path(self, name: str) -> Optional[str]:
+        """
+        Returns the path to open for a resource file, e.g. `proj.db` or
+        `us_noaa_conus.tif`, or `None` if PROJ does not have it.
+        """
+        source = os.path.join(self.source_root, name)
+        if not os.path.isfile(source):
+            return None
+        if self.local_root is None:
+            return source
+
+        with self._lock:
+            try:
+                local = self._copy(name)
+            except OSError:
+                local = None
+            if local is not None:
+                self.fetched.setdefault(name, os.path.getsize(local))
+        return local or source
+
+    def initialize(self):
+        """
+        Copies `proj.db` and the small resource files to local disk and points
+        `PROJ_DATA` there.
+        """
+        data_path = self.source_root
+        if self.local_root is not None and os.path.isdir(self.source_root):
+            for entry in os.scandir(self.source_root):
+                if entry.is_file() and (entry.name in EAGER_NAMES or entry.stat().st_size <= EAGER_MAX_BYTES):
+                    self.path(entry.name)
+            data_path = self.local_root
+
+        # PROJ_LIB is the name of the variable before PROJ 9.1
+        os.environ["PROJ_DATA"] = data_path
+        os.environ["PROJ_LIB"] = data_path
+
+    def _find(self, context, name: bytes, user_data) -> Optional[int]:
+        # PROJ asks for names relative to its search paths; absolute paths and
+        # URLs are opened as they are
+        relative = name.decode()
+        if os.path.isabs(relative) or "://" in relative:
+            return None
+
+        buffer = self._paths.get(relative)
+        if buffer is None:
+            path = self.path(relative)
+            if path is None:
+                return None
+            buffer = ctypes.create_string_buffer(path.encode())
+            self._paths[relative] = buffer
+        return ctypes.addressof(buffer)
+
+    def configure_context(self, context: int):
+        """
+        Sets the file finder and search paths of a PROJ context.  Passing
+        `None` configures PROJ's default context.
+        """
+        roots = [r for r in (self.local_root, self.source_root) if r is not None]
+        paths = (ctypes.c_char_p * len(roots))(*[r.encode() for r in roots])
+        proj = libraries.proj
+        proj.proj_context_set_search_paths(context, len(roots), paths)
+        proj.proj_context_set_file_finder(context, self._finder, None)
+
+
+_proj_data = None
+_proj_data_lock = threading.Lock()
+
+
+def get_proj_data() -> ProjData:
+    """
+    Returns the container's `ProjData`, initializing it on first use from the
+    resolver's generation of `lambda_packages`.  A generation which was
+    unpacked from a bundle is already on local disk and is used in place.
+    """
+    global _proj_data
+    with _proj_data_lock:
+        if _proj_data is None:
+            resolver = get_resolver()
+            source_root = os.path.join(resolver.packages_path, PROJ_DATA_DIRECTORY)
+            unpacked = resolver.packages_path != (resolver.generation_path or resolver.base_path)
+            if unpacked or os.environ.get("LAMBDA_PACKAGES_PROJ_DATA") == "efs":
+                local_root = None
+            else:
+                local_root = DEFAULT_LOCAL_ROOT
+            proj_data = ProjData(source_root, local_root)
+            proj_data.initialize()
+            _proj_data = proj_data
+    return _proj_data
@@ -0,0 +1,172 @@
+"""
+Vectorized coordinate transformations over libproj.
+
+Coordinates are passed to `proj_trans_generic` in place, straight from the
+memory of the caller's arrays: NumPy arrays (including strided views such as
+the columns of an `(n, 2)` array) or any writable buffer of doubles such as
+`array.array("d")`.  Large batches are split into chunks, which can be spread
+over a thread pool: ctypes releases the GIL during the foreign call, and each
+thread gets its own PROJ context and transformation object from
+`proj_cache`, since those must not be shared between threads.
+"""
+
+import ctypes
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, NamedTuple, Optional, Sequence
+
+import libraries
+
+from libraries import PJ_FWD
+from proj_cache import transformation_cache
+
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+DOUBLE_SIZE = ctypes.sizeof(ctypes.c_double)
+
+
+class CoordinateArray(NamedTuple):
+    """
+    The address, byte stride and length of a one-dimensional array of doubles,
+    along with the object which must be kept alive while it is used.
+    """
+    address: int
+    stride: int
+    length: int
+    owner: Any
+
+
+def as_coordinate_array(values) -> CoordinateArray:
+    """
+    Returns a zero-copy view of a writable, one-dimensional array of doubles.
+    """
+    interface = getattr(values, "__array_interface__", None)
+    if interface is not None:
+        if interface["typestr"] != "<f8":
+            raise TypeError(f"Coordinates must be float64, not {interface['typestr']}")
+        if len(interface["shape"]) != 1:
+            raise ValueError("Coordinate arrays must be one-dimensional")
+        address, readonly = interface["data"]
+        if readonly:
+            raise ValueError("Coordinate arrays must be writable")
+        stride = interface["strides"][0] if interface.get("strides") else DOUBLE_SIZE
+        if stride <= 0:
+            raise ValueError("Coordinate arrays must have a positive stride")
+        return CoordinateArray(address, stride, interface["shape"][0], values)
+
+    view = memoryview(values)
+    if view.format != "d" or view.ndim != 1:
+        raise TypeError("Coordinates must be a one-dimensional buffer of doubles")
+    if view.readonly:
+        raise ValueError("Coordinate arrays must be writable")
+    buffer = (ctypes.c_char * view.nbytes).from_buffer(view)
+    return CoordinateArray(ctypes.addressof(buffer), DOUBLE_SIZE, len(view), (view, buffer))
+
+
+def point_columns(points) -> List[CoordinateArray]:
+    """
+    Returns zero-copy views of the columns of an `(n, 2)` or `(n, 3)` NumPy
+    array of doubles.
+    """
+    interface = points.__array_interface__
+    if interface["typestr"] != "<f8" or len(interface["shape"]) != 2 or interface["shape"][1] not in (2, 3):
+        raise ValueError("Points must be an (n, 2) or (n, 3) float64 array")
+    address, readonly = interface["data"]
+    if readonly:
+        raise ValueError("Points must be writable")
+
+    length, width = interface["shape"]
+    row_stride, column_stride = interface.get("strides") or (width * DOUBLE_SIZE, DOUBLE_SIZE)
+    return [CoordinateArray(address + i * column_stride, row_stride, length, points) for i in range(width)]
+
+
+class Transformer:
+    """
+    A transformation between two coordinate reference systems, e.g.
+    `Transformer("EPSG:4326", "EPSG:3857")`.  With `normalize` (the default),
+    coordinates are in longitude/latitude, easting/northing order regardless of
+    the axis order each CRS defines.
+    """
+
+    def __init__(self, source_crs: str, target_crs: str, normalize: bool = True, options: Sequence[str] = ()):
+        self.source_crs = source_crs
+        self.target_crs = target_crs
+        self.normalize = normalize
+        self.options = tuple(options)
+
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_workers = 0
+
+    def thread_pj(self) -> int:
+        """
+        Returns the calling thread's transformation object, which is shared
+        with any other `Transformer` for the same CRS pair and options.
+        """
+        return transformation_cache.get(self.source_crs, self.target_crs, self.normalize, self.options)
+
+    def _executor(self, workers: int) -> ThreadPoolExecutor:
+        # The pool is kept so that its threads, and their transformation
+        # objects, are reused by later calls
+        with self._lock:
+            if self._pool is None or self._pool_workers != workers:
+                if self._pool is not None:
+                    self._pool.shutdown()
+                self._pool = ThreadPoolExecutor(max_workers=workers)
+                self._pool_workers = workers
+            return self._pool
+
+    def _transform_arrays(self, arrays: List[Optional[CoordinateArray]], direction: int, chunk_size: int,
+                          workers: int) -> int:
+        present = [a for a in arrays if a is not None]
+        length = present[0].length
+        if any(a.length != length for a in present):
+            raise ValueError("Coordinate arrays must all have the same length")
+
+        def run(start: int) -> int:
+            count = min(chunk_size, length - start)
+            args = []
+            for array in arrays + [None] * (4 - len(arrays)):
+                if array is None:
+                    args += [None, 0, 0]
+                else:
+                    args += [array.address + start * array.stride, array.stride, count]
+            return libraries.proj.proj_trans_generic(self.thread_pj(), direction, *args)
+
+        starts = range(0, length, chunk_size)
+        if workers <= 1 or len(starts) <= 1:
+            return sum(run(start) for start in starts)
+        return sum(self._executor(workers).map(run, starts))
+
+    def transform(self, x, y, z=None, direction: int = PJ_FWD, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                  workers: int = 1) -> int:
+        """
+        Transforms the coordinates in place and returns the number of points
+        transformed.  Points which cannot be transformed are set to infinity.
+        """
+        arrays = [as_coordinate_array(x), as_coordinate_array(y), None if z is None else as_coordinate_array(z)]
+        return self._transform_arrays(arrays, direction, chunk_size, workers)
+
+    def transform_points(self, points, direction: int = PJ_FWD, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                         workers: int = 1) -> int:
+        """
+        Transforms an `(n, 2)` or `(n, 3)` NumPy array in place.
+        """
+        return self._transform_arrays(point_columns(points), direction, chunk_size, workers)
+
+    def close(self):
+        """
+        Shuts down the thread pool.  The transformation objects belong to
+        `transformation_cache`, which destroys them when they are evicted.
+        """
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
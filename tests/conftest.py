@@ -0,0 +1,154 @@
+import ctypes
+import io
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def compile_library():
+    """
+    Returns a function which compiles a small shared library into a
+    directory, with the given soname, `DT_NEEDED` entries (sonames in the same
+    directory, or paths) and C source.  The run path is set as `DT_RUNPATH`,
+    or as `DT_RPATH` if `new_dtags` is false.  Tests using it are skipped
+    without `cc`.
+    """
+    if shutil.which("cc") is None:
+        pytest.skip("needs a C compiler")
+
+    def compile_library(directory, soname, dependencies=(), source="int answer(void) { return 42; }",
+                        runpath="$ORIGIN", new_dtags=True):
+        os.makedirs(directory, exist_ok=True)
+        source_path = os.path.join(directory, soname + ".c")
+        with open(source_path, "w") as f:
+            f.write(source)
+        path = os.path.join(directory, soname)
+        command = ["cc", "-shared", "-fPIC", "-o", path, source_path, f"-Wl,-soname,{soname}", "-Wl,--no-as-needed",
+                   f"-L{directory}"]
+        command += [d if os.path.isabs(d) else f"-l:{d}" for d in dependencies]
+        if runpath is not None:
+            command.append(f"-Wl,--{'enable' if new_dtags else 'disable'}-new-dtags,-rpath,{runpath}")
+        subprocess.run(command, check=True)
+        os.remove(source_path)
+        return path
+
+    return compile_library
+
+
+@pytest.fixture
+def make_bottle():
+    """
+    Returns a function which writes a Homebrew bottle tarball for a formula,
+    with the given files (keg-relative paths to bytes, or paths of files to
+    copy), symlinks and runtime dependencies recorded in its receipt.
+    """
+
+    def make_bottle(bottles_dir, name, version, files, dependencies=(), symlinks=None):
+        os.makedirs(bottles_dir, exist_ok=True)
+        path = os.path.join(bottles_dir, f"{name}--{version}.x86_64_linux.bottle.tar.gz")
+        receipt = {"runtime_dependencies": [{"full_name": d} for d in dependencies]}
+        with tarfile.open(path, "w:gz") as tar:
+            entries = dict(files, **{"INSTALL_RECEIPT.json": json.dumps(receipt).encode()})
+            for relative_path, content in entries.items():
+                if isinstance(content, str):
+                    with open(content, "rb") as f:
+                        content = f.read()
+                info = tarfile.TarInfo(f"{name}/{version}/{relative_path}")
+                info.size = len(content)
+                info.mode = 0o755 if relative_path.startswith(("bin/", "lib/")) else 0o644
+                tar.addfile(info, io.BytesIO(content))
+            for relative_path, target in (symlinks or {}).items():
+                info = tarfile.TarInfo(f"{name}/{version}/{relative_path}")
+                info.type = tarfile.SYMTYPE
+                info.linkname = target
+                tar.addfile(info)
+        return path
+
+    return make_bottle
+
+
+class FakeProj:
+    """
+    Stands in for libproj, handing out integers as `PJ` and `PJ_CONTEXT`
+    pointers and recording which are still alive.  `proj_trans_generic`
+    doubles x and adds one to y (the inverse undoes this), reading and writing
+    the caller's memory with the given strides as libproj does.
+    """
+
+    def __init__(self):
+        self.pointers = itertools.count(1)
+        self.alive = set()
+        self.contexts = set()
+        self.created = []
+        self.calls = []
+
+    def _new(self):
+        pointer = next(self.pointers)
+        self.alive.add(pointer)
+        return pointer
+
+    def proj_context_create(self):
+        context = next(self.pointers)
+        self.contexts.add(context)
+        return context
+
+    def proj_context_destroy(self, context):
+        self.contexts.remove(context)
+
+    def proj_context_errno(self, context):
+        return 1027
+
+    def proj_create_crs_to_crs(self, context, source_crs, target_crs, area):
+        self.created.append((source_crs, target_crs))
+        return None if target_crs == b"EPSG:0" else self._new()
+
+    def proj_normalize_for_visualization(self, context, pj):
+        return self._new()
+
+    def proj_destroy(self, pj):
+        self.alive.remove(pj)
+
+    def proj_trans_generic(self, pj, direction, x, sx, nx, y, sy, ny, z, sz, nz, t, st, nt):
+        self.calls.append((nx, ny, nz))
+        for i in range(nx):
+            value = ctypes.c_double.from_address(x + i * sx)
+            value.value = value.value * 2 if direction > 0 else value.value / 2
+        for i in range(ny):
+            value = ctypes.c_double.from_address(y + i * sy)
+            value.value += direction
+        return max(nx, ny, nz)
+
+
+class FakeProjData:
+    def configure_context(self, context):
+        pass
+
+
+@pytest.fixture
+def proj(monkeypatch):
+    """
+    Replaces libproj and its data files with fakes, and gives
+    `proj_transform` a fresh transformation cache.  Returns the fake libproj.
+    """
+    import libraries
+    import proj_data
+    import proj_transform
+    from proj_cache import TransformationCache
+
+    fake = FakeProj()
+    monkeypatch.setattr(libraries, "proj", fake)
+    monkeypatch.setattr(proj_data, "get_proj_data", lambda: FakeProjData())
+    monkeypatch.setattr(proj_transform, "transformation_cache", TransformationCache())
+    return fake
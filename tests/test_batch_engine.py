@@ -0,0 +1,116 @@
+import threading
+import time
+
+from batch_engine import FAILED, SKIPPED, SUCCEEDED, TIMED_OUT, BatchProcessor, is_batch_event
+
+
+class FakeContext:
+    def __init__(self, remaining_ms):
+        self.deadline = time.monotonic() + remaining_ms / 1000
+
+    def get_remaining_time_in_millis(self):
+        return int((self.deadline - time.monotonic()) * 1000)
+
+
+def sqs_event(bodies, group=None):
+    records = []
+    for i, body in enumerate(bodies):
+        record = {"messageId": f"m{i}", "eventSource": "aws:sqs", "body": body, "attributes": {}}
+        if group is not None:
+            record["attributes"]["MessageGroupId"] = group
+        records.append(record)
+    return {"Records": records}
+
+
+def failures(batch):
+    return [f["itemIdentifier"] for f in batch.response()["batchItemFailures"]]
+
+
+def process_body(record):
+    if record["body"] == "fail":
+        raise ValueError("bad record")
+    if record["body"].startswith("sleep"):
+        time.sleep(float(record["body"][5:]))
+    return record["body"]
+
+
+def test_only_failed_records_are_reported():
+    processor = BatchProcessor(process_body, workers=4)
+    batch = processor.process(sqs_event(["a", "fail", "b", "fail"]))
+
+    assert failures(batch) == ["m1", "m3"]
+    assert [r.status for r in batch.results] == [SUCCEEDED, FAILED, SUCCEEDED, FAILED]
+    assert "bad record" in batch.results[1].error
+    processor.close()
+
+
+def test_records_still_running_at_the_deadline_time_out():
+    processor = BatchProcessor(process_body, workers=2, reserve_ms=0)
+    batch = processor.process(sqs_event(["a", "sleep0.5", "sleep0.5", "b"]), FakeContext(150))
+
+    statuses = [r.status for r in batch.results]
+    assert statuses[0] == SUCCEEDED
+    assert TIMED_OUT in statuses
+    assert failures(batch) == [r.item_identifier for r in batch.results if r.status != SUCCEEDED]
+    assert batch.elapsed_ms < 450
+    processor.close()
+
+
+def test_no_records_start_without_time_left():
+    processor = BatchProcessor(process_body, workers=2, reserve_ms=1000)
+    batch = processor.process(sqs_event(["a", "b"]), FakeContext(500))
+
+    assert [r.status for r in batch.results] == [SKIPPED, SKIPPED]
+    assert failures(batch) == ["m0", "m1"]
+    processor.close()
+
+
+def test_fifo_records_run_in_order_and_stop_at_the_first_failure():
+    seen = []
+    running = []
+    overlapped = threading.Event()
+
+    def process(record):
+        running.append(record["messageId"])
+        if len(running) > 1:
+            overlapped.set()
+        time.sleep(0.01)
+        seen.append(record["messageId"])
+        running.remove(record["messageId"])
+        return process_body(record)
+
+    processor = BatchProcessor(process, workers=4)
+    batch = processor.process(sqs_event(["a", "b", "fail", "c", "d"], group="g"))
+
+    assert seen == ["m0", "m1", "m2"]
+    assert not overlapped.is_set()
+    assert failures(batch) == ["m2", "m3", "m4"]
+    processor.close()
+
+
+def test_stream_records_run_in_order_and_report_the_failed_sequence_number_onwards():
+    seen = []
+    records = [{"eventSource": "aws:kinesis", "kinesis": {"sequenceNumber": str(n), "data": body}}
+               for n, body in zip(range(100, 105), ["a", "b", "fail", "c", "d"])]
+
+    def process(record):
+        time.sleep(0.01)
+        seen.append(record["kinesis"]["sequenceNumber"])
+        return process_body({"body": record["kinesis"]["data"]})
+
+    processor = BatchProcessor(process, workers=4)
+    batch = processor.process({"Records": records})
+
+    assert seen == ["100", "101", "102"]
+    assert failures(batch) == ["102", "103", "104"]
+    processor.close()
+
+
+def test_only_stream_and_queue_events_are_batches():
+    assert is_batch_event(sqs_event(["a"]))
+    assert is_batch_event({"Records": [{"eventSource": "aws:kinesis", "kinesis": {"sequenceNumber": "1"}}]})
+    assert is_batch_event({"Records": [{"eventSource": "aws:dynamodb", "dynamodb": {"SequenceNumber": "1"}}]})
+    assert not is_batch_event({"Records": [{"eventSource": "aws:s3", "s3": {}}]})
+    assert not is_batch_event({"Records": [{"EventSource": "aws:sns", "Sns": {}}]})
+    assert not is_batch_event({"Records": []})
+    assert not is_batch_event({"libraries": ["proj"]})
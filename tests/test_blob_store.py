@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from build_tools import blob_store
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+@pytest.fixture
+def source(tmp_path):
+    """
+    A Homebrew-style library directory: one real file per library, with the
+    soname and development names as symlinks, and a duplicate copy.
+    """
+    source = str(tmp_path / "source")
+    write(os.path.join(source, "libproj.so.22.1.1"), "proj" * 100)
+    os.symlink("libproj.so.22.1.1", os.path.join(source, "libproj.so.22"))
+    os.symlink("libproj.so.22", os.path.join(source, "libproj.so"))
+    write(os.path.join(source, "libexif.so.12"), "exif" * 100)
+    write(os.path.join(source, "copy", "libexif.so.12"), "exif" * 100)
+    return source
+
+
+@pytest.mark.parametrize("hardlink", [True, False])
+def test_identical_files_are_stored_once_and_aliases_stay_symlinks(tmp_path, source, hardlink):
+    packages_path = str(tmp_path / "lambda_packages")
+
+    report = blob_store.install(source, packages_path, hardlink=hardlink)
+
+    assert (report.files, report.blobs, report.blobs_written) == (5, 2, 2)
+    assert report.logical_bytes == 2000
+    assert report.stored_bytes == 800
+    lib = os.path.join(packages_path, "lib")
+    assert os.readlink(os.path.join(lib, "libproj.so.22")) == "libproj.so.22.1.1"
+    assert os.readlink(os.path.join(lib, "libproj.so")) == "libproj.so.22.1.1"
+    assert os.path.islink(os.path.join(lib, "libproj.so.22.1.1")) != hardlink
+    assert os.path.samefile(os.path.join(lib, "libexif.so.12"), os.path.join(lib, "copy", "libexif.so.12"))
+    with open(os.path.join(lib, "libproj.so")) as f:
+        assert f.read() == "proj" * 100
+
+
+def test_reinstalling_reuses_blobs_and_gc_removes_unreferenced_ones(tmp_path, source):
+    packages_path = str(tmp_path / "lambda_packages")
+    blob_store.install(source, packages_path)
+
+    assert blob_store.install(source, packages_path).blobs_reused == 2
+    assert blob_store.collect_garbage(packages_path) == 0
+
+    os.remove(os.path.join(source, "libexif.so.12"))
+    os.remove(os.path.join(source, "copy", "libexif.so.12"))
+    blob_store.install(source, packages_path)
+
+    assert not os.path.lexists(os.path.join(packages_path, "lib", "libexif.so.12"))
+    assert blob_store.collect_garbage(packages_path) == 1
+    assert len(blob_store.list_files(os.path.join(packages_path, blob_store.BLOBS_DIRECTORY))) == 1
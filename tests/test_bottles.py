@@ -0,0 +1,80 @@
+import io
+import os
+import tarfile
+
+import pytest
+
+from build_tools import bottles
+from build_tools.elf import read_dynamic_info
+
+
+TARGET_PREFIX = "/mnt/efs/lambda_packages"
+
+
+@pytest.fixture
+def bottles_dir(tmp_path, compile_library, make_bottle):
+    """
+    Bottles for proj, which depends on sqlite, with libraries whose run paths
+    and strings point into the Homebrew prefix.
+    """
+    bottles_dir = str(tmp_path / "bottles")
+    build = str(tmp_path / "build")
+    sqlite = compile_library(build, "libsqlite3.so.0", runpath="@@HOMEBREW_PREFIX@@/lib")
+    proj = compile_library(build, "libproj.so.22", [sqlite], runpath="@@HOMEBREW_PREFIX@@/lib", source="""
+        const char *search_path = "/home/linuxbrew/.linuxbrew/share/proj";
+        const char *too_long = "@@HOMEBREW_PREFIX@@/x";
+        int answer(void) { return search_path[0] + too_long[0]; }
+    """)
+
+    make_bottle(bottles_dir, "sqlite", "3.33.0", {"lib/libsqlite3.so.0": sqlite})
+    make_bottle(bottles_dir, "sqlite", "3.9.0", {"lib/libsqlite3.so.0": b"older"})
+    make_bottle(bottles_dir, "proj", "7.2.1", {
+        "lib/libproj.so.22": proj,
+        "lib/pkgconfig/proj.pc": b"prefix=@@HOMEBREW_PREFIX@@\nlibdir=@@HOMEBREW_CELLAR@@/proj/7.2.1/lib\n",
+        "share/proj/proj.db": b"db",
+    }, dependencies=["homebrew/core/sqlite"], symlinks={"lib/libproj.so": "libproj.so.22"})
+    return bottles_dir
+
+
+def test_resolves_dependencies_first_at_their_highest_version(bottles_dir):
+    resolved = bottles.resolve(bottles_dir, ["proj"])
+
+    assert [(b.name, b.version) for b in resolved] == [("sqlite", "3.33.0"), ("proj", "7.2.1")]
+    with pytest.raises(FileNotFoundError):
+        bottles.resolve(bottles_dir, ["gdal"])
+
+
+def test_installs_relocates_and_links_kegs(tmp_path, bottles_dir):
+    prefix = str(tmp_path / "prefix")
+
+    report = bottles.install(bottles_dir, prefix, ["proj"], TARGET_PREFIX, workers=4)
+
+    assert report.bottles == 2
+    assert (report.text_files, report.elf_files) == (1, 2)
+    with open(os.path.join(prefix, "lib", "pkgconfig", "proj.pc")) as f:
+        assert f.read() == f"prefix={TARGET_PREFIX}\nlibdir={TARGET_PREFIX}/Cellar/proj/7.2.1/lib\n"
+
+    library = os.path.join(prefix, "lib", "libproj.so.22")
+    assert os.path.islink(library)
+    assert read_dynamic_info(library).runpath == "$ORIGIN"
+    with open(library, "rb") as f:
+        data = f.read()
+    assert f"{TARGET_PREFIX}/share/proj\0".encode() in data
+    assert report.unrelocated == {"Cellar/proj/7.2.1/lib/libproj.so.22": ["@@HOMEBREW_PREFIX@@/x"]}
+
+    assert os.readlink(os.path.join(prefix, "lib", "libproj.so")) == os.path.join(
+        "..", "Cellar", "proj", "7.2.1", "lib", "libproj.so")
+    assert os.path.realpath(os.path.join(prefix, "opt", "sqlite")) == os.path.join(
+        os.path.realpath(prefix), "Cellar", "sqlite", "3.33.0")
+
+
+def test_refuses_members_outside_the_keg(tmp_path):
+    path = str(tmp_path / "evil--1.0.x86_64_linux.bottle.tar.gz")
+    with tarfile.open(path, "w:gz") as tar:
+        info = tarfile.TarInfo("evil/1.0/../../../escaped")
+        info.size = 1
+        tar.addfile(info, io.BytesIO(b"x"))
+
+    with pytest.raises(ValueError, match="Unsafe path"):
+        bottles.extract(bottles.read_bottle(path), str(tmp_path / "Cellar"))
+    assert not os.path.exists(str(tmp_path / "escaped"))
@@ -0,0 +1,85 @@
+import importlib
+import os
+import struct
+import sys
+
+import pytest
+
+import bundle_loader
+import library_resolver
+
+from build_tools import bundle, generations
+
+
+@pytest.fixture
+def packages_path(tmp_path):
+    """
+    A `lambda_packages` tree whose current generation is packed as a bundle.
+    """
+    packages_path = str(tmp_path / "efs" / "lambda_packages")
+    generation_id = generations.create_generation(packages_path)
+    generation_path = os.path.join(packages_path, "generations", generation_id)
+    with open(os.path.join(generation_path, "lib", "libproj.so.22"), "wb") as f:
+        f.write(os.urandom(300 * 1024))
+    os.symlink("libproj.so.22", os.path.join(generation_path, "lib", "libproj.so"))
+    generations.activate(packages_path, generation_id)
+    bundle.pack(generation_path, chunk_size=64 * 1024)
+    return packages_path
+
+
+@pytest.fixture
+def local_root(tmp_path, monkeypatch):
+    local_copy = bundle_loader.local_copy
+    root = str(tmp_path / "local")
+    monkeypatch.setattr(bundle_loader, "local_copy", lambda generation_path: local_copy(generation_path, root))
+    monkeypatch.setattr(library_resolver, "_default_resolver", None)
+    return root
+
+
+def test_extracted_bundle_matches_generation(packages_path, tmp_path):
+    generation_path = library_resolver.resolve_generation(packages_path)
+    local_path = bundle_loader.local_copy(generation_path, str(tmp_path / "local"))
+
+    with open(os.path.join(generation_path, "lib", "libproj.so.22"), "rb") as f, \
+            open(os.path.join(local_path, "lib", "libproj.so.22"), "rb") as g:
+        assert f.read() == g.read()
+    assert os.readlink(os.path.join(local_path, "lib", "libproj.so")) == "libproj.so.22"
+
+
+def test_bundle_is_unpacked_when_the_handler_is_imported(packages_path, local_root, monkeypatch):
+    monkeypatch.setenv("LAMBDA_PACKAGES_PATH", os.path.dirname(packages_path))
+    monkeypatch.delitem(sys.modules, "handler", raising=False)
+
+    importlib.import_module("handler")
+
+    resolver = library_resolver._default_resolver
+    assert resolver is not None
+    assert resolver.packages_path.startswith(local_root)
+    assert os.path.isfile(os.path.join(resolver.packages_path, "lib", "libproj.so.22"))
+
+
+def test_corrupt_bundle_falls_back_to_efs(packages_path, local_root, monkeypatch):
+    generation_path = library_resolver.resolve_generation(packages_path)
+    bundle_path = os.path.join(generation_path, bundle_loader.BUNDLE_NAME)
+    with open(bundle_path, "r+b") as f:
+        f.seek(struct.calcsize(bundle_loader.HEADER_FORMAT) + 10)
+        f.write(b"\xff" * 64)
+    monkeypatch.setenv("LAMBDA_PACKAGES_PATH", os.path.dirname(packages_path))
+
+    resolver = library_resolver.get_resolver()
+
+    assert resolver.packages_path == generation_path
+    assert "error" in resolver.bundle_error
+    assert not os.path.exists(local_root) or os.listdir(local_root) == []
+
+
+def test_bad_magic_falls_back_to_efs(packages_path, local_root, monkeypatch):
+    generation_path = library_resolver.resolve_generation(packages_path)
+    with open(os.path.join(generation_path, bundle_loader.BUNDLE_NAME), "r+b") as f:
+        f.write(b"NOTABUND")
+    monkeypatch.setenv("LAMBDA_PACKAGES_PATH", os.path.dirname(packages_path))
+
+    resolver = library_resolver.get_resolver()
+
+    assert resolver.packages_path == generation_path
+    assert resolver.bundle_error.startswith("ValueError")
@@ -0,0 +1,48 @@
+import json
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks import cold_start
+
+
+def test_shim_charges_each_block_once(tmp_path, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(cold_start.time, "sleep", sleeps.append)
+    shim = cold_start.LatencyShim(str(tmp_path), open_latency=0.003, read_latency=0.001, block_size=100)
+
+    shim.charge_read(str(tmp_path / "libproj.so.22"), 50, 200)
+    shim.charge_read(str(tmp_path / "libproj.so.22"), 0, 400)
+    shim.charge_read(str(tmp_path / "libproj.so.22"), 0, 100)
+
+    assert sleeps == [pytest.approx(0.003), pytest.approx(0.001)]
+    assert shim.covers(str(tmp_path / "lib" / "libproj.so.22"))
+    assert not shim.covers("/usr/lib/libc.so.6")
+    assert not shim.covers(3)
+
+
+def test_regressions_ignore_noise():
+    baseline = {"scenarios": {"efs": {"init_ms": {"p50": 100.0}, "cold_invoke_ms": {"p50": 4.0}}}}
+    report = {"scenarios": {"efs": {"init_ms": {"p50": 130.0}, "cold_invoke_ms": {"p50": 5.5}},
+                            "bundle": {"init_ms": {"p50": 500.0}}}}
+
+    assert list(cold_start.regressions(report, baseline, 0.25, 2.0)) == ["efs init_ms p50 130.0 ms, was 100.0 ms"]
+
+
+def test_every_scenario_runs_against_synthetic_libraries(tmp_path):
+    if shutil.which("cc") is None:
+        pytest.skip("needs a C compiler")
+    output = str(tmp_path / "report.json")
+
+    subprocess.run([sys.executable, cold_start.__file__, "--runs", "1", "--warm-invocations", "2",
+                    "--library-size", "1024", "--open-latency-ms", "0", "--read-latency-ms", "0",
+                    "--output", output], cwd=str(tmp_path), check=True, stdout=subprocess.DEVNULL)
+
+    with open(output) as f:
+        report = json.load(f)
+    assert list(report["scenarios"]) == cold_start.SCENARIOS
+    for summary in report["scenarios"].values():
+        assert set(summary) == set(cold_start.METRICS)
+        assert summary["cold_invoke_ms"]["p50"] > 0
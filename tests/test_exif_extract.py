@@ -0,0 +1,97 @@
+import ctypes
+import sys
+
+import pytest
+
+import libraries
+
+from exif_extract import ExifExtractor, as_exif_buffer
+from libraries import ExifContent, ExifData, ExifEntry
+
+
+TAG_NAMES = {0x010f: b"Make", 0x0112: b"Orientation"}
+
+
+class FakeExif:
+    """
+    Stands in for libexif.  Payloads are `tag=value` pairs separated by `;`,
+    parsed into real `ExifData` structures so that the extractor walks them
+    as it would libexif's.
+    """
+
+    def __init__(self):
+        self.live = {}
+        self.payloads = []
+
+    def exif_data_new_from_data(self, address, size):
+        payload = ctypes.string_at(address, size)
+        self.payloads.append((address, payload))
+
+        values = [ctypes.create_string_buffer(v) for v in payload.split(b";")]
+        entries = [ExifEntry(tag=int(v.value.split(b"=")[0], 16), data=ctypes.addressof(v)) for v in values]
+        array = (ctypes.POINTER(ExifEntry) * len(entries))(*[ctypes.pointer(e) for e in entries])
+        content = ExifContent(entries=ctypes.cast(array, ctypes.POINTER(ctypes.POINTER(ExifEntry))),
+                              count=len(entries))
+        data = ExifData()
+        data.ifd[0] = ctypes.pointer(content)
+        self.live[ctypes.addressof(data)] = (data, content, array, entries, values)
+        return ctypes.pointer(data)
+
+    def exif_data_unref(self, exif_data):
+        del self.live[ctypes.addressof(exif_data.contents)]
+
+    def exif_tag_get_name_in_ifd(self, tag, ifd):
+        return TAG_NAMES.get(tag)
+
+    def exif_entry_get_value(self, entry, value, size):
+        value.value = ctypes.string_at(entry.contents.data).split(b"=", 1)[1]
+
+
+@pytest.fixture
+def exif(monkeypatch):
+    fake = FakeExif()
+    monkeypatch.setattr(libraries, "exif", fake)
+    return fake
+
+
+def test_bytes_and_writable_buffers_are_passed_without_copying():
+    data = b"payload"
+    buffer = as_exif_buffer(data)
+    assert id(data) < buffer.address < id(data) + sys.getsizeof(data)
+    assert ctypes.string_at(buffer.address, buffer.size) == data
+
+    writable = bytearray(b"payload")
+    buffer = as_exif_buffer(writable)
+    writable[0:1] = b"P"
+    assert ctypes.string_at(buffer.address, buffer.size) == b"Payload"
+
+    copied = as_exif_buffer(memoryview(b"read-only"))
+    assert ctypes.string_at(copied.address, copied.size) == b"read-only"
+
+
+def test_batches_are_extracted_in_order_and_released(exif):
+    payloads = [b"010f=Canon;0112=Top-left", bytearray(b"010f=Nikon;9999=unknown"), b"0112=Right-top"]
+
+    with ExifExtractor(workers=3) as extractor:
+        results = extractor.extract_batch(payloads)
+
+    assert results == [{"Make": "Canon", "Orientation": "Top-left"}, {"Make": "Nikon"}, {"Orientation": "Right-top"}]
+    assert exif.live == {}
+
+
+def test_only_requested_tags_are_formatted(exif):
+    extractor = ExifExtractor(tags=["Make"], workers=1)
+
+    assert extractor.extract(b"010f=Canon;0112=Top-left") == {"Make": "Canon"}
+
+
+def test_extracts_files(tmp_path, exif):
+    paths = []
+    for i, make in enumerate([b"Canon", b"Nikon"]):
+        path = tmp_path / f"{i}.jpg"
+        path.write_bytes(b"010f=" + make)
+        paths.append(str(path))
+
+    with ExifExtractor(workers=2) as extractor:
+        assert extractor.extract_files(paths) == [{"Make": "Canon"}, {"Make": "Nikon"}]
+    assert sorted(payload for _, payload in exif.payloads) == [b"010f=Canon", b"010f=Nikon"]
@@ -0,0 +1,92 @@
+import base64
+import hashlib
+import os
+
+import filebase64sha256 as fb
+
+
+def expected(content):
+    return base64.b64encode(hashlib.sha256(content).digest()).decode()
+
+
+def write_old(path, content):
+    """
+    Writes a file with an mtime far enough in the past for its digest to be
+    cached.
+    """
+    with open(path, "wb") as f:
+        f.write(content)
+    os.utime(path, (1, 1))
+
+
+def test_matches_terraform_with_and_without_mmap(tmp_path, monkeypatch):
+    path = str(tmp_path / "lambda.zip")
+    write_old(path, b"zip" * 1000)
+
+    assert fb.filebase64sha256(path, cache=False) == expected(b"zip" * 1000)
+    monkeypatch.setattr(fb, "MMAP_THRESHOLD", 1)
+    assert fb.filebase64sha256(path, cache=False) == expected(b"zip" * 1000)
+
+
+def test_cached_digests_are_reused_until_the_file_changes(tmp_path):
+    path = str(tmp_path / "lambda.zip")
+    cache_path = str(tmp_path / "cache.json")
+    write_old(path, b"first")
+
+    cache = fb.HashCache(cache_path)
+    cache.digest(path)
+    cache.save()
+
+    reloaded = fb.HashCache(cache_path)
+    assert reloaded.digest(path) == hashlib.sha256(b"first").digest()
+    assert (reloaded.hits, reloaded.misses) == (1, 0)
+
+    write_old(path, b"second")
+    assert reloaded.digest(path) == hashlib.sha256(b"second").digest()
+    assert reloaded.misses == 1
+
+
+def test_recently_modified_files_are_not_cached(tmp_path):
+    path = str(tmp_path / "lambda.zip")
+    with open(path, "wb") as f:
+        f.write(b"new")
+
+    cache = fb.HashCache(str(tmp_path / "cache.json"))
+    cache.digest(path)
+    cache.digest(path)
+
+    assert cache.misses == 2
+    assert cache._entries == {}
+
+
+def test_many_files_are_hashed_in_parallel(tmp_path, monkeypatch):
+    monkeypatch.setattr(fb, "_default_cache", fb.HashCache(str(tmp_path / "cache.json")))
+    paths = []
+    for i in range(6):
+        paths.append(str(tmp_path / f"layer{i}.zip"))
+        write_old(paths[-1], str(i).encode())
+
+    digests = fb.filebase64sha256_many(paths, workers=3)
+
+    assert digests == {p: expected(str(i).encode()) for i, p in enumerate(paths)}
+    assert os.path.exists(str(tmp_path / "cache.json"))
+
+
+def test_tree_hash_depends_on_contents_not_timestamps(tmp_path):
+    tree = tmp_path / "src"
+    (tree / "pkg").mkdir(parents=True)
+    (tree / "handler.py").write_text("print('hi')")
+    (tree / "pkg" / "module.py").write_text("")
+    os.symlink("handler.py", str(tree / "link.py"))
+
+    first = fb.dirbase64sha256(str(tree), cache=False)
+    os.utime(str(tree / "handler.py"), (1, 1))
+    assert fb.dirbase64sha256(str(tree), cache=False) == first
+
+    os.chmod(str(tree / "handler.py"), 0o755)
+    executable = fb.dirbase64sha256(str(tree), cache=False)
+    assert executable != first
+
+    os.remove(str(tree / "link.py"))
+    os.symlink("pkg/module.py", str(tree / "link.py"))
+    assert fb.dirbase64sha256(str(tree), cache=False) not in (first, executable)
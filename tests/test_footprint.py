@@ -0,0 +1,95 @@
+import json
+import os
+import sys
+
+import pytest
+
+from build_tools import bottles, footprint, manifest
+
+
+@pytest.fixture
+def installed(tmp_path, make_bottle):
+    """
+    A Cellar installed from bottles of proj, which depends on sqlite, and a
+    generation holding their libraries, proj's debug copy and a stray file.
+    """
+    bottles_dir = str(tmp_path / "bottles")
+    make_bottle(bottles_dir, "sqlite", "3.33.0", {"lib/libsqlite3.so.0": b"s" * 100})
+    make_bottle(bottles_dir, "proj", "7.2.1", {"lib/libproj.so.22": b"p" * 300, "share/proj/proj.db": b"d" * 50},
+                dependencies=["sqlite"])
+    prefix = str(tmp_path / "prefix")
+    bottles.install(bottles_dir, prefix, ["proj"], "/mnt/efs/lambda_packages")
+
+    generation = tmp_path / "generation"
+    for relative_path, content in [("lib/libproj.so.22", b"p" * 300), ("lib/libsqlite3.so.0", b"s" * 100),
+                                   ("share/proj/proj.db", b"d" * 50), ("debug/lib/libproj.so.22", b"p" * 400),
+                                   ("lib/stray.txt", b"x" * 7)]:
+        (generation / relative_path).parent.mkdir(parents=True, exist_ok=True)
+        (generation / relative_path).write_bytes(content)
+    os.symlink("libproj.so.22", str(generation / "lib" / "libproj.so"))
+    with open(str(generation / manifest.MANIFEST_NAME), "w") as f:
+        json.dump({"libraries": {
+            "libproj.so.22": {"path": "lib/libproj.so.22", "size": 300, "needed": ["libsqlite3.so.0"]},
+            "libsqlite3.so.0": {"path": "lib/libsqlite3.so.0", "size": 100, "needed": []},
+        }, "aliases": {"libproj.so": "libproj.so.22"}}, f)
+
+    brewfile = str(tmp_path / "Brewfile")
+    with open(brewfile, "w") as f:
+        f.write('brew "proj"\n')
+    return str(generation), os.path.join(prefix, bottles.CELLAR_DIRECTORY), brewfile
+
+
+def test_files_are_attributed_to_the_formulae_which_installed_them(installed):
+    generation, cellar, brewfile = installed
+
+    report = footprint.analyze(generation, cellar, roots=["proj"], brewfile=brewfile)
+    formulae = report["formulae"]
+
+    assert formulae["proj"] == {"bytes": 750, "files": 3, "cold_start_bytes": 300, "required_by": ["proj"]}
+    assert formulae["sqlite"] == {"bytes": 100, "files": 1, "cold_start_bytes": 100, "required_by": ["proj"]}
+    manifest_bytes = os.path.getsize(os.path.join(generation, manifest.MANIFEST_NAME))
+    assert formulae[footprint.UNATTRIBUTED]["bytes"] == 7 + manifest_bytes
+    assert report["total"]["bytes"] == 857 + manifest_bytes
+
+
+def test_budgets_name_the_brewfile_entry(installed):
+    generation, cellar, brewfile = installed
+    report = footprint.analyze(generation, cellar, roots=["proj"], brewfile=brewfile)
+
+    failures = footprint.check_budgets(report, {"total": {"cold_start_bytes": 350},
+                                                "formulae": {"*": {"bytes": 500}, "proj": {"bytes": 1000}}})
+
+    assert failures == ["total cold_start_bytes 400 exceeds budget 350"]
+
+    failures = footprint.check_budgets(report, {"formulae": {"*": {"bytes": 500}}})
+    assert failures == ["proj bytes 750 exceeds budget 500 (required by proj)"]
+
+
+def test_diff_reports_what_grew_first():
+    previous = {"formulae": {"proj": {"bytes": 100, "files": 1, "cold_start_bytes": 100, "required_by": ["proj"]},
+                             "gdal": {"bytes": 50, "files": 1, "cold_start_bytes": 0, "required_by": ["gdal"]},
+                             "sqlite": {"bytes": 10, "files": 1, "cold_start_bytes": 10, "required_by": ["proj"]}}}
+    report = {"formulae": {"proj": {"bytes": 400, "files": 2, "cold_start_bytes": 100, "required_by": ["proj"]},
+                           "sqlite": {"bytes": 10, "files": 1, "cold_start_bytes": 10, "required_by": ["proj"]},
+                           "curl": {"bytes": 200, "files": 3, "cold_start_bytes": 0, "required_by": ["proj"]}}}
+
+    changes = footprint.diff(report, previous)
+
+    assert [(c["formula"], c["status"], c["bytes"]) for c in changes] == [
+        ("proj", "changed", 300), ("curl", "added", 200), ("gdal", "removed", -50)]
+
+
+def test_exceeding_a_budget_fails_the_install(tmp_path, installed, monkeypatch):
+    generation, cellar, brewfile = installed
+    budgets = str(tmp_path / "budgets.json")
+    with open(budgets, "w") as f:
+        json.dump({"formulae": {"proj": {"bytes": 700}}}, f)
+    monkeypatch.setattr(sys, "argv", ["footprint", generation, "--cellar", cellar, "--brewfile", brewfile,
+                                      "--root", "proj", "--budgets", budgets])
+
+    with pytest.raises(SystemExit) as exited:
+        footprint.main()
+
+    assert exited.value.code == 1
+    with open(os.path.join(generation, footprint.REPORT_NAME)) as f:
+        assert json.load(f)["budget_failures"] == ["proj bytes 750 exceeds budget 700 (required by proj)"]
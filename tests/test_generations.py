@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+import library_resolver
+
+from build_tools import blob_store, generations
+
+
+def install_generation(packages_path, source):
+    generation_id = generations.create_generation(packages_path)
+    blob_store.install(source, packages_path, lib_name=f"generations/{generation_id}/lib")
+    return generation_id
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "staging"
+    path.mkdir()
+    (path / "libproj.so.22").write_bytes(b"proj")
+    return str(path)
+
+
+def test_discard_deletes_failed_generation_and_its_blobs(tmp_path, source):
+    packages_path = str(tmp_path / "lambda_packages")
+    good = install_generation(packages_path, source)
+    generations.activate(packages_path, good)
+
+    with open(os.path.join(source, "libexif.so.12"), "wb") as f:
+        f.write(b"exif")
+    failed = install_generation(packages_path, source)
+    generations.discard_generation(packages_path, failed)
+
+    assert generations.list_generations(packages_path) == [good]
+    assert blob_store.collect_garbage(packages_path) == 0
+    assert len(os.listdir(os.path.join(packages_path, "blobs"))) == 1
+
+
+def test_discard_refuses_the_current_generation(tmp_path, source):
+    packages_path = str(tmp_path / "lambda_packages")
+    generation_id = install_generation(packages_path, source)
+    generations.activate(packages_path, generation_id)
+
+    with pytest.raises(ValueError):
+        generations.discard_generation(packages_path, generation_id)
+    assert generations.list_generations(packages_path) == [generation_id]
+
+
+@pytest.mark.skipif(os.geteuid() != 0, reason="needs to install as root")
+def test_only_the_generation_directory_and_marker_are_handed_to_lambdas(tmp_path, source):
+    packages_path = str(tmp_path / "lambda_packages")
+    path = os.path.join(packages_path, "generations", install_generation(packages_path, source))
+
+    for owned_path in (path, os.path.join(path, generations.LAST_USED_NAME)):
+        assert (os.stat(owned_path).st_uid, os.stat(owned_path).st_gid) == generations.LAMBDA_USER
+        assert not os.stat(owned_path).st_mode & 0o002
+    assert os.stat(os.path.join(path, "lib")).st_uid == 0
+
+
+def test_activate_flips_current_and_replaces_an_in_place_install(tmp_path, source):
+    packages_path = str(tmp_path / "lambda_packages")
+    os.makedirs(os.path.join(packages_path, "lib"))
+    with open(os.path.join(packages_path, "library_manifest.json"), "w") as f:
+        f.write("{}")
+
+    first = install_generation(packages_path, source)
+    generations.activate(packages_path, first)
+
+    assert generations.current_generation(packages_path) == first
+    assert os.readlink(os.path.join(packages_path, "lib")) == os.path.join("current", "lib")
+    assert not os.path.exists(os.path.join(packages_path, "library_manifest.json"))
+    with open(os.path.join(packages_path, "lib", "libproj.so.22"), "rb") as f:
+        assert f.read() == b"proj"
+
+    second = install_generation(packages_path, source)
+    generations.activate(packages_path, second)
+    assert generations.current_generation(packages_path) == second
+    assert os.path.isdir(os.path.join(packages_path, "generations", first))
+
+    with pytest.raises(ValueError):
+        generations.activate(packages_path, "missing")
+
+
+def test_gc_deletes_only_old_unused_generations(tmp_path, source):
+    packages_path = str(tmp_path / "lambda_packages")
+    ids = sorted(install_generation(packages_path, source) for _ in range(4))
+    generations.activate(packages_path, ids[0])
+    now = generations.last_used(packages_path, ids[-1])
+    unused, marked = now - 2 * generations.LAST_USED_INTERVAL, now - generations.LAST_USED_INTERVAL / 2
+    os.utime(os.path.join(packages_path, "generations", ids[1], generations.LAST_USED_NAME), (unused, unused))
+    os.utime(os.path.join(packages_path, "generations", ids[2], generations.LAST_USED_NAME), (marked, marked))
+
+    # Retention is clamped to the interval Lambdas mark their generation at,
+    # so ids[2] may still be in use
+    assert generations.LAST_USED_INTERVAL == library_resolver.LAST_USED_INTERVAL
+    deleted = generations.collect_generations(packages_path, retention_seconds=5, keep=1, now=now)
+
+    assert deleted == [ids[1]]
+    assert generations.list_generations(packages_path) == [ids[0], ids[2], ids[3]]
@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+import zipfile
+
+import pytest
+
+from build_tools import lambda_package
+
+
+@pytest.fixture
+def source(tmp_path):
+    source = tmp_path / "src"
+    (source / "pkg" / "__pycache__").mkdir(parents=True)
+    (source / "handler.py").write_text("import pkg.module\nANSWER = pkg.module.ANSWER\n")
+    (source / "pkg" / "__init__.py").write_text("")
+    (source / "pkg" / "module.py").write_text("ANSWER = 42\n")
+    (source / "pkg" / "__pycache__" / "stale.cpython-38.pyc").write_bytes(b"stale")
+    return str(source)
+
+
+def test_builds_the_same_bytes_from_the_same_sources(tmp_path, source):
+    first, second = str(tmp_path / "first.zip"), str(tmp_path / "second.zip")
+
+    assert lambda_package.build(source, first, python=None)
+    os.utime(os.path.join(source, "handler.py"), (1, 1))
+    assert lambda_package.build(source, second, python=None)
+
+    with open(first, "rb") as a, open(second, "rb") as b:
+        assert a.read() == b.read()
+    with zipfile.ZipFile(first) as archive:
+        assert archive.namelist() == ["handler.py", "pkg/__init__.py", "pkg/module.py"]
+        assert {info.date_time for info in archive.infolist()} == {lambda_package.ZIP_TIMESTAMP}
+
+
+def test_unchanged_sources_leave_the_zip_untouched(tmp_path, source):
+    zip_path = str(tmp_path / "lambda.zip")
+    lambda_package.build(source, zip_path, python=None)
+
+    assert not lambda_package.build(source, zip_path, python=None)
+
+    with open(os.path.join(source, "pkg", "module.py"), "w") as f:
+        f.write("ANSWER = 43\n")
+    assert lambda_package.build(source, zip_path, python=None)
+
+
+def test_packaged_bytecode_is_used_without_the_sources(tmp_path, source):
+    zip_path = str(tmp_path / "lambda.zip")
+    lambda_package.build(source, zip_path, python=sys.executable)
+    tag = "cpython-%d%d" % sys.version_info[:2]
+
+    extracted = tmp_path / "task"
+    with zipfile.ZipFile(zip_path) as archive:
+        assert f"pkg/__pycache__/module.{tag}.pyc" in archive.namelist()
+        assert "pkg/__pycache__/stale.cpython-38.pyc" not in archive.namelist()
+        archive.extractall(str(extracted))
+
+    # Unchecked hash-based .pyc files are trusted even if the source changes
+    (extracted / "pkg" / "module.py").write_text("ANSWER = 0\n")
+    output = subprocess.run(
+        [sys.executable, "-c", "import handler; print(handler.ANSWER)"], cwd=str(extracted), check=True,
+        stdout=subprocess.PIPE, universal_newlines=True, env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1"),
+    ).stdout
+    assert output.strip() == "42"
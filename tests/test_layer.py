@@ -0,0 +1,67 @@
+import json
+import os
+import zipfile
+
+from build_tools import layer, manifest
+from library_resolver import LibraryResolver
+
+
+def synthetic_manifest(sizes, needed):
+    return {"libraries": {s: {"path": f"lib/{s}", "size": size, "needed": needed.get(s, [])}
+                          for s, size in sizes.items()},
+            "aliases": {"libproj.so": "libproj.so.22"}}
+
+
+MANIFEST = synthetic_manifest(
+    {"libproj.so.22": 300, "libsqlite3.so.0": 100, "libexif.so.12": 50, "libtiff.so.5": 400},
+    {"libproj.so.22": ["libsqlite3.so.0", "libc.so.6"], "libtiff.so.5": ["libsqlite3.so.0"]},
+)
+
+
+def test_hottest_libraries_are_placed_with_their_dependencies(tmp_path):
+    trace = str(tmp_path / "counts.json")
+    with open(trace, "w") as f:
+        json.dump({"invocations": 10, "counts": {"libproj.so": 10, "libexif.so.12": 5, "libtiff.so.5": 10}}, f)
+
+    frequencies = layer.load_frequencies(MANIFEST, [trace], [])
+    assert frequencies == {"libproj.so.22": 1.0, "libexif.so.12": 0.5, "libtiff.so.5": 1.0}
+
+    tiers = {p.soname: p.tier for p in layer.place(MANIFEST, frequencies, max_bytes=450)}
+    assert tiers == {"libproj.so.22": "layer", "libsqlite3.so.0": "layer", "libexif.so.12": "layer",
+                     "libtiff.so.5": "efs"}
+
+
+def test_roots_count_as_loaded_without_traces():
+    frequencies = layer.load_frequencies(MANIFEST, [], ["proj"])
+
+    assert frequencies == {"libproj.so.22": 1.0, "libsqlite3.so.0": 1.0}
+
+
+def test_resolver_loads_from_the_layer_only_if_its_hash_matches(tmp_path, compile_library):
+    packages_path = str(tmp_path / "lambda_packages")
+    compile_library(os.path.join(packages_path, "lib"), "libsqlite3.so.0")
+    compile_library(os.path.join(packages_path, "lib"), "libproj.so.22", ["libsqlite3.so.0"])
+    built = manifest.build_manifest(packages_path)
+    manifest.write_manifest(packages_path, built)
+
+    placements = layer.place(built, layer.load_frequencies(built, [], ["libsqlite3.so.0"]), layer.DEFAULT_MAX_BYTES)
+    zip_path = str(tmp_path / "layer.zip")
+    layer.write_layer(packages_path, built, placements, zip_path)
+    opt = str(tmp_path / "opt")
+    with zipfile.ZipFile(zip_path) as archive:
+        assert archive.namelist() == ["lib/libsqlite3.so.0", layer.LAYER_INDEX_NAME]
+        archive.extractall(opt)
+
+    resolver = LibraryResolver(packages_path, layer_path=opt)
+    assert resolver.find_library("libsqlite3.so.0") == os.path.join(opt, "lib", "libsqlite3.so.0")
+    assert resolver.find_library("libproj.so.22") == os.path.join(packages_path, "lib", "libproj.so.22")
+
+    index_path = os.path.join(opt, layer.LAYER_INDEX_NAME)
+    with open(index_path) as f:
+        index = json.load(f)
+    index["libraries"]["libsqlite3.so.0"]["sha256"] = "0" * 64
+    with open(index_path, "w") as f:
+        json.dump(index, f)
+
+    stale = LibraryResolver(packages_path, layer_path=opt)
+    assert stale.find_library("libsqlite3.so.0") == os.path.join(packages_path, "lib", "libsqlite3.so.0")
@@ -0,0 +1,63 @@
+import hashlib
+import os
+
+import pytest
+
+from library_cache import CacheIntegrityError, LibraryCache
+
+
+def write(root, relative_path, content):
+    path = os.path.join(root, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+    return {"sha256": hashlib.sha256(content).hexdigest(), "size": len(content)}
+
+
+@pytest.fixture
+def source(tmp_path):
+    source = str(tmp_path / "efs")
+    files = {name: write(source, name, name.encode() * 10)
+             for name in ("lib/libproj.so.22", "lib/libexif.so.12", "share/proj/proj.db")}
+    return source, files
+
+
+def test_copies_on_first_use_and_then_serves_locally(tmp_path, source):
+    source_root, files = source
+    cache = LibraryCache(source_root, str(tmp_path / "cache"), files=files)
+
+    path = cache.path("lib/libproj.so.22")
+    assert path == str(tmp_path / "cache" / "lib" / "libproj.so.22")
+    os.remove(os.path.join(source_root, "lib", "libproj.so.22"))
+    assert cache.path("lib/libproj.so.22") == path
+
+    with open(path, "rb") as f:
+        assert f.read() == b"lib/libproj.so.22" * 10
+    assert (cache.stats.misses, cache.stats.hits) == (1, 1)
+
+
+def test_least_recently_used_files_are_evicted(tmp_path, source):
+    source_root, files = source
+    budget = files["lib/libproj.so.22"]["size"] + files["share/proj/proj.db"]["size"]
+    cache = LibraryCache(source_root, str(tmp_path / "cache"), max_bytes=budget, files=files)
+
+    cache.path("lib/libproj.so.22")
+    cache.path("lib/libexif.so.12")
+    cache.path("lib/libproj.so.22")
+    cache.path("share/proj/proj.db")
+
+    assert list(cache._entries) == ["lib/libproj.so.22", "share/proj/proj.db"]
+    assert not os.path.exists(str(tmp_path / "cache" / "lib" / "libexif.so.12"))
+    assert cache.stats.evictions == 1
+    assert cache.cached_bytes <= cache.max_bytes
+
+
+def test_files_not_matching_the_manifest_are_rejected(tmp_path, source):
+    source_root, files = source
+    write(source_root, "lib/libexif.so.12", b"corrupt")
+    cache = LibraryCache(source_root, str(tmp_path / "cache"), files=files)
+
+    with pytest.raises(CacheIntegrityError):
+        cache.path("lib/libexif.so.12")
+    assert os.listdir(str(tmp_path / "cache" / "lib")) == []
+    assert cache.cached_bytes == 0
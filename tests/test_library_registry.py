@@ -0,0 +1,81 @@
+import ctypes
+import threading
+import time
+
+from library_registry import LibraryRegistry
+
+
+class FakeFunction:
+    restype = None
+    argtypes = None
+
+
+class FakeCDLL:
+    def __getattr__(self, name):
+        function = FakeFunction()
+        setattr(self, name, function)
+        return function
+
+
+class FakeResolver:
+    """
+    Stands in for `LibraryResolver.load`, counting the libraries it loads.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.loads = []
+
+    def load(self, name):
+        self.loads.append(name)
+        time.sleep(self.delay)
+        return FakeCDLL()
+
+
+def test_libraries_load_on_first_lookup_and_are_cached():
+    resolver = FakeResolver()
+    registry = LibraryRegistry(resolver)
+    proj = registry.declare("proj", {"proj_context_create": (ctypes.c_void_p, [])})
+
+    assert resolver.loads == []
+    assert registry.loaded() == []
+
+    function = proj.proj_context_create
+    assert proj.proj_context_create is function
+    assert registry["proj"].function("proj_context_create") is function
+    assert resolver.loads == ["proj"]
+    assert registry.loaded() == ["proj"]
+    assert registry.stats()["proj"]["hits"] == 2
+    assert registry.stats()["proj"]["misses"] == 1
+
+
+def test_prototypes_are_applied_once_bound():
+    registry = LibraryRegistry(FakeResolver())
+    exif = registry.declare("exif", {"exif_data_new_from_file": (ctypes.c_void_p, [ctypes.c_char_p])})
+    registry.declare("exif", {"exif_data_unref": (None, [ctypes.c_void_p])})
+
+    assert exif.exif_data_new_from_file.restype is ctypes.c_void_p
+    assert exif.exif_data_new_from_file.argtypes == [ctypes.c_char_p]
+    assert exif.exif_data_unref.argtypes == [ctypes.c_void_p]
+    assert exif.undeclared.argtypes is None
+
+
+def test_concurrent_first_lookups_load_once():
+    resolver = FakeResolver(delay=0.05)
+    proj = LibraryRegistry(resolver).declare("proj")
+
+    threads = [threading.Thread(target=lambda: proj.handle) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert resolver.loads == ["proj"]
+    assert proj.stats.load_time_ms >= 50
+
+
+def test_declaring_the_lambdas_libraries_loads_nothing():
+    import libraries
+
+    assert not libraries.proj.is_loaded
+    assert not libraries.exif.is_loaded
@@ -0,0 +1,103 @@
+import os
+import subprocess
+
+import pytest
+
+import library_resolver
+
+from build_tools import manifest
+from library_resolver import LibraryResolver, read_soname
+
+
+@pytest.fixture
+def packages_path(tmp_path, compile_library):
+    """
+    A `lambda_packages` directory with libproj depending on libsqlite3, whose
+    run paths are empty so that libsqlite3 is only found if it is preloaded.
+    """
+    packages_path = str(tmp_path / "lambda_packages")
+    lib = os.path.join(packages_path, "lib")
+    compile_library(lib, "libsqlite3.so.0", source="int sqlite_answer(void) { return 3; }", runpath=None)
+    compile_library(lib, "libproj.so.22", ["libsqlite3.so.0"], source="int proj_answer(void) { return 22; }",
+                    runpath=None)
+    os.symlink("libproj.so.22", os.path.join(lib, "libproj.so"))
+    manifest.write_manifest(packages_path, manifest.build_manifest(packages_path))
+    return packages_path
+
+
+@pytest.fixture
+def no_subprocesses(monkeypatch):
+    def forbidden(*args, **kwargs):
+        raise AssertionError("spawned a subprocess")
+
+    monkeypatch.setattr(subprocess, "Popen", forbidden)
+
+
+def resolver(packages_path):
+    return LibraryResolver(packages_path, layer_path=os.path.join(packages_path, "no-layer"))
+
+
+def test_manifest_maps_sonames_aliases_and_dependencies(packages_path):
+    built = manifest.build_manifest(packages_path)
+
+    assert built["libraries"]["libproj.so.22"]["path"] == "lib/libproj.so.22"
+    assert "libsqlite3.so.0" in built["libraries"]["libproj.so.22"]["needed"]
+    assert built["aliases"]["libproj.so"] == "libproj.so.22"
+    assert set(built["files"]) == {"lib/libproj.so", "lib/libproj.so.22", "lib/libsqlite3.so.0"}
+
+
+def test_finds_and_loads_libraries_from_the_manifest(packages_path, no_subprocesses):
+    found = resolver(packages_path)
+
+    assert found.find_library("proj") == os.path.join(packages_path, "lib", "libproj.so.22")
+    assert found.load("proj").proj_answer() == 22
+    assert found.load("libproj.so.22") is found.load("proj")
+    assert "libsqlite3.so.0" in found._loaded
+
+
+def test_stale_manifest_entries_fall_back_to_a_scan(packages_path, no_subprocesses):
+    path = os.path.join(packages_path, "lib", "libproj.so.22")
+    os.utime(path, (0, 0))
+
+    found = resolver(packages_path)
+    assert found._manifest_path("libproj.so.22") is None
+    assert found.find_library("proj") == path
+
+
+def test_scans_without_a_manifest(packages_path, no_subprocesses):
+    os.remove(os.path.join(packages_path, manifest.MANIFEST_NAME))
+
+    found = resolver(packages_path)
+    assert found.manifest == {}
+    assert found.find_library("proj") == os.path.join(packages_path, "lib", "libproj.so.22")
+    assert found.find_library("missing") is None
+    with pytest.raises(OSError):
+        found.load("missing")
+
+
+def test_reads_sonames_from_elf_files(packages_path):
+    assert read_soname(os.path.join(packages_path, "lib", "libproj.so")) == "libproj.so.22"
+    assert read_soname(os.path.join(packages_path, manifest.MANIFEST_NAME)) is None
+
+
+def test_current_generation_is_resolved_once(tmp_path, packages_path):
+    base = str(tmp_path / "generations_root")
+    os.makedirs(base)
+    os.symlink(packages_path, os.path.join(base, library_resolver.CURRENT_LINK))
+
+    found = resolver(base)
+    os.remove(os.path.join(base, library_resolver.CURRENT_LINK))
+    os.symlink(str(tmp_path), os.path.join(base, library_resolver.CURRENT_LINK))
+
+    assert found.generation_path == os.path.realpath(packages_path)
+    assert found.find_library("proj") == os.path.join(os.path.realpath(packages_path), "lib", "libproj.so.22")
+
+
+def test_prefetch_profile_is_recorded_once_per_container(packages_path):
+    found = resolver(packages_path)
+    found.load("proj")
+
+    profile = found.record_prefetch_profile()
+    assert "lib/libproj.so.22" in [entry["path"] for entry in profile["files"]]
+    assert found.record_prefetch_profile() is None
+    assert sorted(os.listdir(packages_path)) == ["lib", "library_manifest.json", "prefetch_profile.json"]
@@ -0,0 +1,41 @@
+import os
+import sys
+
+from build_tools import manifest, memory_profile
+
+
+def test_recommended_memory_is_a_lambda_size():
+    assert memory_profile.recommended_memory_mb(10 * 1024, 0.5) == 128
+    assert memory_profile.recommended_memory_mb(200 * 1024, 0.5) == 320
+
+
+def test_profiles_each_library_and_the_whole_set(tmp_path, compile_library, monkeypatch):
+    packages_path = tmp_path / "lambda_packages"
+    lib = str(packages_path / "lib")
+    compile_library(lib, "libsqlite3.so.0")
+    compile_library(lib, "libproj.so.22", ["libsqlite3.so.0"])
+    os.symlink("libproj.so.22", os.path.join(lib, "libproj.so"))
+    manifest.write_manifest(str(packages_path), manifest.build_manifest(str(packages_path)))
+
+    output = str(tmp_path / "memory_profile.json")
+    monkeypatch.setattr(sys, "argv", ["memory_profile", str(packages_path), "--root", "proj", "--output", output])
+    memory_profile.main()
+
+    report = memory_profile.profile(str(packages_path), ["proj"])
+    assert list(report["libraries"]) == ["libsqlite3.so.0", "libproj.so.22"]
+    assert all(r["use"] == 1 for r in report["libraries"].values())
+    assert report["total"]["peak_rss_kb"] > 0
+    assert report["recommended_memory_mb"] % memory_profile.LAMBDA_MEMORY_STEP_MB == 0
+    assert os.path.exists(output)
+
+
+def test_packages_path_defaults_to_efs(tmp_path, monkeypatch):
+    profiled = []
+    report = {"libraries": {}, "total": {"load_ms": 0.0, "rss_kb": 0, "baseline_rss_kb": 0},
+              "recommended_memory_mb": 128}
+    monkeypatch.setattr(memory_profile, "profile", lambda path, *args: profiled.append(path) or report)
+    monkeypatch.setattr(sys, "argv", ["memory_profile", "--root", "proj", "--output", str(tmp_path / "report.json")])
+
+    memory_profile.main()
+
+    assert profiled == [os.path.realpath(memory_profile.DEFAULT_PACKAGES_PATH)]
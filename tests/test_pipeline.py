@@ -0,0 +1,123 @@
+import os
+
+from build_tools.pipeline import BLOCKED, FAILED, SKIPPED, SUCCEEDED, Pipeline, Stage, StampFile
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+class Recorder:
+    """
+    Stands in for `run_command`, running each stage's callable with the root.
+    """
+
+    def __init__(self, commands):
+        self.commands = commands
+        self.ran = []
+
+    def __call__(self, stage, root):
+        self.ran.append(stage.name)
+        self.commands[stage.name](root)
+
+
+def make_pipeline(tmp_path, stages, commands, workers=2):
+    checkout = tmp_path / "checkout"
+    checkout.mkdir(exist_ok=True)
+    recorder = Recorder(commands)
+    pipeline = Pipeline(stages, StampFile(str(tmp_path / "efs" / "stamps.json")), root=str(checkout),
+                        workers=workers, runner=recorder)
+    os.makedirs(tmp_path / "efs", exist_ok=True)
+    return pipeline, recorder
+
+
+def statuses(results):
+    return {result.name: result.status for result in results}
+
+
+def test_unchanged_stages_are_skipped(tmp_path):
+    stages = [Stage("a", "a", inputs=["input.txt"]), Stage("b", "b", depends_on=["a"])]
+    commands = {"a": lambda root: None, "b": lambda root: None}
+    write(str(tmp_path / "checkout" / "input.txt"), "1")
+
+    pipeline, recorder = make_pipeline(tmp_path, stages, commands)
+    assert statuses(pipeline.run()) == {"a": SUCCEEDED, "b": SUCCEEDED}
+    assert statuses(pipeline.run()) == {"a": SKIPPED, "b": SKIPPED}
+
+    write(str(tmp_path / "checkout" / "input.txt"), "2")
+    assert statuses(pipeline.run()) == {"a": SUCCEEDED, "b": SUCCEEDED}
+    assert recorder.ran == ["a", "b", "a", "b"]
+
+
+def test_fingerprint_sees_files_written_by_dependencies(tmp_path):
+    efs = tmp_path / "efs_tree"
+
+    def install(root):
+        write(str(efs / "manifest.json"), read(str(tmp_path / "checkout" / "Brewfile")))
+
+    stages = [
+        Stage("install", "install", inputs=["Brewfile"]),
+        Stage("layer", "layer", inputs=[str(efs / "manifest.json")], depends_on=["install"]),
+    ]
+    write(str(tmp_path / "checkout" / "Brewfile"), "proj")
+    pipeline, recorder = make_pipeline(tmp_path, stages, {"install": install, "layer": lambda root: None})
+
+    pipeline.run()
+    assert statuses(pipeline.run()) == {"install": SKIPPED, "layer": SKIPPED}
+
+    write(str(tmp_path / "checkout" / "Brewfile"), "proj\nexif")
+    pipeline.run()
+    assert statuses(pipeline.run()) == {"install": SKIPPED, "layer": SKIPPED}
+    assert recorder.ran == ["install", "layer", "install", "layer"]
+
+
+def test_outputs_are_restored_into_a_fresh_checkout(tmp_path):
+    def package(root):
+        write(os.path.join(root, "lambda.zip"), "new handler")
+
+    stages = [
+        Stage("package", "package", inputs=["src.py"], outputs=["lambda.zip"]),
+        Stage("deploy", "deploy", depends_on=["package"]),
+    ]
+    deployed = []
+    commands = {"package": package, "deploy": lambda root: deployed.append(read(os.path.join(root, "lambda.zip")))}
+    write(str(tmp_path / "checkout" / "src.py"), "handler")
+    pipeline, recorder = make_pipeline(tmp_path, stages, commands)
+    pipeline.run()
+
+    # The next build starts from a checkout holding a stale committed zip
+    write(str(tmp_path / "checkout" / "lambda.zip"), "old handler")
+    assert statuses(pipeline.run(force=["deploy"])) == {"package": SKIPPED, "deploy": SUCCEEDED}
+    assert deployed == ["new handler", "new handler"]
+    assert recorder.ran == ["package", "deploy", "deploy"]
+
+
+def test_stage_runs_again_if_its_stored_outputs_are_lost(tmp_path):
+    stages = [Stage("package", "package", inputs=["src.py"], outputs=["lambda.zip"])]
+    write(str(tmp_path / "checkout" / "src.py"), "handler")
+    pipeline, recorder = make_pipeline(
+        tmp_path, stages, {"package": lambda root: write(os.path.join(root, "lambda.zip"), "zip")})
+    pipeline.run()
+
+    os.remove(os.path.join(pipeline.outputs_dir, "package", "lambda.zip"))
+    assert statuses(pipeline.run()) == {"package": SUCCEEDED}
+    write(os.path.join(pipeline.outputs_dir, "package", "lambda.zip"), "corrupt")
+    assert statuses(pipeline.run()) == {"package": SUCCEEDED}
+    assert statuses(pipeline.run()) == {"package": SKIPPED}
+
+
+def test_missing_output_fails_the_stage_and_blocks_dependents(tmp_path):
+    stages = [
+        Stage("package", "package", outputs=["lambda.zip"]),
+        Stage("deploy", "deploy", depends_on=["package"]),
+    ]
+    pipeline, recorder = make_pipeline(tmp_path, stages, {"package": lambda root: None, "deploy": lambda root: None})
+    assert statuses(pipeline.run()) == {"package": FAILED, "deploy": BLOCKED}
+    assert recorder.ran == ["package"]
@@ -0,0 +1,50 @@
+import ctypes
+import os
+
+import prefetch
+
+
+def test_profile_records_mapped_libraries_and_opened_files(tmp_path, compile_library):
+    packages_path = str(tmp_path / "lambda_packages")
+    library = compile_library(os.path.join(packages_path, "lib"), "libprefetch.so.1")
+    proj_db = os.path.join(packages_path, "share", "proj", "proj.db")
+    os.makedirs(os.path.dirname(proj_db))
+    with open(proj_db, "wb") as f:
+        f.write(b"db" * 100)
+    outside = str(tmp_path / "outside.txt")
+    open(outside, "w").close()
+    profile_path = str(tmp_path / prefetch.PROFILE_NAME)
+
+    ctypes.CDLL(library)
+    profile = prefetch.record_profile(packages_path, profile_path, [proj_db, outside])
+
+    assert [entry["path"] for entry in profile["files"]] == ["lib/libprefetch.so.1", "share/proj/proj.db"]
+    assert profile["files"][1]["size"] == 200
+    assert prefetch.load_profile(profile_path) == ["lib/libprefetch.so.1", "share/proj/proj.db"]
+
+
+def test_prefetch_reads_every_profiled_file(tmp_path):
+    packages_path = str(tmp_path / "lambda_packages")
+    os.makedirs(packages_path)
+    paths = []
+    for i in range(5):
+        paths.append(os.path.join(packages_path, f"libwarm.so.{i}"))
+        with open(paths[-1], "wb") as f:
+            f.write(os.urandom(3 * 1024 * 1024 // 2))
+    profile_path = str(tmp_path / prefetch.PROFILE_NAME)
+    prefetch.record_profile(packages_path, profile_path, paths + [os.path.join(packages_path, "missing")])
+    os.remove(paths[0])
+
+    report = prefetch.prefetch(packages_path, profile_path, workers=4)
+
+    assert report["files"] == 5
+    assert report["bytes"] == 4 * (3 * 1024 * 1024 // 2)
+
+
+def test_a_missing_or_corrupt_profile_prefetches_nothing(tmp_path):
+    profile_path = str(tmp_path / prefetch.PROFILE_NAME)
+    assert prefetch.prefetch(str(tmp_path), profile_path)["files"] == 0
+
+    with open(profile_path, "w") as f:
+        f.write("[not a profile")
+    assert prefetch.load_profile(profile_path) == []
@@ -0,0 +1,55 @@
+import threading
+
+import pytest
+
+from proj_cache import ProjError, TransformationCache
+
+
+def test_repeated_pairs_reuse_the_transformation(proj):
+    cache = TransformationCache(maxsize=2)
+
+    first = cache.get("EPSG:4326", "EPSG:3857")
+    assert cache.get("EPSG:4326", "EPSG:3857") == first
+    assert cache.get("EPSG:4326", "EPSG:3857", normalize=False) != first
+
+    assert proj.created == [(b"EPSG:4326", b"EPSG:3857")] * 2
+    assert cache.stats.as_dict()["hits"] == 1
+    assert cache.stats.as_dict()["misses"] == 2
+    assert len(proj.alive) == 2
+
+
+def test_least_recently_used_transformations_are_destroyed(proj):
+    cache = TransformationCache(maxsize=2)
+
+    a = cache.get("EPSG:4326", "EPSG:3857")
+    b = cache.get("EPSG:4326", "EPSG:27700")
+    cache.get("EPSG:4326", "EPSG:3857")
+    cache.get("EPSG:4326", "EPSG:2154")
+
+    assert a in proj.alive
+    assert b not in proj.alive
+    assert cache.stats.evictions == 1
+
+    cache.clear()
+    assert proj.alive == set()
+
+
+def test_exited_threads_transformations_are_destroyed(proj):
+    cache = TransformationCache()
+    thread = threading.Thread(target=lambda: cache.get("EPSG:4326", "EPSG:3857"))
+    thread.start()
+    thread.join()
+    assert len(proj.alive) == 1 and len(proj.contexts) == 1
+
+    cache.get("EPSG:4326", "EPSG:27700")
+
+    assert len(proj.alive) == 1 and len(proj.contexts) == 1
+    assert threading.current_thread() in [c.thread for c in cache._thread_caches.values()]
+
+
+def test_failed_creation_raises(proj):
+    cache = TransformationCache()
+
+    with pytest.raises(ProjError, match="error 1027"):
+        cache.get("EPSG:4326", "EPSG:0")
+    assert cache.stats.misses == 0
@@ -0,0 +1,61 @@
+import ctypes
+import os
+
+import pytest
+
+from proj_data import EAGER_MAX_BYTES, ProjData
+
+
+@pytest.fixture
+def share_proj(tmp_path, monkeypatch):
+    # initialize() points PROJ at the data directory; restore it afterwards
+    monkeypatch.setenv("PROJ_DATA", "")
+    monkeypatch.setenv("PROJ_LIB", "")
+    source = tmp_path / "efs" / "share" / "proj"
+    source.mkdir(parents=True)
+    (source / "proj.db").write_bytes(b"db" * 1000)
+    (source / "proj.ini").write_bytes(b"ini")
+    (source / "us_noaa_conus.tif").write_bytes(b"g" * (EAGER_MAX_BYTES + 1))
+    (source / "uk_os_OSTN15.tif").write_bytes(b"g" * (EAGER_MAX_BYTES + 1))
+    return str(source)
+
+
+def test_small_files_are_copied_up_front_and_grids_on_demand(tmp_path, share_proj):
+    local_root = str(tmp_path / "local")
+    data = ProjData(share_proj, local_root)
+
+    data.initialize()
+    assert sorted(os.listdir(local_root)) == ["proj.db", "proj.ini"]
+    assert os.environ["PROJ_DATA"] == local_root
+
+    assert data.path("us_noaa_conus.tif") == os.path.join(local_root, "us_noaa_conus.tif")
+    assert data.path("missing.tif") is None
+    assert sorted(data.fetched) == ["proj.db", "proj.ini", "us_noaa_conus.tif"]
+
+
+def test_grids_over_budget_are_read_from_efs(tmp_path, share_proj):
+    local_root = str(tmp_path / "local")
+    data = ProjData(share_proj, local_root, max_local_bytes=EAGER_MAX_BYTES)
+    data.initialize()
+
+    assert data.path("us_noaa_conus.tif") == os.path.join(share_proj, "us_noaa_conus.tif")
+    assert not os.path.exists(os.path.join(local_root, "us_noaa_conus.tif"))
+
+
+def test_without_a_local_root_files_are_used_in_place(share_proj):
+    data = ProjData(share_proj, None)
+    data.initialize()
+
+    assert os.environ["PROJ_DATA"] == share_proj
+    assert data.path("proj.db") == os.path.join(share_proj, "proj.db")
+
+
+def test_file_finder_returns_local_paths_for_relative_names(tmp_path, share_proj):
+    data = ProjData(share_proj, str(tmp_path / "local"))
+
+    address = data._find(None, b"proj.db", None)
+    assert ctypes.string_at(address).decode() == str(tmp_path / "local" / "proj.db")
+    assert data._find(None, b"proj.db", None) == address
+    assert data._find(None, os.path.join(share_proj, "proj.db").encode(), None) is None
+    assert data._find(None, b"https://cdn.proj.org/us_noaa_conus.tif", None) is None
+    assert data._find(None, b"missing.tif", None) is None
@@ -0,0 +1,61 @@
+import array
+
+import pytest
+
+import libraries
+
+from proj_transform import Transformer
+
+numpy = pytest.importorskip("numpy")
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_arrays_are_transformed_in_place_in_chunks(proj, workers):
+    x, y = numpy.arange(10, dtype=numpy.float64), numpy.zeros(10)
+
+    with Transformer("EPSG:4326", "EPSG:3857") as transformer:
+        assert transformer.transform(x, y, chunk_size=3, workers=workers) == 10
+
+    assert x.tolist() == [2.0 * i for i in range(10)]
+    assert y.tolist() == [1.0] * 10
+    assert sorted(proj.calls) == [(1, 1, 0)] + [(3, 3, 0)] * 3
+
+
+def test_strided_views_and_point_columns_are_not_copied(proj):
+    values = numpy.arange(8, dtype=numpy.float64)
+    points = numpy.array([[1.0, 10.0], [2.0, 20.0]])
+    transformer = Transformer("EPSG:4326", "EPSG:3857")
+
+    transformer.transform(values[::2], values[1::2])
+    transformer.transform_points(points)
+
+    assert values.tolist() == [0.0, 2.0, 4.0, 4.0, 8.0, 6.0, 12.0, 8.0]
+    assert points.tolist() == [[2.0, 11.0], [4.0, 21.0]]
+
+    transformer.transform_points(points, direction=libraries.PJ_INV)
+    assert points.tolist() == [[1.0, 10.0], [2.0, 20.0]]
+
+
+def test_buffers_of_doubles_are_accepted(proj):
+    x, y = array.array("d", [1.0, 2.0]), array.array("d", [0.0, 0.0])
+
+    Transformer("EPSG:4326", "EPSG:3857").transform(x, y)
+
+    assert list(x) == [2.0, 4.0]
+    assert list(y) == [1.0, 1.0]
+
+
+def test_unsuitable_arrays_are_refused(proj):
+    transformer = Transformer("EPSG:4326", "EPSG:3857")
+    read_only = numpy.zeros(2)
+    read_only.flags.writeable = False
+
+    with pytest.raises(TypeError):
+        transformer.transform(numpy.zeros(2, dtype=numpy.float32), numpy.zeros(2))
+    with pytest.raises(ValueError):
+        transformer.transform(read_only, numpy.zeros(2))
+    with pytest.raises(ValueError):
+        transformer.transform(numpy.zeros(2), numpy.zeros(3))
+    with pytest.raises(ValueError):
+        transformer.transform_points(numpy.zeros((2, 4)))
+    assert proj.calls == []
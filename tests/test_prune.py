@@ -0,0 +1,67 @@
+import os
+
+from build_tools import prune, rpath, strip
+
+
+def make_homebrew_lib(tmp_path, compile_library):
+    """
+    Builds a Homebrew-like prefix: kegs in the Cellar, with `lib` holding
+    symlinks into them.
+    """
+    cellar = tmp_path / "Cellar"
+    lib = tmp_path / "lib"
+    lib.mkdir()
+    for name, soname, version, dependencies in [
+        ("sqlite", "libsqlite3.so.0", "0.8.6", []),
+        ("proj", "libproj.so.22", "22.1.1", ["libsqlite3.so.0"]),
+        ("unused", "libunused.so.1", "1.0.0", []),
+    ]:
+        keg_lib = cellar / name / "1.0" / "lib"
+        real_name = f"{soname.split('.so')[0]}.so.{version}"
+        path = compile_library(str(keg_lib), soname, [os.path.join(str(lib), d) for d in dependencies],
+                               runpath="/home/linuxbrew/.linuxbrew/lib")
+        os.rename(path, str(keg_lib / real_name))
+        os.symlink(real_name, str(keg_lib / soname))
+        os.symlink(f"{soname.split('.so')[0]}.so.{version}", str(keg_lib / f"{soname.split('.so')[0]}.so"))
+        for link in (soname, f"{soname.split('.so')[0]}.so", real_name):
+            os.symlink(os.path.relpath(str(keg_lib / link), str(lib)), str(lib / link))
+    (lib / "libproj.a").write_bytes(b"!<arch>\n")
+    return str(cellar), str(lib)
+
+
+def snapshot(directory):
+    files = {}
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            if not os.path.islink(path):
+                with open(path, "rb") as f:
+                    files[os.path.relpath(path, directory)] = f.read()
+    return files
+
+
+def test_closure_follows_dt_needed(tmp_path, compile_library):
+    _, lib = make_homebrew_lib(tmp_path, compile_library)
+    closure = prune.dependency_closure(lib, ["proj", "missing"])
+
+    assert closure.sonames == ["libproj.so.22", "libsqlite3.so.0"]
+    assert closure.files == ["libproj.so", "libproj.so.22", "libsqlite3.so.0"]
+    assert "libc.so.6" in closure.external
+    assert closure.missing_roots == ["missing"]
+
+
+def test_staging_is_a_copy_which_later_steps_modify_alone(tmp_path, compile_library):
+    cellar, lib = make_homebrew_lib(tmp_path, compile_library)
+    before = snapshot(cellar)
+    staging = str(tmp_path / "staging")
+
+    prune.write_staging(lib, staging, prune.dependency_closure(lib, ["proj"]).files)
+    assert not os.path.islink(os.path.join(staging, "libproj.so.22"))
+    assert os.readlink(os.path.join(staging, "libproj.so")) == "libproj.so.22"
+
+    assert any(r.status == "patched" for r in rpath.patch_directory(staging))
+    strip.strip_directory(staging)
+
+    assert snapshot(cellar) == before
+    assert not [f for f in os.listdir(staging) if f.endswith(".unstripped")]
+    assert sorted(os.listdir(staging)) == ["libproj.so", "libproj.so.22", "libsqlite3.so.0"]
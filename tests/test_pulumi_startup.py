@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from benchmarks import pulumi_import
+
+
+# The program's own modules, imported against the stand-ins below, take about
+# 9 ms (CPython 3.11), most of it in standard library modules such as `json`
+# which the real `pulumi` would already have imported.  The budget leaves room
+# for slower machines, but not for a heavy new import such as a module-level
+# `boto3`.  Keep this fixed: raise it deliberately, in the same change that
+# makes the program slower to import.
+PROGRAM_IMPORT_BUDGET_MS = 50
+
+# Just enough of `pulumi` and `pulumi_aws` for the program's modules to be
+# imported: its classes and annotations, and any resource class by name
+PROVIDER_STUBS = {
+    "pulumi/__init__.py": "from .output import Input, Output\n"
+                          "from .resource import ComponentResource, ResourceOptions\n",
+    "pulumi/output.py": "from typing import Generic, TypeVar, Union\n"
+                        "T = TypeVar('T')\n"
+                        "class Output(Generic[T]): pass\n"
+                        "Input = Union[T, Output[T]]\n",
+    "pulumi/resource.py": "class ComponentResource: pass\n"
+                          "class ResourceOptions: pass\n",
+    "pulumi_aws/__init__.py": "",
+    "pulumi_aws/get_caller_identity.py": "def get_caller_identity(): pass\n",
+}
+PROVIDER_STUBS.update({
+    f"pulumi_aws/{module}.py": "def __getattr__(name): return type(name, (), {})\n"
+    for module in ("codebuild", "ec2", "efs", "iam", "lambda_", "ssm")
+})
+
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       937 |       1327 |     weakref
+import time:       418 |       1939 |   copy
+import time:      2996 |      12772 | json
+import time:       120 |        150 |   mmap
+import time:       300 |        450 | filebase64sha256
+"""
+
+
+def test_parses_importtime_output():
+    entries = pulumi_import.parse_importtime(IMPORTTIME)
+
+    assert [(e["module"], e["depth"]) for e in entries] == [
+        ("weakref", 2), ("copy", 1), ("json", 0), ("mmap", 1), ("filebase64sha256", 0)]
+    assert entries[2]["self_us"] == 2996
+    assert entries[2]["cumulative_us"] == 12772
+
+
+def test_program_time_counts_only_the_programs_own_modules():
+    report = pulumi_import.summarize([pulumi_import.parse_importtime(IMPORTTIME)] * 3)
+
+    assert report["total_ms"] == pytest.approx(13.222)
+    assert report["program_ms"] == pytest.approx(0.45)
+    assert pulumi_import.failures(report, max_program_ms=0.4)
+    assert not pulumi_import.failures(report, max_ms=20, max_program_ms=0.5)
+
+
+def test_program_imports_are_those_of_the_pulumi_program():
+    code = pulumi_import.program_imports()
+
+    assert "from pulumi_infrastructure.development_environment import DevelopmentEnvironment" in code
+    assert "from filebase64sha256 import filebase64sha256" in code
+
+
+def test_program_imports_within_budget(tmp_path):
+    for relative_path, source in PROVIDER_STUBS.items():
+        (tmp_path / relative_path).parent.mkdir(exist_ok=True)
+        (tmp_path / relative_path).write_text(source)
+
+    report = pulumi_import.run(runs=5, env=dict(os.environ, PYTHONPATH=str(tmp_path)))
+
+    # Every component the program creates must be imported up front, or its
+    # import time would not be measured here
+    assert {"pulumi_infrastructure.vpc", "pulumi_infrastructure.efs", "pulumi_infrastructure.codebuild"} \
+        <= set(report["modules"])
+    assert report["program_ms"] <= PROGRAM_IMPORT_BUDGET_MS, pulumi_import.failures(
+        report, max_program_ms=PROGRAM_IMPORT_BUDGET_MS)
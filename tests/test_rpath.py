@@ -0,0 +1,72 @@
+import os
+
+from build_tools import rpath
+from build_tools.elf import read_dynamic_info
+
+
+LONG_RUNPATH = "/home/linuxbrew/.linuxbrew/lib"
+
+
+def test_patch_sets_origin_in_place(tmp_path, compile_library):
+    lib = str(tmp_path / "lib")
+    compile_library(lib, "libsqlite3.so.0", runpath=LONG_RUNPATH)
+    compile_library(lib, "libshort.so.1", runpath="/x")
+    compile_library(lib, "libnone.so.1", runpath=None)
+    size = os.path.getsize(os.path.join(lib, "libsqlite3.so.0"))
+
+    results = {os.path.basename(r.path): r.status for r in rpath.patch_directory(lib)}
+
+    assert results == {"libsqlite3.so.0": "patched", "libshort.so.1": "too-short", "libnone.so.1": "no-runpath"}
+    assert read_dynamic_info(os.path.join(lib, "libsqlite3.so.0")).runpath == "$ORIGIN"
+    assert os.path.getsize(os.path.join(lib, "libsqlite3.so.0")) == size
+    assert rpath.set_runpath(os.path.join(lib, "libsqlite3.so.0")).status == "unchanged"
+
+
+def test_unpatched_library_needs_the_efs_directory_last(tmp_path, compile_library):
+    lib = str(tmp_path / "lib")
+    compile_library(lib, "libsqlite3.so.0", runpath=LONG_RUNPATH)
+    compile_library(lib, "libproj.so.22", ["libsqlite3.so.0"], runpath="/x")
+    rpath.patch_directory(lib)
+    path_map = {rpath.EFS_LIBRARY_DIRECTORY: lib}
+    ld_library_path = rpath.LAMBDA_RUNTIME_LIBRARY_PATH + [rpath.EFS_LIBRARY_DIRECTORY]
+
+    found = {p.soname: p.found for p in rpath.analyze(lib, ["libproj.so.22"], ld_library_path, path_map)}
+    assert found["libsqlite3.so.0"] == os.path.join(lib, "libsqlite3.so.0")
+
+    without = {p.soname: p.found for p in rpath.analyze(lib, ["libproj.so.22"], rpath.LAMBDA_RUNTIME_LIBRARY_PATH)}
+    assert without["libsqlite3.so.0"] is None
+
+    keep = rpath.REQUIRED_RUNTIME_LIBRARY_PATH
+    minimal = rpath.minimal_library_path(lib, ["libproj.so.22"], ld_library_path, keep, path_map)
+    assert minimal == ["/var/lang/lib", rpath.EFS_LIBRARY_DIRECTORY]
+
+    before = {p.soname: p.failed_probes for p in rpath.analyze(lib, ["libproj.so.22"], ld_library_path, path_map)}
+    after = {p.soname: p.failed_probes for p in rpath.analyze(lib, ["libproj.so.22"], minimal, path_map)}
+    assert (before["libsqlite3.so.0"], after["libsqlite3.so.0"]) == (8, 1)
+
+
+def test_origin_runpath_finds_dependencies_next_to_the_library(tmp_path, compile_library):
+    lib = str(tmp_path / "lib")
+    compile_library(lib, "libsqlite3.so.0", runpath=LONG_RUNPATH)
+    compile_library(lib, "libproj.so.22", ["libsqlite3.so.0"], runpath=LONG_RUNPATH)
+    rpath.patch_directory(lib)
+
+    probes = {p.soname: p for p in rpath.analyze(lib, ["libproj.so.22"], [], default_directories=[])}
+    assert probes["libsqlite3.so.0"].found == os.path.join(lib, "libsqlite3.so.0")
+    assert probes["libsqlite3.so.0"].failed_probes == 0
+
+
+def test_rpath_only_library_keeps_its_tag(tmp_path, compile_library):
+    lib = str(tmp_path / "lib")
+    compile_library(lib, "libsqlite3.so.0", runpath=LONG_RUNPATH)
+    compile_library(lib, "libproj.so.22", ["libsqlite3.so.0"], runpath=LONG_RUNPATH, new_dtags=False)
+
+    assert rpath.set_runpath(os.path.join(lib, "libproj.so.22")).status == "patched"
+
+    info = read_dynamic_info(os.path.join(lib, "libproj.so.22"))
+    assert (info.rpath, info.runpath) == ("$ORIGIN", None)
+    assert rpath.set_runpath(os.path.join(lib, "libproj.so.22")).status == "unchanged"
+
+    probes = {p.soname: p for p in rpath.analyze(lib, ["libproj.so.22"], ["/nonexistent"], default_directories=[])}
+    assert probes["libsqlite3.so.0"].found == os.path.join(lib, "libsqlite3.so.0")
+    assert probes["libsqlite3.so.0"].failed_probes == 0
@@ -0,0 +1,51 @@
+import ctypes
+import os
+import shutil
+
+import pytest
+
+from build_tools import strip
+from build_tools.elf import read_dynamic_info
+
+
+SOURCE = "".join(f"static int helper{i}(int x) {{ return x + {i}; }}\n" for i in range(50)) + \
+    "int answer(void) { return " + " + ".join(f"helper{i}(0)" for i in range(50)) + "; }\n"
+
+
+@pytest.fixture
+def lib(tmp_path, compile_library):
+    if shutil.which("strip") is None:
+        pytest.skip("needs binutils' strip")
+    lib = str(tmp_path / "lib")
+    compile_library(lib, "libsqlite3.so.0")
+    compile_library(lib, "libproj.so.22", ["libsqlite3.so.0"], source=SOURCE)
+    os.symlink("libproj.so.22", os.path.join(lib, "libproj.so"))
+    with open(os.path.join(lib, "libbroken.so"), "wb") as f:
+        f.write(b"not an ELF file")
+    return lib
+
+
+def test_libraries_shrink_and_still_load(tmp_path, lib):
+    originals = str(tmp_path / "debug")
+    before = read_dynamic_info(os.path.join(lib, "libproj.so.22"))
+
+    results = {r.path: r for r in strip.strip_directory(lib, originals, workers=2)}
+
+    assert {path: r.status for path, r in results.items()} == {
+        "libbroken.so": "not-elf", "libproj.so.22": "stripped", "libsqlite3.so.0": "stripped"}
+    assert results["libproj.so.22"].after < results["libproj.so.22"].before
+    assert os.path.getsize(os.path.join(originals, "libproj.so.22")) == results["libproj.so.22"].before
+
+    after = read_dynamic_info(os.path.join(lib, "libproj.so.22"))
+    assert (after.soname, after.needed) == (before.soname, before.needed)
+    assert ctypes.CDLL(os.path.join(lib, "libproj.so.22")).answer() == sum(range(50))
+
+
+def test_libraries_are_restored_if_strip_fails(lib):
+    size = os.path.getsize(os.path.join(lib, "libproj.so.22"))
+
+    results = {r.path: r for r in strip.strip_directory(lib, strip="false")}
+
+    assert results["libproj.so.22"].status == "restored"
+    assert os.path.getsize(os.path.join(lib, "libproj.so.22")) == size
+    assert not os.path.exists(os.path.join(lib, "libproj.so.22.unstripped"))
@@ -0,0 +1,59 @@
+import os
+
+from build_tools import sync
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def test_copies_everything_then_only_what_changed(tmp_path):
+    source, target = str(tmp_path / "source"), str(tmp_path / "target")
+    write(os.path.join(source, "libproj.so.22"), "proj")
+    write(os.path.join(source, "pkgconfig", "proj.pc"), "pc")
+    os.symlink("libproj.so.22", os.path.join(source, "libproj.so"))
+
+    first = sync.sync(source, target, workers=4)
+    assert (first.files_written, first.files_skipped) == (3, 0)
+    assert not os.path.islink(os.path.join(target, "libproj.so"))
+    with open(os.path.join(target, "libproj.so")) as f:
+        assert f.read() == "proj"
+
+    write(os.path.join(source, "pkgconfig", "proj.pc"), "changed")
+    second = sync.sync(source, target, workers=4)
+    assert (second.files_written, second.files_skipped) == (1, 2)
+    assert second.bytes_written == len("changed")
+    with open(os.path.join(target, "pkgconfig", "proj.pc")) as f:
+        assert f.read() == "changed"
+
+
+def test_rewrites_files_changed_in_the_target(tmp_path):
+    source, target = str(tmp_path / "source"), str(tmp_path / "target")
+    write(os.path.join(source, "libexif.so.12"), "exif")
+    sync.sync(source, target)
+
+    write(os.path.join(target, "libexif.so.12"), "truncated by a failed copy")
+    report = sync.sync(source, target)
+
+    assert report.files_written == 1
+    with open(os.path.join(target, "libexif.so.12")) as f:
+        assert f.read() == "exif"
+
+
+def test_deletes_files_removed_from_the_source(tmp_path):
+    source, target = str(tmp_path / "source"), str(tmp_path / "target")
+    write(os.path.join(source, "libproj.so.22"), "proj")
+    write(os.path.join(source, "old", "libold.so.1"), "old")
+    sync.sync(source, target)
+
+    os.remove(os.path.join(source, "old", "libold.so.1"))
+    kept = sync.sync(source, target, delete=False)
+    assert kept.files_deleted == 0
+    assert os.path.exists(os.path.join(target, "old", "libold.so.1"))
+
+    report = sync.sync(source, target)
+    assert report.files_deleted == 1
+    assert not os.path.exists(os.path.join(target, "old"))
+    assert sorted(os.listdir(target)) == [sync.SYNC_MANIFEST_NAME, "libproj.so.22"]